@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Tuple, Any
 
-from simulator.snapshot import Snapshot
+import numpy as np
+
+from simulator.snapshot import Snapshot, BatchHolderSnapshot
 from simulator.virtual_bus import VirtualBus
 
 
@@ -39,6 +41,21 @@ class Agent(ABC):
     #     '''
     #     ...
 
+    @property
+    def is_episode_independent(self) -> bool:
+        ''' Whether the episodes are independent of each other (apart from the random numbers),
+            i.e., the agent does not learn across episodes, so the episodes can run in parallel.
+
+        '''
+        return False
+
+    @property
+    def supports_batch_simulation(self) -> bool:
+        ''' Whether the agent implements `calculate_batch_hold_time` for `BatchSimulator`.
+
+        '''
+        return False
+
     @abstractmethod
     def reset(self, episode: int) -> None:
         ''' Reset the agent for the next episode
@@ -53,3 +70,13 @@ class Agent(ABC):
 
         '''
         ...
+
+    def calculate_batch_hold_time(self, snapshot: BatchHolderSnapshot) -> np.ndarray:
+        ''' Given the buses waiting for holding actions in all the replications of a `BatchSimulator`,
+            calculate the hold time of each bus, in the same order as the buses in the snapshot
+
+            Agents that can be applied to all the replications at once override it
+
+        '''
+        raise NotImplementedError(
+            f'{self.agent_name} does not support the batch simulator')
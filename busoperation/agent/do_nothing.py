@@ -1,7 +1,9 @@
 from typing import Dict, Any
 
+import numpy as np
+
 from setup.blueprint import Blueprint
-from setup.calibration.dataloader import DataLoader
+from simulator.snapshot import BatchHolderSnapshot
 
 from .agent import Agent
 
@@ -11,8 +13,22 @@ class DoNothing(Agent):
         super().__init__(agent_config)
         self._blueprint = blueprint
 
+    @property
+    def is_episode_independent(self) -> bool:
+        return True
+
+    @property
+    def supports_batch_simulation(self) -> bool:
+        return True
+
+    def reset(self, episode: int) -> None:
+        pass
+
     def calculate_hold_time(self, snapshot):
         stop_bus_hold_time = {}
         for (stop_id, route_id, bus_id) in snapshot.holder_snapshot.action_buses:
             stop_bus_hold_time[(stop_id, route_id, bus_id)] = 0
         return stop_bus_hold_time
+
+    def calculate_batch_hold_time(self, snapshot: BatchHolderSnapshot) -> np.ndarray:
+        return np.zeros(snapshot.bus_num)
@@ -1,12 +1,15 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List
 from typing_extensions import TypedDict
 
+import numpy as np
+
 from setup.blueprint import Blueprint
+from setup.config_dataclass import VirtualBusSolverConfig
 from simulator.virtual_bus import VirtualBus
-from simulator.snapshot import Snapshot
-from simulator.simulator import Simulator
+from simulator.snapshot import Snapshot, BatchHolderSnapshot
 
 from ..single_line_agent import AgentByLine
+from ..virtual_bus_cache import warm_up_virtual_bus
 
 
 F_TYPE = TypedDict('fs', {'f0': float, 'f1': float})
@@ -48,6 +51,12 @@ class SimpleControlNonlinear(AgentByLine):
 
         self._base_type = agent_config['base_type']
         self._blueprint = blueprint
+        # if given, the converged virtual bus schedule is cached in this directory
+        self._virtual_bus_cache_dir = agent_config.get('virtual_bus_cache_dir')
+        # None updates the virtual bus once by a single simulation, as in the original calibration
+        solver_config = agent_config.get('virtual_bus_solver')
+        self._virtual_bus_solver_config = None if solver_config is None \
+            else VirtualBusSolverConfig(**solver_config)
         self._generate_virtual_bus()
 
     def calculate_hold_time(self, snapshot: Snapshot) -> Dict[Tuple[str, str, str], float]:
@@ -113,11 +122,51 @@ class SimpleControlNonlinear(AgentByLine):
 
         return stop_bus_hold_time
 
+    def calculate_batch_hold_time(self, snapshot: BatchHolderSnapshot) -> np.ndarray:
+        ''' Implement the nonlinear control algorithm for the buses of all the replications at once.
+
+        Args:
+            snapshot: BatchHolderSnapshot
+
+        Returns:
+            hold_times: the hold time of each bus in the snapshot
+
+        '''
+        if self._base_type == 'arrival':
+            betas = self._get_route_stop_betas(snapshot.route_stop_ids)[
+                snapshot.route_stop_indices]
+            hold_times = self._f0*snapshot.epsilon_arrival + \
+                self._f1*snapshot.last_epsilon_arrival
+            hold_times += betas * \
+                (snapshot.last_epsilon_arrival - snapshot.epsilon_arrival)
+            hold_times += self._slack
+        elif self._base_type == 'rtd':
+            hold_times = self._f0*snapshot.epsilon_rtd + \
+                self._f1*snapshot.last_epsilon_rtd
+            hold_times += self._slack
+        else:
+            hold_times = np.zeros(snapshot.bus_num)
+
+        hold_times = np.minimum(np.maximum(0, hold_times), 60)
+        if snapshot.bus_num > 0:
+            snapshot.record_holding_time(hold_times)
+        return hold_times
+
+    def _get_route_stop_betas(self, route_stop_ids: List[Tuple[str, str]]) -> np.ndarray:
+        betas = []
+        for route_id, stop_id in route_stop_ids:
+            stop_boarding_rate = self._blueprint.route_info.route_infos[route_id].boarding_rate
+            arrival_rate = self._route_stop_arrival_rate[route_id][stop_id]
+            betas.append(arrival_rate / stop_boarding_rate[stop_id])
+        return np.array(betas, dtype=np.float64)
+
     def _generate_virtual_bus(self):
         ''' Generate the virtual bus.
 
         For nonlinear version, the average holding time at each stop is dynamically updated
             by running the simulation until convergence.
+        The schedule is iterated to convergence if `virtual_bus_solver` is configured,
+            and the converged schedule is cached on disk if `virtual_bus_cache_dir` is configured, see `warm_up_virtual_bus`.
 
         '''
         # the virtual bus's average holding time is initialized to be the slack
@@ -125,16 +174,18 @@ class SimpleControlNonlinear(AgentByLine):
         self._virtual_bus.initialize_with_perfect_schedule(
             self._route_stop_arrival_rate, self._slack)
 
-        route_stop_average_hold_time: Dict[str, Dict[str, float]] = {}
-        for _ in range(1):
-            simulator = Simulator(self._blueprint, self)
-            stop_bus_hold_action: Dict[Tuple[str, str, str], float] = {}
-            for t in range(int(3600*3)):
-                snapshot = simulator.step(t, stop_bus_hold_action)
-                stop_bus_hold_action = self.calculate_hold_time(snapshot)
+        control_params = {'agent_name': self.agent_name, 'slack': self._slack,
+                          'fs': dict(self._fs), 'base_type': self._base_type}
+        warm_up_virtual_bus(self._virtual_bus, self, self._blueprint, control_params,
+                            self._virtual_bus_cache_dir, solver_config=self._virtual_bus_solver_config)
+
+    @property
+    def is_episode_independent(self) -> bool:
+        return True
 
-            route_stop_average_hold_time = simulator.get_stop_average_hold_time()
-            self._virtual_bus.update_trajectory(route_stop_average_hold_time)
+    @property
+    def supports_batch_simulation(self) -> bool:
+        return True
 
     def reset(self, episode: int) -> None:
         ''' Reset the agent for the next episode
@@ -104,6 +104,10 @@ class XuanNonlinear(AgentByLine):
 
         return stop_bus_hold_time
 
+    @property
+    def is_episode_independent(self) -> bool:
+        return True
+
     def reset(self, episode: int) -> None:
         ''' Reset the agent for the next episode
         '''
@@ -10,9 +10,9 @@ import torch
 from simulator.snapshot import Snapshot
 from setup.blueprint import Blueprint
 from simulator.virtual_bus import VirtualBus
-from simulator.simulator import Simulator
 
 from .rl_agent import RLAgent
+from ..virtual_bus_cache import warm_up_virtual_bus
 from .net import Actor_Net, Critic_Net
 
 
@@ -264,19 +264,11 @@ class DDPG(RLAgent):
         ''' Generate the virtual bus.
         For nonlinear version, the average holding time at each stop is dynamically updated
         by running the simulation until convergence.
+        The warm-up also trains the networks and fills the replay memory, so it is rerun by every agent and never cached.
         '''
         # the virtual bus's average holding time is initialized to be the slack
         self._virtual_bus = VirtualBus(self._blueprint)
         self._virtual_bus.initialize_with_perfect_schedule(
             self._route_stop_arrival_rate, self._slack)
 
-        route_stop_average_hold_time: Dict[str, Dict[str, float]] = {}
-        for _ in range(1):
-            simulator = Simulator(self._blueprint, self)
-            stop_bus_hold_action: Dict[Tuple[str, str, str], float] = {}
-            for t in range(int(3600 * 3)):
-                snapshot = simulator.step(t, stop_bus_hold_action)
-                stop_bus_hold_action = self.calculate_hold_time(snapshot)
-
-            route_stop_average_hold_time = simulator.get_stop_average_hold_time()
-            self._virtual_bus.update_trajectory(route_stop_average_hold_time)
\ No newline at end of file
+        warm_up_virtual_bus(self._virtual_bus, self, self._blueprint, {}, None)
@@ -3,7 +3,6 @@ from typing import Dict, Any
 from abc import abstractmethod
 from collections import defaultdict
 from setup.blueprint import Blueprint
-from setup.calibration.dataloader import DataLoader
 from simulator.snapshot import Snapshot
 
 from agent.agent import Agent
@@ -0,0 +1,130 @@
+from typing import Dict, Tuple, Any, Optional
+from dataclasses import asdict
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from setup.blueprint import Blueprint
+from setup.config_dataclass import VirtualBusSolverConfig
+from setup.fingerprint import get_code_fingerprint, get_blueprint_fingerprint
+from simulator.virtual_bus import VirtualBus
+from simulator.simulator import Simulator
+
+from .agent import Agent
+from .virtual_bus_solver import solve_virtual_bus, VirtualBusSolution
+
+
+class VirtualBusCache:
+    ''' Cache the converged virtual bus schedules on local disk, one JSON file for each key.
+
+    Args:
+        cache_dir: the directory of the schedules, created if it does not exist
+
+    Methods:
+        make_key(self, blueprint: Blueprint, control_params: Dict[str, Any], seed: int) -> str
+        get(self, key: str) -> Optional[Dict[str, Dict[str, Dict[str, float]]]]
+        put(self, key: str, virtual_bus: VirtualBus) -> None
+
+    '''
+    _cache_dir: str
+
+    def __init__(self, cache_dir: str) -> None:
+        self._cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, blueprint: Blueprint, control_params: Dict[str, Any], seed: int) -> str:
+        ''' Hash the blueprint contents, the control parameters and the seed of the warm-up together with the code fingerprint.
+
+        '''
+        payload = json.dumps({'blueprint': get_blueprint_fingerprint(blueprint), 'control_params': control_params,
+                              'seed': seed, 'code': get_code_fingerprint()}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Dict[str, Dict[str, float]]]]:
+        try:
+            with open(self._get_path(key), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, virtual_bus: VirtualBus) -> None:
+        path = self._get_path(key)
+        # write to a temporary file first, so that a concurrent reader never sees a partial schedule
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(virtual_bus.get_tables(), file)
+        os.replace(temp_path, path)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f'{key}.json')
+
+
+def warm_up_virtual_bus(virtual_bus: VirtualBus, agent: Agent, blueprint: Blueprint, control_params: Dict[str, Any],
+                        cache_dir: Optional[str], warm_up_duration: int = int(3600*3),
+                        solver_config: Optional[VirtualBusSolverConfig] = None) -> Optional[VirtualBusSolution]:
+    ''' Update the virtual bus's schedule by the average holding times of warm-up simulations controlled by the agent.
+
+    The virtual bus should have been initialized, and is used by the agent during the warm-up.
+    Without `solver_config`, the schedule is updated once by a single simulation of `warm_up_duration` seconds;
+    with it, the schedule is iterated to convergence by `solve_virtual_bus`.
+
+    If `cache_dir` or `solver_config` is given, the warm-up is seeded by a single draw from numpy's global random state
+    and runs on its own random state, so the converged schedule only depends on the blueprint, the control parameters,
+    the solver and the seed, and is loaded from the cache (if any) on later constructions.
+    The global random state after the call is the same on a hit or a miss.
+    Otherwise the warm-up runs on numpy's global random state.
+    Only the schedule is cached, so agents that learn during the warm-up (e.g., DDPG) should not pass `cache_dir`.
+
+    Args:
+        control_params: the parameters that decide the agent's holding times, e.g., slack, fs and base_type
+
+    Returns:
+        VirtualBusSolution: the report of the solver, None if the solver is not used or the schedule is cached
+
+    '''
+    if cache_dir is None and solver_config is None:
+        _run_warm_up(virtual_bus, agent, blueprint, None, warm_up_duration)
+        return None
+
+    seed = int(np.random.randint(0, 2**31 - 1))
+    cache, key = None, ''
+    if cache_dir is not None:
+        cache = VirtualBusCache(cache_dir)
+        warm_up_params = {'warm_up_duration': warm_up_duration} if solver_config is None \
+            else {'solver': asdict(solver_config)}
+        key = cache.make_key(blueprint, dict(control_params, **warm_up_params), seed)
+        tables = cache.get(key)
+        if tables is not None:
+            virtual_bus.load_tables(tables)
+            return None
+
+    solution = None
+    global_state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        if solver_config is None:
+            _run_warm_up(virtual_bus, agent, blueprint,
+                         seed, warm_up_duration)
+        else:
+            solution = solve_virtual_bus(
+                virtual_bus, agent, blueprint, solver_config, seed)
+    finally:
+        np.random.set_state(global_state)
+    if cache is not None:
+        cache.put(key, virtual_bus)
+    return solution
+
+
+def _run_warm_up(virtual_bus: VirtualBus, agent: Agent, blueprint: Blueprint, seed: Optional[int],
+                 warm_up_duration: int) -> None:
+    simulator = Simulator(blueprint, agent, seed)
+    snapshot = simulator.step_to_decision(warm_up_duration, {})
+    while snapshot is not None:
+        stop_bus_hold_action = agent.calculate_hold_time(snapshot)
+        snapshot = simulator.step_to_decision(
+            warm_up_duration, stop_bus_hold_action)
+
+    route_stop_average_hold_time = simulator.get_stop_average_hold_time()
+    virtual_bus.update_trajectory(route_stop_average_hold_time)
@@ -0,0 +1,152 @@
+from typing import Dict, List, Tuple
+from dataclasses import dataclass
+
+import numpy as np
+
+from setup.blueprint import Blueprint
+from setup.config_dataclass import VirtualBusSolverConfig
+from simulator.virtual_bus import VirtualBus
+from simulator.simulator import Simulator
+from simulator.batch_simulator import BatchSimulator
+
+from .agent import Agent
+
+
+@dataclass(frozen=True)
+class VirtualBusSolution:
+    ''' The report of solving the virtual bus schedule.
+
+    Attributes:
+        iteration_num: the number of iterations, i.e., the number of times that the replications are simulated
+        residuals: the root-mean-square change of the average holding times over the stops (sec) in each iteration
+        converged: whether the last residual is within the tolerance
+
+    '''
+    iteration_num: int
+    residuals: List[float]
+    converged: bool
+
+
+def solve_virtual_bus(virtual_bus: VirtualBus, agent: Agent, blueprint: Blueprint,
+                      solver_config: VirtualBusSolverConfig, seed: int) -> VirtualBusSolution:
+    ''' Iterate the virtual bus schedule to the fixed point of its average holding times.
+
+    Each iteration updates the virtual bus with the current average holding times, simulates the replications
+    controlled by the agent and takes the pooled average holding time at each stop. The replications use the same seeds
+    in every iteration (common random numbers), so the map from the holding times to the simulated ones is deterministic
+    and the iteration can be accelerated by Anderson mixing or damped. The map is still not smooth, as holding and boarding
+    are discrete, so the residual levels off at a noise floor that shrinks with more replications.
+
+    The virtual bus should have been initialized, and is used by the agent during the simulations.
+    The numpy global random state is reseeded by `seed` before each iteration.
+
+    Returns:
+        VirtualBusSolution: the iteration count and the residuals
+
+    '''
+    route_stops = [(route_id, stop_id) for route_id, route in blueprint.route_info.route_infos.items()
+                   for stop_id in route.visit_seq_stops]
+    seed_sequences = np.random.SeedSequence(
+        seed).spawn(solver_config.replication_num)
+    replication_seeds = [int(seed_sequence.generate_state(1)[0])
+                         for seed_sequence in seed_sequences]
+
+    # the holding time of the virtual bus at each stop is its departure time minus its rtd time
+    hold_times = np.array([virtual_bus.route_stop_departure_time[route_id][stop_id] -
+                           virtual_bus.route_stop_rtd_time[route_id][stop_id]
+                           for route_id, stop_id in route_stops], dtype=np.float64)
+    residuals: List[float] = []
+    hold_time_history: List[np.ndarray] = []
+    residual_history: List[np.ndarray] = []
+    converged = False
+    for iteration in range(solver_config.max_iteration_num):
+        virtual_bus.update_trajectory(_to_route_stop_dict(route_stops, hold_times))
+        np.random.seed(seed)
+        route_stop_average_hold_time = _simulate_average_hold_time(
+            agent, blueprint, replication_seeds, solver_config.warm_up_duration)
+        # stops without any holding keep their holding times
+        simulated_hold_times = np.array([route_stop_average_hold_time.get(route_id, {}).get(stop_id, hold_times[idx])
+                                         for idx, (route_id, stop_id) in enumerate(route_stops)], dtype=np.float64)
+
+        residual = simulated_hold_times - hold_times
+        residuals.append(float(np.sqrt(np.mean(residual**2))))
+        print(f'virtual bus iteration {iteration}, residual {residuals[-1]:.3f}')
+        if residuals[-1] <= solver_config.tolerance:
+            hold_times = simulated_hold_times
+            converged = True
+            break
+
+        hold_time_history.append(simulated_hold_times)
+        residual_history.append(residual)
+        if solver_config.acceleration == 'anderson':
+            hold_times = _anderson_update(hold_times, hold_time_history[-solver_config.anderson_depth-1:],
+                                          residual_history[-solver_config.anderson_depth-1:], solver_config.damping)
+        else:
+            assert solver_config.acceleration == 'damped'
+            hold_times = hold_times + solver_config.damping * residual
+        # holding times cannot be negative
+        hold_times = np.maximum(hold_times, 0.0)
+
+    virtual_bus.update_trajectory(_to_route_stop_dict(route_stops, hold_times))
+    print(f'virtual bus {"converged" if converged else "did not converge"} '
+          f'in {len(residuals)} iterations, residuals {[round(r, 3) for r in residuals]}')
+    return VirtualBusSolution(len(residuals), residuals, converged)
+
+
+def _anderson_update(hold_times: np.ndarray, simulated_history: List[np.ndarray],
+                     residual_history: List[np.ndarray], damping: float) -> np.ndarray:
+    ''' The type-II Anderson update from the simulated holding times and residuals of the last iterations.
+
+    '''
+    residual = residual_history[-1]
+    if len(residual_history) == 1:
+        return hold_times + damping * residual
+    delta_residuals = np.diff(np.array(residual_history), axis=0).T
+    delta_simulated = np.diff(np.array(simulated_history), axis=0).T
+    gamma, *_ = np.linalg.lstsq(delta_residuals, residual, rcond=None)
+    return simulated_history[-1] - delta_simulated @ gamma - \
+        (1 - damping) * (residual - delta_residuals @ gamma)
+
+
+def _simulate_average_hold_time(agent: Agent, blueprint: Blueprint, replication_seeds: List[int],
+                                duration: int) -> Dict[str, Dict[str, float]]:
+    ''' Simulate the replications and get the average holding time at each stop for each route.
+
+    The replications run in lockstep if the agent and the blueprint support the batch simulator,
+    otherwise one by one.
+
+    '''
+    if agent.supports_batch_simulation and BatchSimulator.supports(blueprint):
+        batch_simulator = BatchSimulator(
+            blueprint, agent, len(replication_seeds), replication_seeds)
+        hold_times = np.zeros(0)
+        for t in range(duration):
+            batch_snapshot = batch_simulator.step(t, hold_times)
+            hold_times = agent.calculate_batch_hold_time(batch_snapshot)
+        return batch_simulator.get_stop_average_hold_time()
+
+    route_stop_replication_hold_times: Dict[Tuple[str, str], List[float]] = {}
+    for replication_seed in replication_seeds:
+        simulator = Simulator(blueprint, agent, replication_seed)
+        snapshot = simulator.step_to_decision(duration, {})
+        while snapshot is not None:
+            stop_bus_hold_action = agent.calculate_hold_time(snapshot)
+            snapshot = simulator.step_to_decision(
+                duration, stop_bus_hold_action)
+        for route_id, stop_hold_time in simulator.get_stop_average_hold_time().items():
+            for stop_id, hold_time in stop_hold_time.items():
+                route_stop_replication_hold_times.setdefault(
+                    (route_id, stop_id), []).append(hold_time)
+
+    route_stop_average_hold_time: Dict[str, Dict[str, float]] = {}
+    for (route_id, stop_id), replication_hold_times in route_stop_replication_hold_times.items():
+        route_stop_average_hold_time.setdefault(route_id, {})[
+            stop_id] = float(np.mean(replication_hold_times))
+    return route_stop_average_hold_time
+
+
+def _to_route_stop_dict(route_stops: List[Tuple[str, str]], values: np.ndarray) -> Dict[str, Dict[str, float]]:
+    route_stop_value: Dict[str, Dict[str, float]] = {}
+    for (route_id, stop_id), value in zip(route_stops, values.tolist()):
+        route_stop_value.setdefault(route_id, {})[stop_id] = value
+    return route_stop_value
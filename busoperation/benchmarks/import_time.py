@@ -0,0 +1,116 @@
+''' Benchmark the cold start of worker processes, and fail if it regresses.
+
+Each case runs in fresh interpreters from the `busoperation` directory. A case fails if it imports any of the
+heavy modules that it does not need, or if its median ratio to the reference case (a bare interpreter importing
+numpy) exceeds its budget, so that the budgets do not depend on the speed of the machine. The cases run in rounds,
+and each ratio is taken against the reference run of the same round, so that a change of the machine's load
+during the benchmark does not skew the ratios.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--update-budget]
+
+'''
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'import_time_budget.json')
+
+REFERENCE_CASE = 'reference'
+# case name -> the code run by a fresh interpreter
+CASES: Dict[str, str] = {
+    REFERENCE_CASE: 'import numpy',
+    'import_runner': 'import runner',
+    'import_sweep': 'import sweep.sweep',
+    'worker_homogeneous_one_route': ('import runner\n'
+                                     'from setup.blueprint import Blueprint\n'
+                                     'from setup.registry import create_agent\n'
+                                     "blueprint = Blueprint('homogeneous_one_route')\n"
+                                     "create_agent({'agent_name': 'Do_Nothing'}, blueprint)"),
+    'worker_cd_route_3': ('import runner\n'
+                          'from setup.blueprint import Blueprint\n'
+                          'from setup.registry import create_agent\n'
+                          "blueprint = Blueprint('cd_route_3')\n"
+                          "create_agent({'agent_name': 'Do_Nothing'}, blueprint)"),
+}
+# modules that no case needs: plotting, logging, deep learning and the pandas stack of the calibration build
+FORBIDDEN_MODULES = ('torch', 'wandb', 'matplotlib', 'pandas', 'scipy')
+# the budget of each case is its measured ratio to the reference times this headroom, when updated
+BUDGET_HEADROOM = 1.5
+
+
+def measure_case(code: str) -> Tuple[float, List[str]]:
+    ''' Run the code in a fresh interpreter.
+
+    Returns:
+        wall_time: the wall time of the interpreter, in seconds
+        forbidden_modules: the forbidden modules imported by the code
+
+    '''
+    report = (f'\nimport sys, json\n'
+              f'print(json.dumps([m for m in {FORBIDDEN_MODULES!r} if m in sys.modules]))')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code + report], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    wall_time = time.perf_counter() - start
+    return wall_time, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--update-budget', action='store_true',
+                        help='write the measured ratios (with headroom) as the new budgets')
+    args = parser.parse_args()
+
+    # warm the file system cache and the derived calibration store, which are not part of the cold start
+    for code in CASES.values():
+        measure_case(code)
+
+    case_times: Dict[str, List[float]] = {name: [] for name in CASES}
+    case_ratios: Dict[str, List[float]] = {name: [] for name in CASES}
+    case_forbidden: Dict[str, List[str]] = {}
+    for _ in range(args.repeat):
+        round_time = {}
+        for name, code in CASES.items():
+            round_time[name], case_forbidden[name] = measure_case(code)
+        for name, t in round_time.items():
+            case_times[name].append(t)
+            case_ratios[name].append(t / round_time[REFERENCE_CASE])
+    case_time = {name: statistics.median(times) for name, times in case_times.items()}
+    case_ratio = {name: statistics.median(ratios) for name, ratios in case_ratios.items()}
+
+    if args.update_budget:
+        budget = {name: round(ratio * BUDGET_HEADROOM, 2)
+                  for name, ratio in case_ratio.items() if name != REFERENCE_CASE}
+        with open(BUDGET_PATH, 'w') as file:
+            json.dump(budget, file, indent=4)
+            file.write('\n')
+    with open(BUDGET_PATH, 'r') as file:
+        budget = json.load(file)
+
+    failed = False
+    print(f'{"case":<32}{"time (ms)":>12}{"ratio":>10}{"budget":>10}')
+    for name in CASES:
+        status = ''
+        if name != REFERENCE_CASE:
+            if case_ratio[name] > budget[name]:
+                status = 'SLOW'
+            if len(case_forbidden[name]) > 0:
+                status = f'IMPORTS {", ".join(case_forbidden[name])}'
+        failed = failed or status != ''
+        print(f'{name:<32}{case_time[name]*1000:>12.1f}{case_ratio[name]:>10.2f}'
+              f'{budget.get(name, float("nan")):>10.2f}  {status}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
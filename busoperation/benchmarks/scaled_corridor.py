@@ -0,0 +1,116 @@
+''' Scaled variants of the homogeneous corridor, for benchmarking the engine beyond the built-in environments.
+
+A variant is a straight corridor with the stops, links and demand of `homogeneous_one_route`, but with any number
+of stops, and with any number of routes that all run the whole corridor on the same schedule headway.
+
+'''
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Dict, Tuple
+
+from setup.config_dataclass import TerminalNodeGeometry, StopNodeGeometry, LinkGeometry, LinkDistribution
+from setup.network import Network
+from setup.route import RouteInfo
+from setup.registry import EnvSpec, register_env, ENV_SPECS
+
+
+BERTH_NUM = 3
+PAX_ARRIVAL_RATE = 1.5 / 60  # pax per second of each route at each stop
+SPACING = 1000  # meters
+SPEED = 20.0  # m/s
+TT_CV = 0.5
+BOARDING_RATE = 1 / 2.0  # pax per second
+
+
+@dataclass(frozen=True)
+class ScaledCorridorConfig:
+    ''' The size of a scaled corridor.
+
+    Attributes:
+        stop_num: the number of stops, excluding the terminals
+        route_num: the number of routes
+        headway: the schedule headway of every route, in seconds
+
+    '''
+    stop_num: int
+    route_num: int
+    headway: float
+
+    @property
+    def env_name(self) -> str:
+        return f'scaled_corridor_s{self.stop_num}_r{self.route_num}_h{int(self.headway)}'
+
+
+class ScaledCorridorNetwork(Network):
+    def __init__(self, config: ScaledCorridorConfig) -> None:
+        self._stop_num = config.stop_num
+        super().__init__()
+
+    def _define_network(self):
+        node_ids = [str(node_id) for node_id in range(self._stop_num+2)]
+        for idx, node_id in enumerate(node_ids):
+            x = idx * SPACING
+            if idx == 0 or idx == len(node_ids) - 1:
+                self._G.add_node(node_id, node_type='terminal',
+                                 terminal_node_geometry=TerminalNodeGeometry(x, 0))
+            else:
+                self._G.add_node(node_id, node_type='stop',
+                                 stop_node_geometry=StopNodeGeometry(x, 0, BERTH_NUM, x))
+            self._name_coordinates[node_id] = (x, 0)
+
+        link_distribution = LinkDistribution(SPACING / SPEED, TT_CV, 'normal')
+        for link_id, (head_node, tail_node) in enumerate(zip(node_ids[:-1], node_ids[1:])):
+            distance_cum = link_id * SPACING
+            link_geometry = LinkGeometry(
+                head_node, tail_node, distance_cum, 0, SPACING, distance_cum)
+            self._G.add_edge(head_node, tail_node, link_id=link_id,
+                             link_geometry=link_geometry, link_distribution=link_distribution)
+
+
+class ScaledCorridorRouteInfo(RouteInfo):
+    def __init__(self, config: ScaledCorridorConfig) -> None:
+        self._config = config
+        self._route_id_list = [str(route_id)
+                               for route_id in range(config.route_num)]
+        self._visit_seq_stops = [str(stop_id)
+                                 for stop_id in range(1, config.stop_num+1)]
+        super().__init__()
+
+    def _define_od_table(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        # as in the homogeneous corridor, all the passengers travel to the last stop
+        last_stop = self._visit_seq_stops[-1]
+        od_rate_table: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for origin_stop in self._visit_seq_stops[:-1]:
+            od_rate_table[origin_stop][last_stop] = PAX_ARRIVAL_RATE
+        return {route_id: dict(od_rate_table) for route_id in self._route_id_list}
+
+    def _define_route_ids(self) -> List[str]:
+        return self._route_id_list
+
+    def _define_schedule_headway(self) -> Dict[str, Tuple[float, float]]:
+        return {route_id: (self._config.headway, 0) for route_id in self._route_id_list}
+
+    def _define_terminal(self) -> Dict[str, str]:
+        return {route_id: '0' for route_id in self._route_id_list}
+
+    def _define_visit_seq_stops(self) -> Dict[str, List[str]]:
+        return {route_id: self._visit_seq_stops for route_id in self._route_id_list}
+
+    def _define_end_terminal(self) -> Dict[str, str]:
+        return {route_id: str(self._config.stop_num+1) for route_id in self._route_id_list}
+
+    def _define_boarding_rate(self) -> Dict[str, Dict[str, float]]:
+        return {route_id: {stop_id: BOARDING_RATE for stop_id in self._visit_seq_stops}
+                for route_id in self._route_id_list}
+
+
+def register_scaled_corridor(config: ScaledCorridorConfig) -> str:
+    ''' Register the scaled corridor as an environment (if not yet), and return its env name.
+
+    '''
+    if config.env_name not in ENV_SPECS:
+        register_env(config.env_name, EnvSpec('benchmarks.scaled_corridor:ScaledCorridorNetwork',
+                                              'benchmarks.scaled_corridor:ScaledCorridorRouteInfo',
+                                              'setup.homo_one_route_factory:HomoOneRouteComponentsFactory',
+                                              config))
+    return config.env_name
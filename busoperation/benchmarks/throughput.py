@@ -0,0 +1,299 @@
+''' Benchmark the throughput of the simulation engine, and fail if it regresses against the stored baseline.
+
+Each case runs one agent on one environment in fresh interpreters from the `busoperation` directory, and reports
+the steps per second and the episodes per hour of its episodes, and the peak RSS of the process, of the fastest of
+`--repeat` runs. The construction of the blueprint and the agent (e.g., the warm-up of the virtual bus) is timed
+apart from the episodes.
+
+The cases are the built-in environments with each agent, the registered synthetic networks (see `setup.synthetic`),
+and scaled corridors (see `scaled_corridor`) whose number of stops, number of routes and headway are varied
+one at a time from 100 stops, 1 route and 300 seconds. The cases suffixed with '@event' run on the event-driven
+engine (see `simulator.event_simulator`) whatever the `--engine`, to compare with the same case on the step engine.
+Cases of agents whose dependencies are not installed (e.g., torch for DDPG) are skipped.
+
+The results are written to a JSON file. A case fails if its steps per second drop by more than `--max-slowdown`,
+or its peak RSS grows by more than `--max-rss-growth`, relative to the baseline. The baseline is absolute,
+so it should be updated on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/throughput.py [--cases 'scaled_*'] [--step-num 10800] [--episode-num 1] [--engine step]
+                                    [--repeat 3] [--max-slowdown 0.25] [--max-rss-growth 0.25] [--update-baseline]
+
+'''
+from typing import Dict, Any, Optional
+from dataclasses import dataclass
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.scaled_corridor import ScaledCorridorConfig, register_scaled_corridor  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'throughput_baseline.json')
+RESULT_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'results', 'throughput.json')
+
+BUILT_IN_ENVS = ('homogeneous_one_route', 'cd_route_3')
+AGENTS = ('Do_Nothing', 'Simple_Control', 'DDPG')
+SYNTHETIC_ENVS = ('synthetic_corridor', 'synthetic_grid')
+# the scaled corridors vary one dimension at a time from 100 stops, 1 route and a headway of 300 seconds
+SCALED_STOP_NUMS = (25, 100, 400)
+SCALED_ROUTE_NUMS = (1, 5, 20)
+SCALED_HEADWAYS = (300, 120, 60)
+# DDPG is tied to the geometry of the built-in environments. On the scaled corridors, Simple_Control only runs on the corridors of at most
+# 100 stops and 5 routes: the 3-hour warm-up of its virtual bus does not reach the end of longer corridors,
+# and its headway check assumes that the buses of a route keep their order, which fails when 20 routes queue
+# at the stops together
+GENERATED_ENV_AGENTS = ('Do_Nothing', 'Simple_Control')
+# the environments whose cases are also run on the event-driven engine, whose gain grows with the idle time between
+# the decisions
+EVENT_ENGINE_ENVS = ('homogeneous_one_route', 'synthetic_corridor')
+SCALED_CONTROL_MAX_STOP_NUM = 100
+SCALED_CONTROL_MAX_ROUTE_NUM = 5
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    ''' One agent on one environment.
+
+    Attributes:
+        name: '<env>/<agent>'
+        agent_name: the registered name of the agent
+        env_name: the registered name of the environment, None for a scaled corridor
+        scaled_corridor: the size of the scaled corridor, None for a registered environment
+        engine: the engine that the case always runs on, None to run on `--engine`
+
+    '''
+    name: str
+    agent_name: str
+    env_name: Optional[str] = None
+    scaled_corridor: Optional[ScaledCorridorConfig] = None
+    engine: Optional[str] = None
+
+
+def get_cases() -> Dict[str, BenchmarkCase]:
+    cases: Dict[str, BenchmarkCase] = {}
+    for env_name in BUILT_IN_ENVS:
+        for agent_name in AGENTS:
+            cases[f'{env_name}/{agent_name}'] = BenchmarkCase(
+                f'{env_name}/{agent_name}', agent_name, env_name=env_name)
+    for env_name in SYNTHETIC_ENVS:
+        for agent_name in GENERATED_ENV_AGENTS:
+            cases[f'{env_name}/{agent_name}'] = BenchmarkCase(
+                f'{env_name}/{agent_name}', agent_name, env_name=env_name)
+    for env_name in EVENT_ENGINE_ENVS:
+        for agent_name in GENERATED_ENV_AGENTS:
+            name = f'{env_name}/{agent_name}@event'
+            cases[name] = BenchmarkCase(
+                name, agent_name, env_name=env_name, engine='event')
+
+    scaled_configs = [ScaledCorridorConfig(stop_num, 1, 300) for stop_num in SCALED_STOP_NUMS] + \
+        [ScaledCorridorConfig(100, route_num, 300) for route_num in SCALED_ROUTE_NUMS] + \
+        [ScaledCorridorConfig(100, 1, headway)
+         for headway in SCALED_HEADWAYS]
+    for scaled_config in scaled_configs:
+        for agent_name in GENERATED_ENV_AGENTS:
+            if agent_name == 'Simple_Control' and (scaled_config.stop_num > SCALED_CONTROL_MAX_STOP_NUM or
+                                                   scaled_config.route_num > SCALED_CONTROL_MAX_ROUTE_NUM):
+                continue
+            name = f'{scaled_config.env_name}/{agent_name}'
+            cases[name] = BenchmarkCase(
+                name, agent_name, scaled_corridor=scaled_config)
+    return cases
+
+
+def run_case(case: BenchmarkCase, step_num: int, episode_num: int, engine: str, seed: int) -> Dict[str, Any]:
+    ''' Run the episodes of a case in this process and measure them.
+
+    Returns:
+        result: {'setup_time', 'episode_time' (sec), 'steps_per_second', 'episodes_per_hour', 'peak_rss_mb'},
+            or {'skipped': reason} if the agent cannot be imported
+
+    '''
+    import numpy as np
+    import yaml
+    from runner import run_episode, spawn_episode_seeds
+    from setup.blueprint import Blueprint
+    from setup.registry import create_agent
+
+    with open(os.path.join(ROOT, 'config.yaml'), 'r') as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    env_name = case.env_name if case.scaled_corridor is None \
+        else register_scaled_corridor(case.scaled_corridor)
+    if case.agent_name == 'Do_Nothing':
+        agent_config: Dict[str, Any] = {}
+    elif case.agent_name == 'Simple_Control':
+        agent_config = dict(config['model_based_agent_config'])
+    else:
+        agent_config = dict(config['RL_agent_config'])
+    agent_config.update({'agent_name': case.agent_name, 'env': env_name})
+
+    np.random.seed(seed)
+    start = time.perf_counter()
+    blueprint = Blueprint(env_name)
+    try:
+        agent = create_agent(agent_config, blueprint)
+    except ModuleNotFoundError as error:
+        return {'skipped': f'{error.name} is not installed'}
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for episode, episode_seed in enumerate(spawn_episode_seeds(seed, episode_num)):
+        np.random.seed(episode_seed)
+        run_episode(blueprint, step_num, agent, engine, episode_seed)
+        agent.reset(episode)
+    episode_time = time.perf_counter() - start
+
+    return {'setup_time': setup_time, 'episode_time': episode_time,
+            'steps_per_second': step_num * episode_num / episode_time,
+            'episodes_per_hour': 3600 * episode_num / episode_time,
+            'peak_rss_mb': _get_peak_rss_mb()}
+
+
+def measure_case(case: BenchmarkCase, step_num: int, episode_num: int, engine: str, seed: int,
+                 repeat: int) -> Dict[str, Any]:
+    ''' Run a case in `repeat` fresh interpreters, so that its peak RSS is not shared with the other cases,
+    and get the result of the fastest run.
+
+    '''
+    if case.engine is not None:
+        engine = case.engine
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', case.name, '--step-num', str(step_num),
+               '--episode-num', str(episode_num), '--engine', engine, '--seed', str(seed)]
+    results = []
+    for _ in range(repeat):
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1]}
+        # the agents print while running, the result is the last line
+        results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return max(results, key=lambda result: result.get('steps_per_second', 0))
+
+
+def compare_with_baseline(case_result: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+                          max_slowdown: float, max_rss_growth: float) -> Dict[str, str]:
+    ''' Get the status of each case: '' if it passes, otherwise the reason that it fails.
+
+    '''
+    case_status: Dict[str, str] = {}
+    for name, result in case_result.items():
+        if 'error' in result:
+            case_status[name] = f'ERROR {result["error"]}'
+            continue
+        if 'skipped' in result or name not in baseline['cases']:
+            case_status[name] = ''
+            continue
+        case_baseline = baseline['cases'][name]
+        reasons = []
+        if result['steps_per_second'] < case_baseline['steps_per_second'] * (1 - max_slowdown):
+            reasons.append('SLOW')
+        if result['peak_rss_mb'] > case_baseline['peak_rss_mb'] * (1 + max_rss_growth):
+            reasons.append('RSS')
+        case_status[name] = ' '.join(reasons)
+    return case_status
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='*', default=['*'],
+                        help='glob patterns of the case names to run')
+    parser.add_argument('--list', action='store_true',
+                        help='list the case names and exit')
+    parser.add_argument('--step-num', type=int, default=10800)
+    parser.add_argument('--episode-num', type=int, default=1)
+    parser.add_argument('--engine', choices=['step', 'event'], default='step')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='the number of runs of each case, the fastest is kept')
+    parser.add_argument('--output', default=RESULT_PATH)
+    parser.add_argument('--max-slowdown', type=float, default=0.25,
+                        help='the largest accepted drop of the steps per second, as a fraction of the baseline')
+    parser.add_argument('--max-rss-growth', type=float, default=0.25,
+                        help='the largest accepted growth of the peak RSS, as a fraction of the baseline')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='write the results of the cases run as their new baselines')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cases = get_cases()
+    if args.run_case is not None:
+        result = run_case(cases[args.run_case], args.step_num,
+                          args.episode_num, args.engine, args.seed)
+        print(json.dumps(result))
+        return 0
+
+    names = [name for name in cases
+             if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    settings = {'step_num': args.step_num,
+                'episode_num': args.episode_num, 'engine': args.engine}
+    case_result: Dict[str, Dict[str, Any]] = {}
+    for name in names:
+        case_result[name] = measure_case(
+            cases[name], args.step_num, args.episode_num, args.engine, args.seed, args.repeat)
+
+    baseline: Dict[str, Any] = {'settings': settings, 'cases': {}}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r') as file:
+            baseline = json.load(file)
+    assert args.update_baseline or baseline['settings'] == settings, \
+        f'the baseline was measured with {baseline["settings"]}, run with the same settings or update the baseline'
+    if args.update_baseline:
+        if baseline['settings'] != settings:
+            baseline = {'settings': settings, 'cases': {}}
+        for name, result in case_result.items():
+            if 'steps_per_second' in result:
+                baseline['cases'][name] = {'steps_per_second': round(result['steps_per_second'], 1),
+                                           'peak_rss_mb': round(result['peak_rss_mb'], 1)}
+        with open(BASELINE_PATH, 'w') as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+            file.write('\n')
+
+    case_status = compare_with_baseline(
+        case_result, baseline, args.max_slowdown, args.max_rss_growth)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump({'machine': _get_machine_info(), 'settings': settings,
+                   'thresholds': {'max_slowdown': args.max_slowdown, 'max_rss_growth': args.max_rss_growth},
+                   'cases': {name: dict(result, status=case_status[name]) for name, result in case_result.items()}},
+                  file, indent=4)
+        file.write('\n')
+
+    print(f'{"case":<48}{"steps/s":>10}{"baseline":>10}{"episodes/h":>12}{"setup (s)":>11}{"rss (MB)":>10}')
+    for name, result in case_result.items():
+        if 'steps_per_second' not in result:
+            print(f'{name:<48}  {case_status[name] or "SKIPPED " + result["skipped"]}')
+            continue
+        baseline_steps = baseline['cases'].get(name, {}).get('steps_per_second', float('nan'))
+        print(f'{name:<48}{result["steps_per_second"]:>10.0f}{baseline_steps:>10.0f}'
+              f'{result["episodes_per_hour"]:>12.0f}{result["setup_time"]:>11.1f}{result["peak_rss_mb"]:>10.1f}'
+              f'  {case_status[name]}')
+    return 1 if any(status != '' for status in case_status.values()) else 0
+
+
+def _get_peak_rss_mb() -> float:
+    # kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def _get_machine_info() -> Dict[str, Any]:
+    return {'platform': platform.platform(), 'python': platform.python_version(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count()}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
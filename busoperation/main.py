@@ -1,47 +1,75 @@
+from typing import Tuple
 import numpy as np
 import random
-import torch
 # import wandb
 import yaml
 from runner import run
+from run_cache import RunCache, cached_run
 from setup.blueprint import Blueprint
-# from agent.xuan_nonlinear import XuanNonlinear
-# from agent.simple_control_nonlinear import SimpleControlNonlinear
-# from agent.do_nothing import DoNothing
-from agent.model_based.xuan_nonlinear import XuanNonlinear
-from agent.model_based.simple_control_nonlinear import SimpleControlNonlinear
-from agent.rl.ddpg_headway import DDPG
+from setup.config_dataclass import TracerConfig
+# the agents are resolved by name, so torch is only imported for the RL agent
+from setup.registry import create_agent
+from simulator.profiler import PhaseProfiler
+from agent.agent import Agent
 
-file = open('config.yaml', 'r')
-config = yaml.load(file, Loader=yaml.FullLoader)
-file.close()
+# the guard keeps worker processes of parallel episodes from re-running the script
+if __name__ == '__main__':
+    file = open('config.yaml', 'r')
+    config = yaml.load(file, Loader=yaml.FullLoader)
+    file.close()
 
-seed = config['train_config']['seed']
-np.random.seed(seed)
-random.seed(seed)
+    seed = config['train_config']['seed']
+    np.random.seed(seed)
+    random.seed(seed)
 
 
-env_name = config['env_name']
-blueprint = Blueprint(env_name)
-use_model_based_model = config['agent_type']
+    env_name = config['env_name']
+    use_model_based_model = config['agent_type']
 
-episode_num = config['train_config']['episode_num']
-step_num = config['train_config']['step_num']
+    episode_num = config['train_config']['episode_num']
+    step_num = config['train_config']['step_num']
+    engine = config['train_config']['engine']
+    num_workers = config['train_config']['num_workers']
+    tracer_config = TracerConfig(**config['tracer_config'])
 
-if use_model_based_model:
-    agent_config = config['model_based_agent_config']
+    if use_model_based_model:
+        agent_name = 'Simple_Control'
+        agent_config = config['model_based_agent_config']
+    else:
+        agent_name = 'DDPG_Headway'
+        agent_config = config['RL_agent_config']
     agent_config['env'] = env_name
-    agent = SimpleControlNonlinear(agent_config, blueprint)
 
-else:
-    torch.random.manual_seed(seed)
-    agent_config = config['RL_agent_config']
-    agent_config['env'] = env_name
+    def build_blueprint_agent() -> Tuple[Blueprint, Agent]:
+        # the agent is built only when the run is simulated, e.g., the virtual bus is warmed up here
+        blueprint = Blueprint(env_name)
+        if not use_model_based_model:
+            import torch
+            torch.random.manual_seed(seed)
+        return blueprint, create_agent(agent_config, blueprint, agent_name)
 
-    agent = DDPG(agent_config, blueprint)
 
+    profiler = None
+    profile_trace_path = config['train_config'].get('profile_trace_path')
+    if config['train_config'].get('profile', False):
+        profiler = PhaseProfiler(timeline=profile_trace_path is not None)
 
-#
-name_metric = run(blueprint, episode_num, step_num, agent)
+    # a profiled run is never served from the cache
+    if config['train_config']['use_cache'] and profiler is None:
+        run_cache = RunCache(config['train_config']['cache_dir'],
+                             config['train_config']['cache_max_mb'] * 1024 * 1024)
+        run_config = {'env_name': env_name, 'agent_type': use_model_based_model,
+                      'agent_name': agent_name, 'agent_config': agent_config}
+        name_metric = cached_run(run_cache, run_config, build_blueprint_agent, episode_num, step_num, engine,
+                                 num_workers=num_workers, master_seed=seed, tracer_config=tracer_config)
+    else:
+        blueprint, agent = build_blueprint_agent()
+        name_metric = run(blueprint, episode_num, step_num, agent, engine,
+                          num_workers=num_workers, master_seed=seed, profiler=profiler,
+                          tracer_config=tracer_config)
 
-print(name_metric)
+    print(name_metric)
+    if profiler is not None:
+        print(profiler.format_summary())
+        if profile_trace_path is not None:
+            profiler.write_trace(profile_trace_path)
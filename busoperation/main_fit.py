@@ -7,7 +7,7 @@ import wandb
 from busoperation.agent.do_nothing import DoNothing
 from agent.xuan_nonlinear import XuanNonlinear
 from runner import run
-from setup.calibration.dataloader import DataLoader
+from setup.calibration.calibration_store import get_calibration_store
 from setup.blueprint import Blueprint
 
 seed = 0
@@ -28,7 +28,7 @@ print(name_metrics)
 print(route_trip_times)
 
 simulate_trip_times = route_trip_times['0']
-real_trip_times = DataLoader().trip_times
+real_trip_times = get_calibration_store().trip_times
 
 # Fit the simulated and real distributions
 params_simulated = norm.fit(simulate_trip_times)
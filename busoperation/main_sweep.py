@@ -0,0 +1,14 @@
+import yaml
+
+from setup.config_dataclass import SweepConfig
+from sweep.sweep import run_sweep
+
+# the guard keeps worker processes of the sweep from re-running the script
+if __name__ == '__main__':
+    file = open('config.yaml', 'r')
+    config = yaml.load(file, Loader=yaml.FullLoader)
+    file.close()
+
+    sweep_config = SweepConfig(**config['sweep_config'])
+    run_ids = run_sweep(sweep_config, config['model_based_agent_config'])
+    print(f'{len(run_ids)} runs are added to {sweep_config.store_path}')
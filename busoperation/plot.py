@@ -1,9 +1,9 @@
-import wandb
 import matplotlib.pyplot as plt
 from typing import Dict, Any
 
-api = wandb.Api()
-entity = 'samuel'
+from sweep.results_store import ResultsStore
+
+store = ResultsStore('results/sweep.sqlite')
 
 
 filt: Dict[str, Any] = {'config.agent': 'Xuan_Nonlinear',
@@ -26,8 +26,7 @@ for f0 in [-1.0, -0.9]:
                           'config.base_type': base_type}
             filt.update(extra_filt)
 
-            runs = api.runs(entity + '/' + 'bunching', filters=filt)
-            run_summary = runs[0].summary
+            run_summary = store.get_summary('bunching', filters=filt)
 
             hold_time = run_summary['route-0\'s holding time']
             arrival_headway = run_summary['route-0\'s arrival headway std']
@@ -1,8 +1,8 @@
-import wandb
 import matplotlib.pyplot as plt
 
-api = wandb.Api()
-entity = 'samuel'
+from sweep.results_store import ResultsStore
+
+store = ResultsStore('results/sweep.sqlite')
 
 
 filt = {'config.agent': 'Xuan_Nonlinear'}
@@ -27,8 +27,7 @@ for base_stop in ['current']:
                               'config.base_stop': base_stop}
                 filt.update(extra_filt)
 
-                runs = api.runs(entity + '/' + 'bus-operation', filters=filt)
-                run_summary = runs[0].summary
+                run_summary = store.get_summary('bus-operation', filters=filt)
 
                 hold_time = run_summary['route-0\'s holding time']
                 arrival_epsilon = run_summary['route-0\'s arrival epsilon']
@@ -1,9 +1,9 @@
-import wandb
 import matplotlib.pyplot as plt
 from typing import Dict, Any
 
-api = wandb.Api()
-entity = 'samuel'
+from sweep.results_store import ResultsStore
+
+store = ResultsStore('results/sweep.sqlite')
 
 
 filt: Dict[str, Any] = {'config.agent': 'Xuan_Nonlinear'}
@@ -25,8 +25,7 @@ for env in ['homogeneous_one_route_s1', 'homogeneous_one_route_s2', 'homogeneous
         extra_filt = {'config.slack': slack, 'config.env': env}
         filt.update(extra_filt)
 
-        runs = api.runs(entity + '/' + 'bus-operation', filters=filt)
-        run_summary = runs[0].summary
+        run_summary = store.get_summary('bus-operation', filters=filt)
 
         hold_time = run_summary['route-0\'s holding time']
         arrival_headway = run_summary['route-0\'s arrival headway std']
@@ -1,9 +1,9 @@
-import wandb
 import matplotlib.pyplot as plt
 from typing import Dict, Any
 
-api = wandb.Api()
-entity = 'samuel'
+from sweep.results_store import ResultsStore
+
+store = ResultsStore('results/sweep.sqlite')
 
 
 filt: Dict[str, Any] = {'config.agent': 'Xuan_Nonlinear'}
@@ -28,8 +28,7 @@ for scenario in [1, 2, 3]:
                       'config.slack': slack, 'config.scenario': scenario}
         filt.update(extra_filt)
 
-        runs = api.runs(entity + '/' + 'bus-operation', filters=filt)
-        run_summary = runs[0].summary
+        run_summary = store.get_summary('bus-operation', filters=filt)
 
         hold_time = run_summary['route-0\'s holding time']
         arrival_headway = run_summary['route-0\'s arrival headway std']
@@ -0,0 +1,127 @@
+from typing import Dict, List, Tuple, Any, Optional, Literal, Callable
+import hashlib
+import json
+import glob
+import os
+
+from runner import run
+from setup.fingerprint import get_code_fingerprint
+from setup.blueprint import Blueprint
+from setup.config_dataclass import TracerConfig
+from agent.agent import Agent
+
+
+class RunCache:
+    ''' A content-addressed cache of run results on local disk.
+
+    An entry is keyed by the hash of the full resolved configuration of a run together with the code fingerprint,
+    so editing the simulator, the setup or the agents invalidates all the entries.
+    Each entry is a small JSON file. When the total size exceeds `max_size_bytes`,
+    the least recently used entries are evicted.
+
+    Args:
+        cache_dir: the directory of the entries, created if it does not exist
+        max_size_bytes: the maximum total size of the entries
+
+    Methods:
+        make_key(self, run_config: Dict[str, Any]) -> str
+        get(self, key: str) -> Optional[Tuple[Dict[str, float], Dict[str, List[float]]]]
+        put(self, key: str, name_value: Dict[str, float], route_trip_times: Dict[str, List[float]]) -> None
+
+    '''
+    _cache_dir: str
+    _max_size_bytes: int
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 256 * 1024 * 1024) -> None:
+        self._cache_dir = cache_dir
+        self._max_size_bytes = max_size_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, run_config: Dict[str, Any]) -> str:
+        payload = json.dumps({'config': run_config, 'code': get_code_fingerprint()},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, float], Dict[str, List[float]]]]:
+        ''' Get the metrics and the trip times of an entry, or None if there is no such entry.
+
+        '''
+        path = self._get_path(key)
+        try:
+            with open(path, 'r') as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # mark the entry as recently used
+        os.utime(path)
+        return entry['name_value'], entry['route_trip_times']
+
+    def put(self, key: str, name_value: Dict[str, float], route_trip_times: Dict[str, List[float]]) -> None:
+        entry = {'name_value': {name: float(value) for name, value in name_value.items()},
+                 'route_trip_times': {route_id: [float(trip_time) for trip_time in trip_times]
+                                      for route_id, trip_times in route_trip_times.items()}}
+        path = self._get_path(key)
+        # write to a temporary file first, so that a concurrent reader never sees a partial entry
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f'{key}.json')
+
+    def _evict(self) -> None:
+        entries = []
+        for path in glob.glob(os.path.join(self._cache_dir, '*.json')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+def cached_run(run_cache: RunCache, run_config: Dict[str, Any],
+               build_blueprint_agent: Callable[[], Tuple[Blueprint, Agent]], episode_num: int,
+               episode_duration: int, engine: Literal['step', 'event'] = 'step',
+               num_workers: int = 1, master_seed: Optional[int] = None,
+               tracer_config: TracerConfig = TracerConfig()) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+    ''' `runner.run` that returns the stored results without simulating if the same run has been cached.
+
+    Only seeded runs are cached, as the results of unseeded runs are not reproducible.
+    The number of workers and the tracer config are not part of the key, as they do not change the results of a seeded run.
+    The key only depends on the configs and the code, so on a hit neither the blueprint nor the agent is built
+    (e.g., the virtual bus is not warmed up), and an RL agent is not trained and no trajectory is plotted.
+
+    Args:
+        run_config: the full resolved configuration that the blueprint and the agent are built from,
+            e.g., the env name, the agent name and the agent config
+        build_blueprint_agent: builds the blueprint and the agent of the run, only called on a miss
+
+    '''
+    if master_seed is None:
+        blueprint, agent = build_blueprint_agent()
+        return run(blueprint, episode_num, episode_duration, agent, engine, num_workers,
+                   tracer_config=tracer_config)
+
+    key = run_cache.make_key({'run_config': run_config, 'episode_num': episode_num,
+                              'episode_duration': episode_duration, 'engine': engine, 'master_seed': master_seed})
+    cached_result = run_cache.get(key)
+    if cached_result is not None:
+        print(f'results of the run are loaded from the cache, key {key}')
+        return cached_result
+
+    blueprint, agent = build_blueprint_agent()
+    name_value, route_trip_times = run(blueprint, episode_num, episode_duration, agent, engine,
+                                       num_workers=num_workers, master_seed=master_seed, tracer_config=tracer_config)
+    run_cache.put(key, name_value, route_trip_times)
+    return name_value, route_trip_times
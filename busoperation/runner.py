@@ -1,46 +1,217 @@
 import numpy as np
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Literal, Optional, Any, Callable
 from collections import defaultdict
-import matplotlib.pyplot as plt
-import wandb
+from concurrent.futures import ProcessPoolExecutor
 
+from simulator.base_simulator import BaseSimulator
 from simulator.simulator import Simulator
+from simulator.event_simulator import EventSimulator
+from simulator.snapshot import Snapshot
+from simulator.batch_simulator import BatchSimulator
 from simulator.trajectory import plot_time_space_diagram
+from simulator.profiler import PhaseProfiler
 from setup.blueprint import Blueprint
+from setup.config_dataclass import TracerConfig
 from agent.agent import Agent
 
-def run(blueprint: Blueprint, episode_num: int, episode_duration: int, agent: Agent) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
-    name_episode_metrics: Dict[str, List[float]] = defaultdict(list)
-    route_trip_times: Dict[str, List[float]] = defaultdict(list)
+def run_episode(blueprint: Blueprint, episode_duration: int, agent: Agent,
+                engine: Literal['step', 'event'] = 'step', seed: Optional[int] = None,
+                profiler: Optional[PhaseProfiler] = None,
+                tracer_config: TracerConfig = TracerConfig()) -> BaseSimulator:
+    ''' Run one episode and return the finished simulator.
+
+    Args:
+        engine: 'step' moves the simulation forward every second, 'event' jumps between bus events,
+            both only call the agent when some buses wait for holding actions
+        seed: seed of the link travel time and boarding time streams, drawn from numpy's global state if None
+        profiler: if given, times the phases of the simulator, 'agent.calculate_hold_time' and 'agent.learn'
+        tracer_config: how the simulator takes snapshots and records trajectories
+
+    '''
+    calculate_hold_time = agent.calculate_hold_time
+    if profiler is not None:
+        calculate_hold_time = profiler.wrap(
+            'agent.calculate_hold_time', calculate_hold_time)
+        # `learn` is called by the agent itself, so it is wrapped on the instance for this episode
+        if hasattr(agent, 'learn'):
+            setattr(agent, 'learn', profiler.wrap('agent.learn', getattr(agent, 'learn')))
+    try:
+        return _run_episode(blueprint, episode_duration, agent, calculate_hold_time, engine, seed, profiler,
+                            tracer_config)
+    finally:
+        if profiler is not None and 'learn' in vars(agent):
+            delattr(agent, 'learn')
+
+
+def _run_episode(blueprint: Blueprint, episode_duration: int, agent: Agent,
+                 calculate_hold_time: Callable[[Snapshot], Dict[Tuple[str, str, str], float]],
+                 engine: Literal['step', 'event'], seed: Optional[int],
+                 profiler: Optional[PhaseProfiler], tracer_config: TracerConfig) -> BaseSimulator:
+    simulator: BaseSimulator
+    if engine == 'event':
+        simulator = EventSimulator(blueprint, agent, seed, tracer_config, profiler)
+    else:
+        assert engine == 'step'
+        simulator = Simulator(blueprint, agent, seed, tracer_config, profiler)
+    # the agent is only called at decision epochs, i.e., when some buses wait for holding actions
+    snapshot = simulator.step_to_decision(episode_duration, {})
+    while snapshot is not None:
+        stop_bus_hold_action = calculate_hold_time(snapshot)
+        snapshot = simulator.step_to_decision(
+            episode_duration, stop_bus_hold_action)
+    return simulator
+
+
+def run_replications(blueprint: Blueprint, replication_num: int, episode_duration: int, agent: Agent,
+                     seeds: Optional[List[int]] = None) -> List[Tuple[Dict[str, float], Dict[str, Dict[int, int]]]]:
+    ''' Run independent replications of one episode and return the results of each replication.
+
+    The replications run in lockstep by `BatchSimulator` if the agent supports `calculate_batch_hold_time`
+    and the blueprint has no common-line OD pairs, otherwise one by one on the step engine.
+
+    Args:
+        seeds: seed of the link travel time and boarding time streams of each replication,
+            drawn from numpy's global state if None
+
+    Returns:
+        replication_results: [(metrics, route_dispatch_time_trip_time)] of each replication, as `Simulator.get_metrics`
+
+    '''
+    if not (agent.supports_batch_simulation and BatchSimulator.supports(blueprint)):
+        replication_seeds: List[Optional[int]] = [None] * replication_num if seeds is None else list(seeds)
+        replication_results = []
+        for replication, seed in enumerate(replication_seeds):
+            replication_results.append(summarize_episode(
+                run_episode(blueprint, episode_duration, agent, 'step', seed)))
+            agent.reset(replication)
+        return replication_results
+
+    batch_simulator = BatchSimulator(blueprint, agent, replication_num, seeds)
+    hold_times = np.zeros(0)
+    for t in range(episode_duration):
+        batch_snapshot = batch_simulator.step(t, hold_times)
+        hold_times = agent.calculate_batch_hold_time(batch_snapshot)
+    return batch_simulator.get_metrics()
+
+
+def spawn_episode_seeds(master_seed: int, episode_num: int) -> List[int]:
+    ''' Spawn an independent seed for each episode from the master seed.
+
+    The seed of an episode only depends on the master seed and the episode index.
+
+    '''
+    seed_sequences = np.random.SeedSequence(master_seed).spawn(episode_num)
+    return [int(seed_sequence.generate_state(1)[0]) for seed_sequence in seed_sequences]
 
-    for epsisode in range(episode_num):
-        simulator = Simulator(blueprint, agent)
-        stop_bus_hold_action: Dict[Tuple[str, str, str], float] = {}
 
-        for t in range(episode_duration):
-            snapshot = simulator.step(t, stop_bus_hold_action)
-            stop_bus_hold_action = agent.calculate_hold_time(snapshot)
+def summarize_episode(simulator: BaseSimulator) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]:
+    ''' Get the compact results of a finished episode: the metrics and the trip times of buses.
 
-        metrics, route_dispatch_time_trip_time = simulator.get_metrics()
-        for name, metric in metrics.items():
-            name_episode_metrics[name].append(metric)
+    '''
+    metrics, route_dispatch_time_trip_time = simulator.get_metrics()
+    return metrics, route_dispatch_time_trip_time
 
-        for route, dispatch_time_trip_time in route_dispatch_time_trip_time.items():
-            for dispatch_time, trip_time in dispatch_time_trip_time.items():
-                if dispatch_time < 3600:
-                    route_trip_times[route].append(trip_time)
-        route_trip_times = dict(route_trip_times)
 
-        print(f'episode {epsisode} finished')
-        print(f'metrics is {metrics}')
-        agent.reset(epsisode)
-        if epsisode == episode_num - 1:
-            plot_time_space_diagram(simulator.total_buses)
-        if epsisode == 119:
-            agent.save_actor_net(path='actor_net_home_one.pth')
+# the blueprint, agent and episode settings of a worker process, set once by `_init_worker`
+_worker_context: Dict[str, Any] = {}
+
+
+def _init_worker(blueprint: Blueprint, agent: Agent, episode_duration: int, engine: Literal['step', 'event'],
+                 tracer_config: TracerConfig) -> None:
+    _worker_context['blueprint'] = blueprint
+    _worker_context['agent'] = agent
+    _worker_context['episode_duration'] = episode_duration
+    _worker_context['engine'] = engine
+    _worker_context['tracer_config'] = tracer_config
+
+
+def _run_episode_in_worker(episode: int, seed: int) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]:
+    agent: Agent = _worker_context['agent']
+    # seed numpy's global state as well, which draws the passenger arrivals
+    np.random.seed(seed)
+    simulator = run_episode(_worker_context['blueprint'], _worker_context['episode_duration'],
+                            agent, _worker_context['engine'], seed,
+                            tracer_config=_worker_context['tracer_config'])
+    agent.reset(episode)
+    return summarize_episode(simulator)
+
+
+def run(blueprint: Blueprint, episode_num: int, episode_duration: int, agent: Agent,
+        engine: Literal['step', 'event'] = 'step', num_workers: int = 1,
+        master_seed: Optional[int] = None, plot_trajectory: bool = True,
+        profiler: Optional[PhaseProfiler] = None,
+        tracer_config: TracerConfig = TracerConfig()) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+    ''' Run episodes and get the mean metrics over episodes and the trip times of buses dispatched in the first hour.
+
+    Args:
+        num_workers: the number of processes that run episodes in parallel,
+            only for agents whose episodes are independent (e.g., model-based agents)
+        master_seed: if given, each episode is seeded by a seed spawned from it,
+            so the results are reproducible and the same for any number of workers;
+            if None, episodes in sequence use numpy's global state, and parallel episodes draw a master seed from it
+        plot_trajectory: whether to plot the time-space diagram of the last episode (sequential episodes only)
+        profiler: if given, accumulates the time of each phase over the episodes (sequential episodes only)
+        tracer_config: how the simulators take snapshots and record trajectories
+
+    '''
+    if num_workers > 1:
+        assert profiler is None, 'profiling runs the episodes in sequence, set num_workers to 1'
+        assert agent.is_episode_independent, \
+            f'episodes of {agent.agent_name} depend on each other, they cannot run in parallel'
+        if master_seed is None:
+            master_seed = int(np.random.randint(0, 2**31 - 1))
+    episode_seeds: List[Optional[int]] = [None] * episode_num
+    if master_seed is not None:
+        episode_seeds = list(spawn_episode_seeds(master_seed, episode_num))
+
+    name_episode_metrics: Dict[str, List[float]] = defaultdict(list)
+    route_trip_times: Dict[str, List[float]] = defaultdict(list)
+
+    if num_workers > 1:
+        # only the compact results are sent back from the workers, in the order of episodes
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=(blueprint, agent, episode_duration, engine, tracer_config)) as executor:
+            episode_results = executor.map(
+                _run_episode_in_worker, range(episode_num), episode_seeds)
+            for epsisode, (metrics, route_dispatch_time_trip_time) in enumerate(episode_results):
+                _accumulate_episode(metrics, route_dispatch_time_trip_time,
+                                    name_episode_metrics, route_trip_times)
+                print(f'episode {epsisode} finished')
+                print(f'metrics is {metrics}')
+    else:
+        for epsisode in range(episode_num):
+            episode_seed = episode_seeds[epsisode]
+            if episode_seed is not None:
+                np.random.seed(episode_seed)
+            simulator = run_episode(
+                blueprint, episode_duration, agent, engine, episode_seed, profiler, tracer_config)
+
+            metrics, route_dispatch_time_trip_time = summarize_episode(
+                simulator)
+            _accumulate_episode(metrics, route_dispatch_time_trip_time,
+                                name_episode_metrics, route_trip_times)
+
+            print(f'episode {epsisode} finished')
+            print(f'metrics is {metrics}')
+            agent.reset(epsisode)
+            if plot_trajectory and epsisode == episode_num - 1:
+                plot_time_space_diagram(simulator.trajectory_recorder)
+            if epsisode == 119:
+                agent.save_actor_net(path='actor_net_home_one.pth')
 
     name_value = {}
     for name, episode_metrics in name_episode_metrics.items():
         metric_mean = np.mean(np.array(episode_metrics))
         name_value[name] = metric_mean
-    return name_value, route_trip_times
+    return name_value, dict(route_trip_times)
+
+
+def _accumulate_episode(metrics: Dict[str, float], route_dispatch_time_trip_time: Dict[str, Dict[int, int]],
+                        name_episode_metrics: Dict[str, List[float]], route_trip_times: Dict[str, List[float]]) -> None:
+    for name, metric in metrics.items():
+        name_episode_metrics[name].append(metric)
+
+    for route, dispatch_time_trip_time in route_dispatch_time_trip_time.items():
+        for dispatch_time, trip_time in dispatch_time_trip_time.items():
+            if dispatch_time < 3600:
+                route_trip_times[route].append(trip_time)
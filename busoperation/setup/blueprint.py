@@ -1,10 +1,10 @@
 from typing import Dict, Tuple, Literal
 from collections import defaultdict
 
-from .homo_one_route import HomoOneRouteNetwork, HomoOneRouteRouteInfo
-from .chengdu import CDRoute3Network, CDRoute3NetworkRouteInfo
 from .network import Network
 from .route import RouteInfo
+from .compiled_blueprint import CompiledBlueprint, compile_blueprint
+from .registry import create_network, create_route_info
 
 
 class Blueprint:
@@ -17,6 +17,9 @@ class Blueprint:
         _route_node_to_link: used for querying next link for current node
         _route_link_to_node: used for querying next node for current link
         _route_node_distance: distance of node from the terminal
+        _compiled: the integer-indexed lookup tables, see `CompiledBlueprint`
+
+    The network and routes must not be modified after construction, as the lookup tables are built once.
 
     '''
     env_name: str
@@ -25,22 +28,22 @@ class Blueprint:
     _route_node_to_link: Dict[str, Dict[str, str]]
     _route_link_to_node: Dict[str, Dict[str, str]]
     _route_node_distance: Dict[str, Dict[str, float]]
+    _compiled: CompiledBlueprint
 
     def __init__(self, env_name: str) -> None:
         self.env_name = env_name
-        if env_name == 'homogeneous_one_route':
-            self.network = HomoOneRouteNetwork()
-            self.route_info = HomoOneRouteRouteInfo()
-        else:
-            assert env_name == 'cd_route_3'
-            self.network = CDRoute3Network()
-            self.route_info = CDRoute3NetworkRouteInfo()
+        # the modules of the env are imported on request, see `setup.registry`
+        self.network = create_network(env_name)
+        self.route_info = create_route_info(env_name)
 
         # {route_id -> {node_id -> link_id}}, {route_id -> {link_id -> node_id}}
         self._route_node_to_link, self._route_link_to_node = self._generate_node_and_link_map()
         # {route_id -> {node_id -> distance from terminal}
         self._route_node_distance = self._generate_node_distance_from_terminal()
         self._route_stop_arrival_rate = self._calculate_total_arrival_rate()
+        # {route_id -> {stop_id -> (previous node type, previous node id)}}
+        self._route_stop_previous_node = self._generate_previous_node_map()
+        self._compiled = compile_blueprint(self)
 
     def get_next_link_id(self, route_id: str, curr_node_id: str):
         ''' Get the next link id given the current node id of a route.
@@ -81,15 +84,19 @@ class Blueprint:
             previous_node_id: the previous node id
 
         '''
-        visit_seq_stops = self.route_info.route_infos[route_id].visit_seq_stops
-        assert curr_node_id in visit_seq_stops, 'The query node must be a stop node'
-        first_stop_id = visit_seq_stops[0]
-        if curr_node_id == first_stop_id:
-            terminal_id = self.route_info.route_infos[route_id].terminal_id
-            return 'terminal', terminal_id
-        else:
-            previous_stop_index = visit_seq_stops.index(curr_node_id) - 1
-            return 'stop', visit_seq_stops[previous_stop_index]
+        stop_previous_node = self._route_stop_previous_node[route_id]
+        assert curr_node_id in stop_previous_node, 'The query node must be a stop node'
+        return stop_previous_node[curr_node_id]
+
+    @property
+    def compiled(self) -> CompiledBlueprint:
+        ''' Return the integer-indexed lookup tables of the blueprint
+
+        Returns:
+            self._compiled: the read-only arrays of the network and the routes
+
+        '''
+        return self._compiled
 
     @property
     def route_node_distance(self) -> Dict[str, Dict[str, float]]:
@@ -140,6 +147,22 @@ class Blueprint:
             route_link_to_node[route_id] = link_to_node
         return route_node_to_link, route_link_to_node
 
+    def _generate_previous_node_map(self) -> Dict[str, Dict[str, Tuple[Literal['terminal', 'stop'], str]]]:
+        ''' Generate the map from each stop to the node visited before it for each route
+
+        Returns:
+            route_stop_previous_node: {route_id -> {stop_id -> (previous node type, previous node id)}}
+
+        '''
+        route_stop_previous_node: Dict[str, Dict[str, Tuple[Literal['terminal', 'stop'], str]]] = {}
+        for route_id, route in self.route_info.route_infos.items():
+            stop_previous_node: Dict[str, Tuple[Literal['terminal', 'stop'], str]] = {
+                route.visit_seq_stops[0]: ('terminal', route.terminal_id)}
+            for previous_stop_id, stop_id in zip(route.visit_seq_stops[:-1], route.visit_seq_stops[1:]):
+                stop_previous_node[stop_id] = ('stop', previous_stop_id)
+            route_stop_previous_node[route_id] = stop_previous_node
+        return route_stop_previous_node
+
     def _generate_node_distance_from_terminal(self) -> Dict[str, Dict[str, float]]:
         ''' Generate the distance from terminal to each node for each route
 
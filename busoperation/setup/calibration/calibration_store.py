@@ -0,0 +1,180 @@
+from typing import Dict, List, Tuple, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+# the directory of the raw calibration pickles
+CALIBRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+# the directory of the derived arrays, built from the raw pickles on first use
+CALIBRATION_STORE_DIR = os.path.join(CALIBRATION_DIR, 'derived')
+CALIBRATION_SOURCES = ('data.pickle', 'distribution.pickle',
+                       'data_virtual.pickle', 'lamda_station.pickle')
+# bumped when the derived arrays change, so that stale stores are rebuilt
+CALIBRATION_STORE_VERSION = 1
+
+_MANIFEST = 'manifest.json'
+_ARRAY_NAMES = ('node_ids', 'tt_station_ids', 'tt_loc', 'tt_scale', 'lambda_station_ids', 'lambda_rates',
+                'dispatching_headways', 'dispatching_headway_fit', 'trip_times',
+                'rtd_station_ids', 'rtd_mean', 'rtd_std')
+
+
+class CalibrationStore:
+    ''' Serve the calibration data of the Chengdu route from arrays derived once from the raw pickles.
+
+    The arrays are kept as `.npy` files in `store_dir` and memory-mapped on first access, so neither pandas nor
+    the raw pickles are touched once the store is built. The store is rebuilt (with pandas) if it is missing,
+    or if the raw pickles or `CALIBRATION_STORE_VERSION` have changed since it was built.
+
+    Args:
+        store_dir: the directory of the derived arrays
+        source_dir: the directory of the raw pickles
+
+    Attributes:
+        node_ids: the station ids of the route in the visiting order, terminals included
+        link_time_info: {station id -> {'loc', 'scale' -> normal parameters of the link travel time to the station}}
+        stop_pax_arrival_rate: {station id -> pax arrival rate per second}
+        dispatching_headway: (mean, std) of the normal distribution fitted to the dispatching headways
+        dispatching_headways: the dispatching headways of all the days, in seconds
+        trip_times: the trip times of all the days, in seconds
+        virtual_bus_rtd_info: {station id -> (mean, std) of the rtd time relative to the first station over the days}
+
+    '''
+    _store_dir: str
+    _source_dir: str
+    _arrays: Dict[str, np.ndarray]
+
+    def __init__(self, store_dir: str = CALIBRATION_STORE_DIR, source_dir: str = CALIBRATION_DIR) -> None:
+        self._store_dir = store_dir
+        self._source_dir = source_dir
+        self._arrays = {}
+        self._link_time_info: Optional[Dict[int, Dict[str, float]]] = None
+        self._stop_pax_arrival_rate: Optional[Dict[str, float]] = None
+        self._virtual_bus_rtd_info: Optional[Dict[str, Tuple[float, float]]] = None
+
+        source_fingerprint = _get_source_fingerprint(source_dir)
+        if _read_manifest(store_dir) != {'version': CALIBRATION_STORE_VERSION, 'source': source_fingerprint}:
+            build_calibration_store(store_dir, source_dir)
+
+    @property
+    def node_ids(self) -> List[str]:
+        return [str(node_id) for node_id in self._get('node_ids').tolist()]
+
+    @property
+    def link_time_info(self) -> Dict[int, Dict[str, float]]:
+        if self._link_time_info is None:
+            self._link_time_info = {station_id: {'loc': loc, 'scale': scale} for station_id, loc, scale in zip(
+                self._get('tt_station_ids').tolist(), self._get('tt_loc').tolist(), self._get('tt_scale').tolist())}
+        return self._link_time_info
+
+    @property
+    def stop_pax_arrival_rate(self) -> Dict[str, float]:
+        if self._stop_pax_arrival_rate is None:
+            self._stop_pax_arrival_rate = dict(
+                zip(self._get('lambda_station_ids').tolist(), self._get('lambda_rates').tolist()))
+        return self._stop_pax_arrival_rate
+
+    @property
+    def dispatching_headway(self) -> Tuple[float, float]:
+        mu, std = self._get('dispatching_headway_fit').tolist()
+        return mu, std
+
+    @property
+    def dispatching_headways(self) -> np.ndarray:
+        return self._get('dispatching_headways')
+
+    @property
+    def trip_times(self) -> np.ndarray:
+        return self._get('trip_times')
+
+    @property
+    def virtual_bus_rtd_info(self) -> Dict[str, Tuple[float, float]]:
+        if self._virtual_bus_rtd_info is None:
+            self._virtual_bus_rtd_info = {station_id: (mean, std) for station_id, mean, std in zip(
+                self._get('rtd_station_ids').tolist(), self._get('rtd_mean').tolist(), self._get('rtd_std').tolist())}
+        return self._virtual_bus_rtd_info
+
+    def _get(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(
+                self._store_dir, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+
+def build_calibration_store(store_dir: str = CALIBRATION_STORE_DIR, source_dir: str = CALIBRATION_DIR) -> None:
+    ''' Derive the calibration arrays from the raw pickles by `DataLoader` and save them to `store_dir`.
+
+    The arrays are written to a temporary directory first and moved into `store_dir` one by one, with the manifest last,
+    so that concurrent builders (e.g., the workers of a sweep) never leave a store that looks complete but is not.
+
+    '''
+    # pandas and scipy are only needed for building the store
+    from .dataloader import DataLoader
+
+    data_loader = DataLoader(source_dir)
+    link_time_info = data_loader.link_time_info
+    stop_pax_arrival_rate = data_loader.stop_pax_arrival_rate
+    virtual_bus_rtd_info = data_loader.virtual_bus_rtd_info
+    arrays = {
+        'node_ids': np.array(data_loader.node_ids),
+        'tt_station_ids': np.array(list(link_time_info), dtype=np.int64),
+        'tt_loc': np.array([params['loc'] for params in link_time_info.values()], dtype=np.float64),
+        'tt_scale': np.array([params['scale'] for params in link_time_info.values()], dtype=np.float64),
+        'lambda_station_ids': np.array(list(stop_pax_arrival_rate)),
+        'lambda_rates': np.array(list(stop_pax_arrival_rate.values()), dtype=np.float64),
+        'dispatching_headways': np.array(data_loader.dispatching_headways, dtype=np.float64),
+        'dispatching_headway_fit': np.array(data_loader.dispatching_headway, dtype=np.float64),
+        'trip_times': np.array(data_loader.trip_times, dtype=np.float64),
+        'rtd_station_ids': np.array(list(virtual_bus_rtd_info)),
+        'rtd_mean': np.array([info[0] for info in virtual_bus_rtd_info.values()], dtype=np.float64),
+        'rtd_std': np.array([info[1] for info in virtual_bus_rtd_info.values()], dtype=np.float64),
+    }
+    assert set(arrays) == set(_ARRAY_NAMES)
+
+    os.makedirs(store_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=store_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_dir, f'{name}.npy'), array)
+            os.replace(os.path.join(temp_dir, f'{name}.npy'),
+                       os.path.join(store_dir, f'{name}.npy'))
+        with open(os.path.join(temp_dir, _MANIFEST), 'w') as file:
+            json.dump({'version': CALIBRATION_STORE_VERSION,
+                       'source': _get_source_fingerprint(source_dir)}, file)
+        os.replace(os.path.join(temp_dir, _MANIFEST),
+                   os.path.join(store_dir, _MANIFEST))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+_calibration_store: Optional[CalibrationStore] = None
+
+
+def get_calibration_store() -> CalibrationStore:
+    ''' Get the calibration store of the package, opened once per process.
+
+    '''
+    global _calibration_store
+    if _calibration_store is None:
+        _calibration_store = CalibrationStore()
+    return _calibration_store
+
+
+def _get_source_fingerprint(source_dir: str) -> str:
+    digest = hashlib.sha256()
+    for source in CALIBRATION_SOURCES:
+        with open(os.path.join(source_dir, source), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _read_manifest(store_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(store_dir, _MANIFEST), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -1,4 +1,5 @@
 
+from typing import Optional
 import pickle
 import pandas as pd
 from scipy.stats import norm
@@ -7,15 +8,26 @@ import os
 
 
 class DataLoader:
-    def __init__(self) -> None:
-        self.data = pickle.load(
-            open(r'D:\py_project\busoperation_s\busoperation\setup\calibration\data.pickle', 'rb'))
-        self.tt_data = pickle.load(
-            open(r'D:\py_project\busoperation_s\busoperation\setup\calibration\distribution.pickle', 'rb'))
-        self.virtual_data = pickle.load(
-            open(r'D:\py_project\busoperation_s\busoperation\setup\calibration\data_virtual.pickle', 'rb'))
-        self.lambda_data = pickle.load(
-            open(r'D:\py_project\busoperation_s\busoperation\setup\calibration\lamda_station.pickle', 'rb'))
+    ''' Load the raw calibration pickles and derive the calibration data with pandas.
+
+    Used for building the `CalibrationStore`, which should be preferred for reading the data.
+
+    Args:
+        source_dir: the directory of the raw pickles, defaults to the directory of this module
+
+    '''
+
+    def __init__(self, source_dir: Optional[str] = None) -> None:
+        if source_dir is None:
+            source_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(source_dir, 'data.pickle'), 'rb') as file:
+            self.data = pickle.load(file)
+        with open(os.path.join(source_dir, 'distribution.pickle'), 'rb') as file:
+            self.tt_data = pickle.load(file)
+        with open(os.path.join(source_dir, 'data_virtual.pickle'), 'rb') as file:
+            self.virtual_data = pickle.load(file)
+        with open(os.path.join(source_dir, 'lamda_station.pickle'), 'rb') as file:
+            self.lambda_data = pickle.load(file)
         self.day_ids = [8, 9, 10]
 
     @property
@@ -72,7 +84,7 @@ class DataLoader:
         return link_time_info
 
     @property
-    def dispatching_headway(self):
+    def dispatching_headways(self):
         Hs = []
         for day_id in self.day_ids:
             df = self.data['dep_fre_{}'.format(day_id)]
@@ -81,6 +93,9 @@ class DataLoader:
             # Convert timedelta to seconds
             df['dep_fre_seconds'] = df['dep_fre'].dt.total_seconds()
             Hs.extend(df['dep_fre_seconds'].values.tolist())
+        return Hs
 
-        mu, std = norm.fit(Hs)
+    @property
+    def dispatching_headway(self):
+        mu, std = norm.fit(self.dispatching_headways)
         return mu, std
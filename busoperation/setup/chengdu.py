@@ -3,16 +3,16 @@ from typing import List, Dict, Tuple
 from typing_extensions import override
 
 
-from .calibration.dataloader import DataLoader
+from .calibration.calibration_store import get_calibration_store
 from .network import Network
 from .route import RouteInfo
 from .config_dataclass import *
 
-data_loader = DataLoader()
-node_ids = data_loader.node_ids
-link_time_info = data_loader.link_time_info
-stop_pax_arrival_rate = data_loader.stop_pax_arrival_rate
-H_mean, H_std = data_loader.dispatching_headway
+calibration_store = get_calibration_store()
+node_ids = calibration_store.node_ids
+link_time_info = calibration_store.link_time_info
+stop_pax_arrival_rate = calibration_store.stop_pax_arrival_rate
+H_mean, H_std = calibration_store.dispatching_headway
 # print(node_ids)
 # print(link_time_info)
 
@@ -2,10 +2,12 @@ from typing import Dict, Literal
 
 from simulator.stop import Stop
 from simulator.stop_boarding import BoardingStop
-from simulator.link import Link, DistributionLink
+from simulator.link import Link
+from simulator.link_kernel import LinkKernel, KernelLink
 from simulator.terminal import Terminal
 from simulator.pax_generation import PaxGenerator
 from simulator.virtual_bus import VirtualBus
+from simulator.sampler import RandomStreams
 from agent.agent import Agent
 
 from .blueprint import Blueprint
@@ -37,9 +39,10 @@ class CDRoute3ComponentsFactory:
 
         return virtual_bus
 
-    def create_pax_generator(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> PaxGenerator:
+    def create_pax_generator(self, blueprint: Blueprint, virtual_bus: VirtualBus,
+                             random_streams: RandomStreams) -> PaxGenerator:
         pax_generator = PaxGenerator(
-            blueprint.route_info, self._pax_operation, virtual_bus)
+            blueprint.route_info, self._pax_operation, virtual_bus, random_streams)
         return pax_generator
 
     def create_terminals(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> Dict[str, Terminal]:
@@ -52,11 +55,14 @@ class CDRoute3ComponentsFactory:
             terminals[terminal_id] = terminal
         return terminals
 
-    def create_links(self, blueprint: Blueprint) -> Dict[str, Link]:
+    def create_links(self, blueprint: Blueprint, random_streams: RandomStreams) -> Dict[str, Link]:
         links = {}
+        # all the links share one kernel that moves every running bus of the network at once
+        link_kernel = LinkKernel()
         for link_id, link_geometry in blueprint.network.link_geometry_info.items():
             link_distribution = blueprint.network.link_distribution[link_id]
-            link = DistributionLink(link_id, link_geometry, link_distribution)
+            link = KernelLink(link_id, link_geometry,
+                              link_distribution, random_streams, link_kernel)
             links[link_id] = link
         return links
 
@@ -68,3 +74,9 @@ class CDRoute3ComponentsFactory:
                                 node_operation, virtual_bus)
             stops[stop_id] = stop
         return stops
+
+    def get_stop_node_operation(self, stop_id: str) -> StopNodeOperation:
+        return self._stop_node_operation[stop_id]
+
+    def get_pax_operation(self) -> PaxOperation:
+        return self._pax_operation
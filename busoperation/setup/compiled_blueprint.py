@@ -0,0 +1,187 @@
+from typing import Dict, Tuple, Literal, TYPE_CHECKING
+from dataclasses import dataclass
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .blueprint import Blueprint
+
+
+# index of a missing node or link in the lookup tables
+NO_INDEX = -1
+
+
+@dataclass(frozen=True)
+class CompiledBlueprint:
+    ''' A frozen form of a `Blueprint` whose lookup tables are contiguous arrays indexed by integers.
+
+    Nodes (terminals and stops), stops, links and routes are numbered in the order of the blueprint,
+    i.e., the order of the network graph and of the routes. Route tables are indexed by (route index, node index)
+    or (route index, link index), and hold `NO_INDEX` or nan for the nodes and links that a route does not visit.
+    All the arrays are read-only, and the whole object is cheap to pickle, e.g., for sending to worker processes.
+
+    Attributes:
+        env_name: environment name
+        route_ids, node_ids, stop_ids, link_ids: the ids in the order of their indices
+        route_index, node_index, link_index: {id -> index}
+        node_is_terminal: (node,) whether the node is a terminal
+        node_berth_num: (node,) the number of berths of each stop, 0 for terminals
+        stop_nodes: (stop,) the node index of each stop
+        link_head_node, link_tail_node: (link,) the node indices of the ends of each link
+        link_length, link_tt_mean, link_tt_cv: (link,) the length and the travel time distribution of each link
+        link_tt_types: the travel time distribution type of each link
+        route_terminal, route_end_terminal: (route,) the node indices of the starting and ending terminals
+        route_schedule_headway: (route,)
+        route_next_link: (route, node) the link that a route takes from a node
+        route_next_node: (route, link) the node that a route reaches at the end of a link
+        route_previous_node: (route, node) the node that a route visits before a stop
+        route_node_distance: (route, node) the distance of each node from the route's terminal
+        route_boarding_rate: (route, node) the boarding rate of the route at each stop
+        route_arrival_rate: (route, node) the total pax arrival rate of the route at each stop
+
+    Methods:
+        get_next_link_id(self, route_id: str, curr_node_id: str) -> str
+        get_next_node_id(self, route_id: str, curr_link_id: str) -> Tuple[str, bool]
+        get_previous_node(self, route_id: str, curr_node_id: str) -> Tuple[Literal['terminal', 'stop'], str]
+
+    '''
+    env_name: str
+    route_ids: Tuple[str, ...]
+    node_ids: Tuple[str, ...]
+    stop_ids: Tuple[str, ...]
+    link_ids: Tuple[str, ...]
+    route_index: Dict[str, int]
+    node_index: Dict[str, int]
+    link_index: Dict[str, int]
+    node_is_terminal: np.ndarray
+    node_berth_num: np.ndarray
+    stop_nodes: np.ndarray
+    link_head_node: np.ndarray
+    link_tail_node: np.ndarray
+    link_length: np.ndarray
+    link_tt_mean: np.ndarray
+    link_tt_cv: np.ndarray
+    link_tt_types: Tuple[str, ...]
+    route_terminal: np.ndarray
+    route_end_terminal: np.ndarray
+    route_schedule_headway: np.ndarray
+    route_next_link: np.ndarray
+    route_next_node: np.ndarray
+    route_previous_node: np.ndarray
+    route_node_distance: np.ndarray
+    route_boarding_rate: np.ndarray
+    route_arrival_rate: np.ndarray
+
+    def __post_init__(self) -> None:
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    def __setstate__(self, state: Dict) -> None:
+        # unpickled arrays are writeable again
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    def get_next_link_id(self, route_id: str, curr_node_id: str) -> str:
+        link = self.route_next_link[self.route_index[route_id],
+                                    self.node_index[curr_node_id]]
+        assert link != NO_INDEX, f'route {route_id} does not leave node {curr_node_id}'
+        return self.link_ids[link]
+
+    def get_next_node_id(self, route_id: str, curr_link_id: str) -> Tuple[str, bool]:
+        route = self.route_index[route_id]
+        node = self.route_next_node[route, self.link_index[curr_link_id]]
+        assert node != NO_INDEX, f'route {route_id} does not run on link {curr_link_id}'
+        return self.node_ids[node], bool(node == self.route_end_terminal[route])
+
+    def get_previous_node(self, route_id: str, curr_node_id: str) -> Tuple[Literal['terminal', 'stop'], str]:
+        node = self.route_previous_node[self.route_index[route_id],
+                                        self.node_index[curr_node_id]]
+        assert node != NO_INDEX, 'The query node must be a stop node'
+        node_type: Literal['terminal', 'stop'] = 'terminal' if self.node_is_terminal[node] else 'stop'
+        return node_type, self.node_ids[node]
+
+
+def compile_blueprint(blueprint: 'Blueprint') -> CompiledBlueprint:
+    ''' Freeze the network and route information of a blueprint into integer-indexed arrays.
+
+    '''
+    network = blueprint.network
+    route_infos = blueprint.route_info.route_infos
+    terminal_geometry = network.terminal_node_geometry_info
+    stop_geometry = network.stop_node_geometry_info
+    link_geometry = network.link_geometry_info
+    link_distribution = network.link_distribution
+
+    route_ids = tuple(route_infos)
+    node_ids = tuple(network.node_ids)
+    stop_ids = tuple(stop_geometry)
+    link_ids = tuple(link_geometry)
+    route_index = {route_id: idx for idx, route_id in enumerate(route_ids)}
+    node_index = {node_id: idx for idx, node_id in enumerate(node_ids)}
+    link_index = {link_id: idx for idx, link_id in enumerate(link_ids)}
+    route_num, node_num, link_num = len(route_ids), len(node_ids), len(link_ids)
+
+    node_is_terminal = np.array(
+        [node_id in terminal_geometry for node_id in node_ids], dtype=bool)
+    node_berth_num = np.array([stop_geometry[node_id].berth_num if node_id in stop_geometry else 0
+                               for node_id in node_ids], dtype=np.int64)
+
+    route_next_link = np.full((route_num, node_num), NO_INDEX, dtype=np.int64)
+    route_next_node = np.full((route_num, link_num), NO_INDEX, dtype=np.int64)
+    route_previous_node = np.full(
+        (route_num, node_num), NO_INDEX, dtype=np.int64)
+    route_node_distance = np.full((route_num, node_num), np.nan)
+    route_boarding_rate = np.full((route_num, node_num), np.nan)
+    route_arrival_rate = np.full((route_num, node_num), np.nan)
+    for route, (route_id, route_info) in enumerate(route_infos.items()):
+        node_seq = [route_info.terminal_id] + \
+            route_info.visit_seq_stops + [route_info.end_terminal_id]
+        for head_node_id, tail_node_id in zip(node_seq[:-1], node_seq[1:]):
+            link = link_index[blueprint.get_next_link_id(route_id, head_node_id)]
+            route_next_link[route, node_index[head_node_id]] = link
+            route_next_node[route, link] = node_index[tail_node_id]
+        for previous_node_id, stop_id in zip(node_seq[:-2], node_seq[1:-1]):
+            route_previous_node[route, node_index[stop_id]
+                                ] = node_index[previous_node_id]
+        for node_id, distance in blueprint.route_node_distance[route_id].items():
+            route_node_distance[route, node_index[node_id]] = distance
+        for stop_id, boarding_rate in route_info.boarding_rate.items():
+            route_boarding_rate[route, node_index[stop_id]] = boarding_rate
+        for stop_id, arrival_rate in blueprint.route_stop_arrival_rate[route_id].items():
+            route_arrival_rate[route, node_index[stop_id]] = arrival_rate
+
+    return CompiledBlueprint(
+        env_name=blueprint.env_name,
+        route_ids=route_ids,
+        node_ids=node_ids,
+        stop_ids=stop_ids,
+        link_ids=link_ids,
+        route_index=route_index,
+        node_index=node_index,
+        link_index=link_index,
+        node_is_terminal=node_is_terminal,
+        node_berth_num=node_berth_num,
+        stop_nodes=np.array([node_index[stop_id]
+                            for stop_id in stop_ids], dtype=np.int64),
+        link_head_node=np.array([node_index[link_geometry[link_id].head_node] for link_id in link_ids],
+                                dtype=np.int64),
+        link_tail_node=np.array([node_index[link_geometry[link_id].tail_node] for link_id in link_ids],
+                                dtype=np.int64),
+        link_length=np.array([link_geometry[link_id].length for link_id in link_ids], dtype=np.float64),
+        link_tt_mean=np.array([link_distribution[link_id].tt_mean for link_id in link_ids], dtype=np.float64),
+        link_tt_cv=np.array([link_distribution[link_id].tt_cv for link_id in link_ids], dtype=np.float64),
+        link_tt_types=tuple(link_distribution[link_id].tt_type for link_id in link_ids),
+        route_terminal=np.array([node_index[route_infos[route_id].terminal_id] for route_id in route_ids],
+                                dtype=np.int64),
+        route_end_terminal=np.array([node_index[route_infos[route_id].end_terminal_id] for route_id in route_ids],
+                                    dtype=np.int64),
+        route_schedule_headway=np.array([route_infos[route_id].schedule_headway for route_id in route_ids],
+                                        dtype=np.float64),
+        route_next_link=route_next_link,
+        route_next_node=route_next_node,
+        route_previous_node=route_previous_node,
+        route_node_distance=route_node_distance,
+        route_boarding_rate=route_boarding_rate,
+        route_arrival_rate=route_arrival_rate,
+    )
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Literal
+from dataclasses import dataclass, field
+from typing import Literal, Dict, List, Tuple, Any, Optional
 
 
 @dataclass(frozen=True)
@@ -51,3 +51,86 @@ class LinkDistribution:
     tt_mean: float
     tt_cv: float
     tt_type: str
+
+
+@dataclass(frozen=True)
+class TracerConfig:
+    # 'copy' collects all bus and stop snapshots every step, 'view' collects them on access
+    snapshot_mode: Literal['copy', 'view'] = 'view'
+    # which snapshots to keep: the latest one, the last `retention_size` ones,
+    # one every `retention_size` steps, or all of them
+    snapshot_retention: Literal['latest', 'ring', 'sample', 'full'] = 'latest'
+    retention_size: int = 1
+    # record bus trajectories every `trajectory_sample_interval` seconds (and whenever a bus moves to another spot)
+    trajectory_sample_interval: int = 1
+    # only keep the first and the last points of a bus staying at the same location
+    trajectory_change_only: bool = False
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    # the project that the runs are stored under, e.g., 'bunching'
+    project: str
+    # the SQLite file of the results store
+    store_path: str
+    env_names: List[str]
+    # {field of `model_based_agent_config` (or 'f0', 'f1' of `fs`) -> values}, all the combinations are run
+    grid: Dict[str, List[Any]] = field(default_factory=dict)
+    # explicit points that override fields of `model_based_agent_config`, used instead of the grid if given
+    points: Optional[List[Dict[str, Any]]] = None
+    # each point runs once for each seed, which is the master seed of its episodes
+    seeds: List[int] = field(default_factory=lambda: [1])
+    episode_num: int = 10
+    step_num: int = 10800
+    engine: Literal['step', 'event'] = 'step'
+    # the number of processes that run the points x seeds
+    num_workers: int = 1
+
+
+@dataclass(frozen=True)
+class VirtualBusSolverConfig:
+    # the number of replications averaged at each iteration, run in lockstep if the agent and the env support the batch simulator
+    replication_num: int = 8
+    # converged when the root-mean-square change of the average holding times is within the tolerance (sec)
+    tolerance: float = 0.5
+    max_iteration_num: int = 20
+    # 'anderson' extrapolates from the last `anderson_depth` iterations, 'damped' only mixes the last iteration
+    acceleration: Literal['anderson', 'damped'] = 'anderson'
+    anderson_depth: int = 3
+    # the weight of the new average holding times in an update, 1.0 is the plain fixed-point update
+    damping: float = 1.0
+    # the duration of each simulation (sec)
+    warm_up_duration: int = 10800
+
+
+@dataclass(frozen=True)
+class SyntheticNetworkConfig:
+    # 'corridor' is a line of stops that all the routes run along in one direction,
+    # 'grid' is a lattice of stops with streets in both directions, which the routes cross in staircase paths
+    layout: Literal['corridor', 'grid'] = 'corridor'
+    # the number of stops of the corridor
+    stop_num: int = 200
+    # the numbers of rows and columns of stops of the grid
+    grid_rows: int = 15
+    grid_cols: int = 20
+    route_num: int = 24
+    # the range of the number of stops that a route of the corridor visits
+    route_stop_num_range: Tuple[int, int] = (30, 80)
+    # the schedule headway of each route is drawn from these (sec)
+    headways: Tuple[float, ...] = (300.0, 420.0, 600.0)
+    # the ranges that the spacing of adjacent stops (m), and the mean speed (m/s) and the travel time cv
+    # of each link are drawn from uniformly
+    spacing_range: Tuple[float, float] = (400.0, 1200.0)
+    speed_range: Tuple[float, float] = (6.0, 14.0)
+    tt_cv_range: Tuple[float, float] = (0.1, 0.5)
+    # the length of the links between the terminals and the stops (m)
+    terminal_access_length: float = 500.0
+    # the berth number of each stop is drawn from these
+    berth_nums: Tuple[int, ...] = (1, 2, 3, 4)
+    # the mean pax arrival rate of a stop over all its routes and destinations (pax/sec)
+    stop_pax_arrival_rate: float = 1.0 / 60
+    # the most destinations that the pax of a route boarding at a stop travel to
+    max_destination_num: int = 10
+    pax_board_time_mean: float = 2.0
+    # the seed of the random draws, the same config always generates the same network
+    seed: int = 0
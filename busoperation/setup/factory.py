@@ -7,8 +7,10 @@ from simulator.link import Link
 from simulator.stop import Stop
 from simulator.pax_generation import PaxGenerator
 from simulator.virtual_bus import VirtualBus
+from simulator.sampler import RandomStreams
 
 from .blueprint import Blueprint
+from .config_dataclass import StopNodeOperation, PaxOperation
 
 
 class ComponentFactory(Protocol):
@@ -19,14 +21,21 @@ class ComponentFactory(Protocol):
     def create_virtual_bus(self, blueprint: Blueprint, agent: Agent) -> VirtualBus:
         ...
 
-    def create_pax_generator(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> PaxGenerator:
+    def create_pax_generator(self, blueprint: Blueprint, virtual_bus: VirtualBus,
+                             random_streams: RandomStreams) -> PaxGenerator:
         ...
 
     def create_terminals(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> Dict[str, Terminal]:
         ...
 
-    def create_links(self, blueprint: Blueprint) -> Dict[str, Link]:
+    def create_links(self, blueprint: Blueprint, random_streams: RandomStreams) -> Dict[str, Link]:
         ...
 
     def create_stops(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> Dict[str, Stop]:
         ...
+
+    def get_stop_node_operation(self, stop_id: str) -> StopNodeOperation:
+        ...
+
+    def get_pax_operation(self) -> PaxOperation:
+        ...
@@ -0,0 +1,59 @@
+from typing import Optional, Any, TYPE_CHECKING
+from dataclasses import asdict, is_dataclass
+import hashlib
+import json
+import glob
+import os
+
+if TYPE_CHECKING:
+    from .blueprint import Blueprint
+
+
+# the sources whose contents decide the results of a simulation: the simulator, the setup (with the calibration data),
+# the agents and the runner, relative to the `busoperation` directory
+FINGERPRINT_PATTERNS = ('runner.py', 'simulator/*.py', 'setup/**/*.py', 'setup/**/*.pickle',
+                        'agent/**/*.py')
+
+_code_fingerprint: Optional[str] = None
+
+
+def get_code_fingerprint() -> str:
+    ''' Hash the contents of the sources that decide the results of a simulation, computed once per process.
+
+    '''
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = set()
+        for pattern in FINGERPRINT_PATTERNS:
+            paths.update(glob.glob(os.path.join(root, pattern), recursive=True))
+        digest = hashlib.sha256()
+        for path in sorted(paths):
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+        _code_fingerprint = digest.hexdigest()
+    return _code_fingerprint
+
+
+def get_blueprint_fingerprint(blueprint: 'Blueprint') -> str:
+    ''' Hash the contents of a blueprint: the routes, the node and link geometries and the link travel time distributions.
+
+    '''
+    network = blueprint.network
+    contents = {
+        'env_name': blueprint.env_name,
+        'routes': blueprint.route_info.route_infos,
+        'terminals': network.terminal_node_geometry_info,
+        'stops': network.stop_node_geometry_info,
+        'links': network.link_geometry_info,
+        'link_distributions': network.link_distribution,
+    }
+    payload = json.dumps(contents, sort_keys=True, default=_to_json)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _to_json(value: Any) -> Any:
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    return str(value)
@@ -23,8 +23,6 @@ tt_cv = 0.5
 tt_type = 'normal'
 
 corridor_length = (stop_num+1) * spacing
-print('tt mean:', tt_mean, 'std is:', tt_mean*tt_cv)
-print('corridor length:', corridor_length)
 
 
 class HomoOneRouteNetwork(Network):
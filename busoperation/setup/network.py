@@ -1,8 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import TypeVar, Dict, Tuple
+from typing import TypeVar, Dict, Tuple, List
 
 import networkx as nx
-import matplotlib.pyplot as plt
 
 from setup.config_dataclass import StopNodeGeometry, TerminalNodeGeometry, LinkGeometry, LinkDistribution
 T = TypeVar("T", bound="Network")
@@ -17,6 +16,9 @@ class Network(ABC):
         link_geometry_info: a dictionary with key as link id and value as link geometry information
         link_distribution: a dictionary with key as link id and value as link distribution information
 
+    The graph is fixed once `_define_network` returns, so the information dicts are built once on first access
+    and shared by all the callers, which should not modify them.
+
     Methods:
         get_link_id_by_two_nodes(self, head_node: str, tail_node: str) -> str
         get_node_xy(self, node_id) -> Tuple[float, float]
@@ -34,6 +36,8 @@ class Network(ABC):
     def __init__(self) -> None:
         self._G = nx.DiGraph()
         self._name_coordinates = {}
+        # property name -> the information dict built on first access
+        self._info_cache: Dict[str, Dict] = {}
         # inherited by the user to define the network structure
         self._define_network()
 
@@ -79,10 +83,13 @@ class Network(ABC):
             terminal_node_geometry_info: a dictionary with key as terminal node id and value as terminal node geometry information
 
         '''
+        if 'terminal_node_geometry_info' in self._info_cache:
+            return self._info_cache['terminal_node_geometry_info']
         terminal_node_geometry_info = {}
         for node, info in self._G.nodes.items():
             if info['node_type'] == 'terminal':
                 terminal_node_geometry_info[node] = info['terminal_node_geometry']
+        self._info_cache['terminal_node_geometry_info'] = terminal_node_geometry_info
         return terminal_node_geometry_info
 
     @property
@@ -93,10 +100,13 @@ class Network(ABC):
             stop_node_geometry_info: a dictionary with key as stop node id and value as stop node geometry information
 
         '''
+        if 'stop_node_geometry_info' in self._info_cache:
+            return self._info_cache['stop_node_geometry_info']
         stop_node_geometry_info = {}
         for node, info in self._G.nodes.items():
             if info['node_type'] == 'stop':
                 stop_node_geometry_info[node] = info['stop_node_geometry']
+        self._info_cache['stop_node_geometry_info'] = stop_node_geometry_info
         return stop_node_geometry_info
 
     @property
@@ -107,23 +117,38 @@ class Network(ABC):
             link_geometry_info: a dictionary with key as link id and value as link geometry information
 
         '''
+        if 'link_geometry_info' in self._info_cache:
+            return self._info_cache['link_geometry_info']
         link_geometry_info = {}
         for edge in self._G.edges:
             edge_data = self._G.get_edge_data(edge[0], edge[1])
             link_id = str(edge_data['link_id'])
             link_geometry_info[link_id] = edge_data['link_geometry']
+        self._info_cache['link_geometry_info'] = link_geometry_info
         return link_geometry_info
 
     @property
     def link_distribution(self) -> Dict[str, LinkDistribution]:
+        if 'link_distribution' in self._info_cache:
+            return self._info_cache['link_distribution']
         link_distribution = {}
         for edge in self._G.edges:
             edge_data = self._G.get_edge_data(edge[0], edge[1])
             link_id = str(edge_data['link_id'])
             link_distribution[link_id] = edge_data['link_distribution']
+        self._info_cache['link_distribution'] = link_distribution
         return link_distribution
 
+    @property
+    def node_ids(self) -> List[str]:
+        ''' Get the ids of all the nodes (terminals and stops) in the order of the graph.
+
+        '''
+        return list(self._G.nodes)
+
     def visualize(self) -> None:
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots()
         # draw the nodes
         pos = self._name_coordinates
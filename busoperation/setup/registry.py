@@ -0,0 +1,110 @@
+from typing import Dict, Any, Type, Optional, TYPE_CHECKING
+from dataclasses import dataclass
+import importlib
+
+from .config_dataclass import SyntheticNetworkConfig
+
+if TYPE_CHECKING:
+    from agent.agent import Agent
+    from .factory import ComponentFactory
+    from .network import Network
+    from .route import RouteInfo
+    from .blueprint import Blueprint
+
+
+@dataclass(frozen=True)
+class EnvSpec:
+    ''' Where the classes of an environment are defined, as 'module:attribute' paths.
+
+    The modules are only imported when the environment is requested, as some of them load data at import.
+
+    Attributes:
+        network: the `Network` subclass
+        route_info: the `RouteInfo` subclass
+        component_factory: the class adhering to the `ComponentFactory` Protocol
+        config: the only argument of the network and route info constructors of a parameterized environment,
+            None for the environments whose constructors take no arguments
+
+    '''
+    network: str
+    route_info: str
+    component_factory: str
+    config: Optional[Any] = None
+
+
+# env name -> where its network, routes and component factory are defined
+ENV_SPECS: Dict[str, EnvSpec] = {
+    'homogeneous_one_route': EnvSpec('setup.homo_one_route:HomoOneRouteNetwork',
+                                     'setup.homo_one_route:HomoOneRouteRouteInfo',
+                                     'setup.homo_one_route_factory:HomoOneRouteComponentsFactory'),
+    'cd_route_3': EnvSpec('setup.chengdu:CDRoute3Network',
+                          'setup.chengdu:CDRoute3NetworkRouteInfo',
+                          'setup.chengdu_factory:CDRoute3ComponentsFactory'),
+    # generated networks, register other configs by `setup.synthetic.register_synthetic_env`
+    'synthetic_corridor': EnvSpec('setup.synthetic:SyntheticNetwork', 'setup.synthetic:SyntheticRouteInfo',
+                                  'setup.synthetic_factory:SyntheticComponentsFactory',
+                                  SyntheticNetworkConfig(layout='corridor')),
+    'synthetic_grid': EnvSpec('setup.synthetic:SyntheticNetwork', 'setup.synthetic:SyntheticRouteInfo',
+                              'setup.synthetic_factory:SyntheticComponentsFactory',
+                              SyntheticNetworkConfig(layout='grid', route_num=40)),
+}
+
+# agent name -> where the agent class is defined, the RL agents import torch
+AGENT_PATHS: Dict[str, str] = {
+    'Simple_Control': 'agent.model_based.simple_control_nonlinear:SimpleControlNonlinear',
+    'Xuan_Nonlinear': 'agent.model_based.xuan_nonlinear:XuanNonlinear',
+    'Do_Nothing': 'agent.do_nothing:DoNothing',
+    'DDPG': 'agent.rl.ddpg:DDPG',
+    'DDPG_Headway': 'agent.rl.ddpg_headway:DDPG',
+}
+
+
+def register_env(env_name: str, env_spec: EnvSpec) -> None:
+    ENV_SPECS[env_name] = env_spec
+
+
+def register_agent(agent_name: str, path: str) -> None:
+    AGENT_PATHS[agent_name] = path
+
+
+def create_network(env_name: str) -> 'Network':
+    env_spec = _get_env_spec(env_name)
+    return _construct(env_spec.network, env_spec.config)
+
+
+def create_route_info(env_name: str) -> 'RouteInfo':
+    env_spec = _get_env_spec(env_name)
+    return _construct(env_spec.route_info, env_spec.config)
+
+
+def create_component_factory(blueprint: 'Blueprint') -> 'ComponentFactory':
+    return _resolve(_get_env_spec(blueprint.env_name).component_factory)(blueprint)
+
+
+def get_agent_class(agent_name: str) -> Type['Agent']:
+    assert agent_name in AGENT_PATHS, f'unknown agent {agent_name}, registered: {list(AGENT_PATHS)}'
+    return _resolve(AGENT_PATHS[agent_name])
+
+
+def create_agent(agent_config: Dict[str, Any], blueprint: 'Blueprint', agent_name: str = '') -> 'Agent':
+    ''' Create an agent by its name, which defaults to the 'agent_name' of the agent config.
+
+    '''
+    agent_class = get_agent_class(agent_name or agent_config['agent_name'])
+    return agent_class(agent_config, blueprint)
+
+
+def _get_env_spec(env_name: str) -> EnvSpec:
+    assert env_name in ENV_SPECS, f'unknown env {env_name}, registered: {list(ENV_SPECS)}'
+    return ENV_SPECS[env_name]
+
+
+def _construct(path: str, config: Optional[Any]) -> Any:
+    if config is None:
+        return _resolve(path)()
+    return _resolve(path)(config)
+
+
+def _resolve(path: str) -> Any:
+    module_name, attribute = path.split(':')
+    return getattr(importlib.import_module(module_name), attribute)
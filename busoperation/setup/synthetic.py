@@ -0,0 +1,295 @@
+from typing import List, Dict, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from typing_extensions import override
+
+import numpy as np
+
+from .config_dataclass import (SyntheticNetworkConfig, TerminalNodeGeometry, StopNodeGeometry,
+                               LinkGeometry, LinkDistribution)
+from .network import Network
+from .route import RouteInfo
+from .registry import EnvSpec, register_env
+
+
+@dataclass(frozen=True)
+class SyntheticLayout:
+    ''' The nodes, links, routes and demand drawn for a `SyntheticNetworkConfig`.
+
+    Attributes:
+        stop_xy: {stop id -> (x, y)}, in the order of the stop ids
+        stop_berth_num: {stop id -> berth number}
+        terminal_xy: {terminal id -> (x, y)}
+        links: [(head node, tail node, tt mean, tt cv)], the index of a link is its id
+        route_nodes: {route id -> [terminal id, stop ids..., end terminal id]}
+        route_headway: {route id -> schedule headway}
+        route_od_rate_table: {route id -> {origin stop id -> {destination stop id -> od rate}}}
+
+    '''
+    stop_xy: Dict[str, Tuple[float, float]]
+    stop_berth_num: Dict[str, int]
+    terminal_xy: Dict[str, Tuple[float, float]]
+    links: List[Tuple[str, str, float, float]]
+    route_nodes: Dict[str, List[str]]
+    route_headway: Dict[str, float]
+    route_od_rate_table: Dict[str, Dict[str, Dict[str, float]]]
+
+
+class SyntheticNetwork(Network):
+    ''' A corridor or a grid generated from a `SyntheticNetworkConfig`, see `generate_synthetic_layout`.
+
+    '''
+
+    def __init__(self, config: SyntheticNetworkConfig) -> None:
+        self._layout = generate_synthetic_layout(config)
+        super().__init__()
+
+    def _define_network(self):
+        layout = self._layout
+        for terminal_id, (x, y) in layout.terminal_xy.items():
+            self._G.add_node(terminal_id, node_type='terminal',
+                             terminal_node_geometry=TerminalNodeGeometry(x, y))
+            self._name_coordinates[terminal_id] = (x, y)
+        for stop_id, (x, y) in layout.stop_xy.items():
+            # the distance from the terminal differs by route, it is kept by the blueprint instead
+            stop_node_geometry = StopNodeGeometry(
+                x, y, layout.stop_berth_num[stop_id], 0)
+            self._G.add_node(stop_id, node_type='stop',
+                             stop_node_geometry=stop_node_geometry)
+            self._name_coordinates[stop_id] = (x, y)
+
+        for link_id, (head_node, tail_node, tt_mean, tt_cv) in enumerate(layout.links):
+            x_head, y_head = self._name_coordinates[head_node]
+            x_tail, y_tail = self._name_coordinates[tail_node]
+            # links are straight, so that their lengths are the manhattan distances used by the blueprint
+            length = abs(x_tail - x_head) + abs(y_tail - y_head)
+            link_geometry = LinkGeometry(
+                head_node, tail_node, x_head, y_head, length, 0)
+            self._G.add_edge(head_node, tail_node, link_id=link_id, link_geometry=link_geometry,
+                             link_distribution=LinkDistribution(tt_mean, tt_cv, 'normal'))
+
+
+class SyntheticRouteInfo(RouteInfo):
+    ''' The routes and the demand generated from a `SyntheticNetworkConfig`, see `generate_synthetic_layout`.
+
+    Attributes:
+        config: the config that the routes are generated from
+
+    '''
+    config: SyntheticNetworkConfig
+
+    def __init__(self, config: SyntheticNetworkConfig) -> None:
+        self.config = config
+        self._layout = generate_synthetic_layout(config)
+        super().__init__()
+
+    @override
+    def _define_route_ids(self) -> List[str]:
+        return list(self._layout.route_nodes)
+
+    @override
+    def _define_od_table(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return self._layout.route_od_rate_table
+
+    @override
+    def _define_schedule_headway(self) -> Dict[str, Tuple[float, float]]:
+        return {route_id: (headway, 0) for route_id, headway in self._layout.route_headway.items()}
+
+    @override
+    def _define_terminal(self) -> Dict[str, str]:
+        return {route_id: nodes[0] for route_id, nodes in self._layout.route_nodes.items()}
+
+    @override
+    def _define_visit_seq_stops(self) -> Dict[str, List[str]]:
+        return {route_id: nodes[1:-1] for route_id, nodes in self._layout.route_nodes.items()}
+
+    @override
+    def _define_end_terminal(self) -> Dict[str, str]:
+        return {route_id: nodes[-1] for route_id, nodes in self._layout.route_nodes.items()}
+
+    @override
+    def _define_boarding_rate(self) -> Dict[str, Dict[str, float]]:
+        board_rate = 1 / self.config.pax_board_time_mean
+        return {route_id: {stop_id: board_rate for stop_id in nodes[1:-1]}
+                for route_id, nodes in self._layout.route_nodes.items()}
+
+
+def register_synthetic_env(env_name: str, config: SyntheticNetworkConfig) -> None:
+    ''' Register a synthetic network under a name, so that `Blueprint(env_name)` builds it.
+
+    '''
+    register_env(env_name, EnvSpec('setup.synthetic:SyntheticNetwork', 'setup.synthetic:SyntheticRouteInfo',
+                                   'setup.synthetic_factory:SyntheticComponentsFactory', config))
+
+
+@lru_cache(maxsize=None)
+def generate_synthetic_layout(config: SyntheticNetworkConfig) -> SyntheticLayout:
+    ''' Draw the stops, links, routes and demand of a synthetic network.
+
+    Corridor: the stops are on a line, and each route visits a random run of consecutive stops, so that
+    the routes share the stops where their runs overlap.
+    Grid: the stops are on a lattice with links in both directions between neighbours. Each route enters the grid
+    at a random stop of one side and leaves it at the opposite side, turning at random towards a fixed
+    lateral direction, so that the routes share stops and links where their paths cross or run together.
+
+    Each route starts from a terminal next to its first stop and ends at a terminal next to its last stop,
+    which the routes starting or ending at the same stop from the same side share. Pax arrive at a stop at
+    `stop_pax_arrival_rate` scaled by a random weight of the stop, split evenly over the routes serving it,
+    and travel to at most `max_destination_num` random stops downstream on the route.
+
+    The layout is generated once per config, and shared by the network and the route info.
+
+    '''
+    rng = np.random.default_rng(config.seed)
+    if config.layout == 'corridor':
+        stop_xy, links, route_stops, route_sides = _generate_corridor(config, rng)
+    else:
+        assert config.layout == 'grid', f'unknown layout {config.layout}'
+        stop_xy, links, route_stops, route_sides = _generate_grid(config, rng)
+
+    stop_berth_num = {stop_id: int(rng.choice(config.berth_nums))
+                      for stop_id in stop_xy}
+    link_tt = {(head_node, tail_node): _draw_tt(config, rng, stop_xy[head_node], stop_xy[tail_node])
+               for head_node, tail_node in links}
+
+    terminal_xy: Dict[str, Tuple[float, float]] = {}
+    route_nodes: Dict[str, List[str]] = {}
+    for route_id, stops in route_stops.items():
+        start_side, end_side = route_sides[route_id]
+        terminal_id = _add_terminal(config, terminal_xy, stop_xy[stops[0]], stops[0], start_side)
+        end_terminal_id = _add_terminal(config, terminal_xy, stop_xy[stops[-1]], stops[-1], end_side)
+        for head_node, tail_node in ((terminal_id, stops[0]), (stops[-1], end_terminal_id)):
+            if (head_node, tail_node) not in link_tt:
+                # the access links run at the mean speed with the mean cv
+                link_tt[(head_node, tail_node)] = (config.terminal_access_length / np.mean(config.speed_range),
+                                                   float(np.mean(config.tt_cv_range)))
+        route_nodes[route_id] = [terminal_id] + stops + [end_terminal_id]
+
+    route_headway = {route_id: float(rng.choice(config.headways))
+                     for route_id in route_stops}
+    route_od_rate_table = _generate_od_tables(config, rng, stop_xy, route_stops)
+
+    return SyntheticLayout(
+        stop_xy=stop_xy,
+        stop_berth_num=stop_berth_num,
+        terminal_xy=terminal_xy,
+        links=[(head_node, tail_node, tt_mean, tt_cv)
+               for (head_node, tail_node), (tt_mean, tt_cv) in link_tt.items()],
+        route_nodes=route_nodes,
+        route_headway=route_headway,
+        route_od_rate_table=route_od_rate_table,
+    )
+
+
+def _generate_corridor(config: SyntheticNetworkConfig, rng: np.random.Generator) -> Tuple[
+        Dict[str, Tuple[float, float]], List[Tuple[str, str]], Dict[str, List[str]], Dict[str, Tuple[str, str]]]:
+    stop_num = config.stop_num
+    spacings = rng.uniform(*config.spacing_range, size=stop_num - 1)
+    xs = np.concatenate(([0.0], np.cumsum(spacings)))
+    stop_ids = [str(stop) for stop in range(1, stop_num + 1)]
+    stop_xy = {stop_id: (float(x), 0.0) for stop_id, x in zip(stop_ids, xs)}
+    links = list(zip(stop_ids[:-1], stop_ids[1:]))
+
+    min_stop_num, max_stop_num = config.route_stop_num_range
+    assert 2 <= min_stop_num <= max_stop_num, 'a route visits at least 2 stops'
+    route_stops: Dict[str, List[str]] = {}
+    for route in range(config.route_num):
+        route_stop_num = int(rng.integers(min_stop_num, min(max_stop_num, stop_num) + 1))
+        first_stop = int(rng.integers(0, stop_num - route_stop_num + 1))
+        route_stops[str(route)] = stop_ids[first_stop:first_stop + route_stop_num]
+    # the terminals are beside the corridor, below it for the starts and above it for the ends
+    route_sides = {route_id: ('i', 'o') for route_id in route_stops}
+    return stop_xy, links, route_stops, route_sides
+
+
+def _generate_grid(config: SyntheticNetworkConfig, rng: np.random.Generator) -> Tuple[
+        Dict[str, Tuple[float, float]], List[Tuple[str, str]], Dict[str, List[str]], Dict[str, Tuple[str, str]]]:
+    rows, cols = config.grid_rows, config.grid_cols
+    assert rows >= 2 and cols >= 2, 'a grid has at least 2 rows and 2 columns'
+    xs = np.concatenate(([0.0], np.cumsum(rng.uniform(*config.spacing_range, size=cols - 1))))
+    ys = np.concatenate(([0.0], np.cumsum(rng.uniform(*config.spacing_range, size=rows - 1))))
+
+    def stop_id(row: int, col: int) -> str:
+        return str(row * cols + col + 1)
+
+    stop_xy = {stop_id(row, col): (float(xs[col]), float(ys[row]))
+               for row in range(rows) for col in range(cols)}
+    links = []
+    for row in range(rows):
+        for col in range(cols):
+            for next_row, next_col in ((row, col + 1), (row + 1, col)):
+                if next_row < rows and next_col < cols:
+                    links.append((stop_id(row, col), stop_id(next_row, next_col)))
+                    links.append((stop_id(next_row, next_col), stop_id(row, col)))
+
+    route_stops: Dict[str, List[str]] = {}
+    route_sides: Dict[str, Tuple[str, str]] = {}
+    for route in range(config.route_num):
+        # the main direction crosses the grid, the lateral direction is where the route turns to
+        horizontal = bool(rng.integers(2))
+        main_step, lateral_step = int(rng.choice((-1, 1))), int(rng.choice((-1, 1)))
+        main_size, lateral_size = (cols, rows) if horizontal else (rows, cols)
+        main = 0 if main_step == 1 else main_size - 1
+        lateral = int(rng.integers(lateral_size))
+        # turn at about a third of the stops, as long as the grid allows
+        turn_probability = 1 / 3
+        path = []
+        while 0 <= main < main_size:
+            path.append(stop_id(lateral, main) if horizontal else stop_id(main, lateral))
+            if rng.random() < turn_probability and 0 <= lateral + lateral_step < lateral_size:
+                lateral += lateral_step
+            else:
+                main += main_step
+        route_stops[str(route)] = path
+        # the terminals are outside the grid, before the first stop and after the last stop in the main direction
+        sides = ('w', 'e') if horizontal else ('s', 'n')
+        route_sides[str(route)] = sides if main_step == 1 else (sides[1], sides[0])
+    return stop_xy, links, route_stops, route_sides
+
+
+def _draw_tt(config: SyntheticNetworkConfig, rng: np.random.Generator,
+             head_xy: Tuple[float, float], tail_xy: Tuple[float, float]) -> Tuple[float, float]:
+    length = abs(tail_xy[0] - head_xy[0]) + abs(tail_xy[1] - head_xy[1])
+    speed = rng.uniform(*config.speed_range)
+    return float(length / speed), float(rng.uniform(*config.tt_cv_range))
+
+
+# the offset of a terminal from its stop in the unit of the access length, by the side of the stop
+# ('i' and 'o' for the starts and the ends of the corridor, the compass points for the grid)
+_TERMINAL_SIDE_OFFSET = {'i': (0, -1), 'o': (0, 1), 'w': (-1, 0), 'e': (1, 0), 's': (0, -1), 'n': (0, 1)}
+
+
+def _add_terminal(config: SyntheticNetworkConfig, terminal_xy: Dict[str, Tuple[float, float]],
+                  xy: Tuple[float, float], stop_id: str, side: str) -> str:
+    dx, dy = _TERMINAL_SIDE_OFFSET[side]
+    terminal_id = f'T{stop_id}{side}'
+    terminal_xy[terminal_id] = (xy[0] + dx * config.terminal_access_length,
+                                xy[1] + dy * config.terminal_access_length)
+    return terminal_id
+
+
+def _generate_od_tables(config: SyntheticNetworkConfig, rng: np.random.Generator,
+                        stop_xy: Dict[str, Tuple[float, float]], route_stops: Dict[str, List[str]]
+                        ) -> Dict[str, Dict[str, Dict[str, float]]]:
+    # a lognormal weight of mean 1 makes some stops busier than others
+    sigma = 0.5
+    stop_weight = dict(zip(stop_xy, rng.lognormal(-sigma**2 / 2, sigma, size=len(stop_xy)).tolist()))
+    stop_route_num: Dict[str, int] = {}
+    for stops in route_stops.values():
+        for stop_id in stops:
+            stop_route_num[stop_id] = stop_route_num.get(stop_id, 0) + 1
+
+    route_od_rate_table: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for route_id, stops in route_stops.items():
+        od_rate_table: Dict[str, Dict[str, float]] = {}
+        # nobody boards at the last stop
+        for idx, origin_stop_id in enumerate(stops[:-1]):
+            downstream_stops = stops[idx + 1:]
+            destination_num = min(config.max_destination_num, len(downstream_stops))
+            destinations = sorted(rng.choice(len(downstream_stops), size=destination_num, replace=False).tolist())
+            rate = config.stop_pax_arrival_rate * stop_weight[origin_stop_id] / \
+                stop_route_num[origin_stop_id] / destination_num
+            od_rate_table[origin_stop_id] = {downstream_stops[destination]: rate
+                                             for destination in destinations}
+        route_od_rate_table[route_id] = od_rate_table
+    return route_od_rate_table
@@ -0,0 +1,87 @@
+from typing import Dict
+
+from agent.agent import Agent
+from simulator.stop import Stop
+from simulator.stop_boarding import BoardingStop
+from simulator.link import Link
+from simulator.link_kernel import LinkKernel, KernelLink
+from simulator.terminal import Terminal
+from simulator.pax_generation import PaxGenerator
+from simulator.virtual_bus import VirtualBus
+from simulator.sampler import RandomStreams
+
+from .blueprint import Blueprint
+from .config_dataclass import StopNodeOperation, TerminalNodeOperation, PaxOperation
+from .synthetic import SyntheticRouteInfo
+
+
+class SyntheticComponentsFactory:
+    ''' Create components for the synthetic networks, adhering to the `ComponentFactory` Protocol
+
+    The mean boarding time of pax is taken from the `SyntheticNetworkConfig` of the routes.
+
+    '''
+
+    def __init__(self, blueprint: Blueprint) -> None:
+        route_info = blueprint.route_info
+        assert isinstance(route_info, SyntheticRouteInfo), 'the blueprint is not of a synthetic network'
+        self._stop_node_operation: Dict[str, StopNodeOperation] = {}
+        for stop_id in blueprint.network.stop_node_geometry_info:
+            node_operation = StopNodeOperation(
+                is_alight=False, queue_rule='FO', board_truncation='rtd')
+            self._stop_node_operation[stop_id] = node_operation
+
+        board_time_mean = route_info.config.pax_board_time_mean
+        self._pax_operation = PaxOperation(
+            pax_board_time_mean=board_time_mean, pax_board_time_std=board_time_mean * 0.25,
+            pax_board_time_type='normal', pax_arrival_type='poisson')
+
+    def create_virtual_bus(self, blueprint: Blueprint, agent: Agent) -> VirtualBus:
+        virtual_bus = VirtualBus(blueprint)
+        slack = 0
+        virtual_bus.initialize_with_perfect_schedule(
+            blueprint.route_stop_arrival_rate, slack)
+
+        return virtual_bus
+
+    def create_pax_generator(self, blueprint: Blueprint, virtual_bus: VirtualBus,
+                             random_streams: RandomStreams) -> PaxGenerator:
+        pax_generator = PaxGenerator(
+            blueprint.route_info, self._pax_operation, virtual_bus, random_streams)
+        return pax_generator
+
+    def create_terminals(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> Dict[str, Terminal]:
+        terminals = {}
+        for terminal_id, routes in blueprint.route_info.terminal_to_routes_info.items():
+            terminal_node_geometry = blueprint.network.terminal_node_geometry_info[terminal_id]
+            terminal_node_operation = TerminalNodeOperation()
+            terminal = Terminal(terminal_id, terminal_node_geometry,
+                                terminal_node_operation, routes, blueprint, virtual_bus)
+            terminals[terminal_id] = terminal
+        return terminals
+
+    def create_links(self, blueprint: Blueprint, random_streams: RandomStreams) -> Dict[str, Link]:
+        links = {}
+        # all the links share one kernel that moves every running bus of the network at once
+        link_kernel = LinkKernel()
+        for link_id, link_geometry in blueprint.network.link_geometry_info.items():
+            link_distribution = blueprint.network.link_distribution[link_id]
+            link = KernelLink(link_id, link_geometry,
+                              link_distribution, random_streams, link_kernel)
+            links[link_id] = link
+        return links
+
+    def create_stops(self, blueprint: Blueprint, virtual_bus: VirtualBus) -> Dict[str, Stop]:
+        stops = {}
+        for stop_id, stop_node_geometry in blueprint.network.stop_node_geometry_info.items():
+            node_operation = self._stop_node_operation[stop_id]
+            stop = BoardingStop(stop_id, stop_node_geometry,
+                                node_operation, virtual_bus)
+            stops[stop_id] = stop
+        return stops
+
+    def get_stop_node_operation(self, stop_id: str) -> StopNodeOperation:
+        return self._stop_node_operation[stop_id]
+
+    def get_pax_operation(self) -> PaxOperation:
+        return self._pax_operation
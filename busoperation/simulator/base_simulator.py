@@ -0,0 +1,182 @@
+from typing import List, Dict, Tuple, Optional
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from agent.agent import Agent
+from setup.blueprint import Blueprint
+from setup.config_dataclass import TracerConfig
+from simulator.virtual_bus import VirtualBus
+
+from .holder import Holder
+from .bus import Bus
+from .pax_generation import PaxGenerator
+from .terminal import Terminal
+from .tracer import Tracer
+from .trajectory import TrajectoryRecorder
+from .snapshot import Snapshot
+from .mediator import Mediator
+from .builder import Builder
+from .link import Link
+from .stop import Stop
+from .sampler import RandomStreams
+from .profiler import PhaseProfiler
+
+
+class BaseSimulator(ABC):
+    ''' The components, snapshots and metrics shared by the simulation engines.
+
+    An engine moves the components forward in its own way, and hands the agent a snapshot at each decision epoch,
+    i.e., when some buses wait for holding actions, by `step_to_decision`.
+
+    Attributes:
+        total_buses: all the buses that have been dispatched from terminals
+        trajectory_recorder: the recorder of the trajectories of all the dispatched buses
+
+    Methods:
+        step_to_decision(self, episode_duration: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]
+        take_snapshot(self, t: int) -> Snapshot
+        get_metrics(self) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]
+        get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]
+
+    '''
+    _agent: Agent
+    _blueprint: Blueprint
+    _builder: Builder
+    _random_streams: RandomStreams
+    _virtual_bus: VirtualBus
+    _pax_generator: PaxGenerator
+    _terminals: Dict[str, Terminal]
+    _links: Dict[str, Link]
+    _stops: Dict[str, Stop]
+    _holder: Holder
+    _mediator: Mediator
+    _tracer: Tracer
+    _trajectory_recorder: TrajectoryRecorder
+    _total_buses: List[Bus]
+    _profiler: Optional[PhaseProfiler]
+
+    def __init__(self, blueprint: Blueprint, agent: Agent, seed: Optional[int] = None,
+                 tracer_config: TracerConfig = TracerConfig(), profiler: Optional[PhaseProfiler] = None) -> None:
+        self._agent = agent
+        # if given, the time of each phase of a step is accumulated by the profiler
+        self._profiler = profiler
+        self._blueprint = blueprint
+        # Random streams for link travel times and boarding times, drawn from numpy's global state if no seed is given
+        self._random_streams = RandomStreams(seed)
+        # A builder is used to create all the components in the simulation with the help of a blueprint
+        self._builder = Builder(blueprint, self._random_streams)
+
+        # A virtual bus is used to specify the `initial` condition of the dynamics
+        # if the agent has created a virtual bus (by repeatedly running the simulation and taking the convergent holding time), use it
+        # otherwise, create a virtual bus with perfect schedule (without repeated simulation)
+        if hasattr(agent, 'virtual_bus'):
+            self._virtual_bus = agent.virtual_bus
+        else:
+            self._virtual_bus = self._builder.create_virtual_bus(self._agent)
+        # # A pax generator is used to generate passengers at stops
+        self._pax_generator = self._builder.create_pax_generator(
+            self._virtual_bus)
+        # Terminals that dispatch and recycle buses
+        self._terminals = self._builder.create_terminals(self._virtual_bus)
+        # Links that buses run on
+        self._links = self._builder.create_links()
+        # Stops that buses stop at to pick up and drop off passengers
+        self._stops = self._builder.create_stops(self._virtual_bus)
+        # Holder that holds buses after they finish their operation at a stop
+        self._holder: Holder = Holder(self._agent, self._virtual_bus)
+        # A mediator is used to transfer buses between components
+        self._mediator: Mediator = Mediator(
+            blueprint, self._terminals, self._links, self._stops, self._holder, profiler)
+
+        # A tracer is used to record the status of the simulation
+        self._tracer: Tracer = Tracer(tracer_config)
+        # A trajectory recorder keeps the trajectories of all the buses in columnar arrays
+        self._trajectory_recorder = TrajectoryRecorder(
+            tracer_config.trajectory_sample_interval, tracer_config.trajectory_change_only)
+        # Maintain a list of all the buses that have been dispatched from terminals
+        # used for time-space diagram visualization in the end
+        self._total_buses: List[Bus] = []
+
+        # self._network.visualize()
+
+    @property
+    def total_buses(self) -> List[Bus]:
+        ''' Get all the buses that have been dispatched from terminals.
+
+        '''
+        return self._total_buses
+
+    @property
+    def trajectory_recorder(self) -> TrajectoryRecorder:
+        ''' Get the recorder of the trajectories of all the dispatched buses.
+
+        The points of the holding buses are recorded up to the last second first.
+
+        '''
+        self._holder.fill_trajectories()
+        return self._trajectory_recorder
+
+    @abstractmethod
+    def step_to_decision(self, episode_duration: int,
+                         stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]:
+        ''' Accept holding actions and move forward until the next decision epoch.
+
+        Args:
+            episode_duration: the number of seconds of the episode
+            stop_bus_hold_times: {(stop_id, route_id, bus_id): specified holding time},
+                the actions for the buses in the last returned snapshot
+
+        Returns:
+            Snapshot: a snapshot at the next time when some buses wait for holding actions,
+                or None if the episode is finished (a final snapshot is still taken for the metrics)
+        '''
+        ...
+
+    def take_snapshot(self, t: int) -> Snapshot:
+        ''' Take a snapshot of the whole current state of the simulation.
+
+        '''
+        snapshot = self._tracer.take_snapshot(
+            t, self._links, self._stops, self._holder)
+        return snapshot
+
+    def get_metrics(self) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]:
+        ''' Get the metrics of the simulation.
+
+        Generally called after one episode of simulation finished.
+
+        Returns:
+            metrics: a dictionary of metrics
+            route_dispatch_time_trip_time: a dictionary {route_id -> {dispatch_time -> trip_time}}
+                dispatch_time is the time when the bus is dispatched from the terminal
+                trip_time is the duration of the trip from the terminal to the ending terminal
+
+        '''
+        # stats all the stops except the last stop
+        route_stats_stop_ids: Dict[str, List[str]] = defaultdict(list)
+        for route_id, route in self._blueprint.route_info.route_infos.items():
+            route_stats_stop_ids[route_id].extend(route.visit_seq_stops[:-1])
+        metrics = self._tracer.get_metric(
+            route_stats_stop_ids, self._stops, self._holder)
+
+        # stats the trip time
+        route_dispatch_time_trip_time: Dict[str, Dict[int, int]] = {}
+        for route_id, route in self._blueprint.route_info.route_infos.items():
+            dispatch_time_trip_time = {}
+            for bus in self._total_buses:
+                if bus.route_id == route_id:
+                    if bus.log.end_time is not None:
+                        assert bus.log.dispatch_time is not None
+                        trip_time = bus.log.end_time - bus.log.dispatch_time
+                        dispatch_time_trip_time[bus.log.dispatch_time] = trip_time
+            route_dispatch_time_trip_time[route_id] = dispatch_time_trip_time
+        return metrics, route_dispatch_time_trip_time
+
+    def get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]:
+        ''' Get the average holding time at each stop for each route.
+
+        Generally called after one episode of simulation finished.
+
+        '''
+        route_stop_average_hold_time = self._tracer.get_stop_average_hold_time()
+        return route_stop_average_hold_time
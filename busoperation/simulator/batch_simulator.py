@@ -0,0 +1,800 @@
+from typing import List, Dict, Tuple, Optional
+from collections import defaultdict
+
+import numpy as np
+
+from agent.agent import Agent
+from setup.blueprint import Blueprint
+from simulator.virtual_bus import VirtualBus
+
+from .builder import Builder
+from .pax_generation import find_common_routes
+from .sampler import RandomStreams, BlockSampler
+from .snapshot import BatchHolderSnapshot
+from .utils import RunningStatArray, HeadwayStatArray
+
+
+# bus status codes of `BatchSimulator`
+NOT_DISPATCHED = 0
+ON_LINK = 1
+QUEUEING = 2
+IN_BERTH = 3
+LEAVING = 4
+HOLDING = 5
+FINISHED = 6
+
+# berth code for the padding berths of stops with fewer berths than the others
+BLOCKED_BERTH = -2
+
+
+def _rank_in_groups(*keys: np.ndarray) -> np.ndarray:
+    ''' Rank elements within the groups of equal keys, keeping the given order of elements inside each group.
+
+    '''
+    if len(keys[0]) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # lexsort is stable, so the given order is kept inside each group
+    order = np.lexsort(keys[::-1])
+    is_new_group = np.zeros(len(order), dtype=bool)
+    is_new_group[0] = True
+    for key in keys:
+        sorted_key = key[order]
+        is_new_group[1:] |= sorted_key[1:] != sorted_key[:-1]
+    positions = np.arange(len(order))
+    group_starts = np.maximum.accumulate(np.where(is_new_group, positions, 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = positions - group_starts
+    return ranks
+
+
+def _find_common_line_pairs(blueprint: Blueprint) -> List[Tuple[str, str]]:
+    ''' Find the OD pairs with positive rates that more than one route serves.
+
+    '''
+    od_pairs = [(origin_stop_id, dest_stop_id)
+                for od_table in blueprint.route_info.route_OD_rate_table.values()
+                for origin_stop_id, dest_stop_od in od_table.items()
+                for dest_stop_id, rate in dest_stop_od.items() if rate > 0]
+    return [od_pair for od_pair, routes in zip(od_pairs, find_common_routes(
+        blueprint.route_info.route_infos, od_pairs)) if len(routes) > 1]
+
+
+class BatchSimulator:
+    ''' Simulate independent replications of the same blueprint in lockstep.
+
+    The state of all the replications is kept in NumPy arrays with a leading replication axis
+    (structure of arrays) instead of one object graph per replication:
+        buses: (replication, bus) arrays of status, position, speed, boarding and holding timers,
+            where the bus index is the order of dispatching, which is the same in all replications
+        stops: (replication, stop, berth) array of the buses in berths
+        pax queues and logs: (replication, route-stop) arrays of passenger counts and online statistics
+    Every step moves all the replications with a fixed number of array operations, so the Python overhead
+    of a step is shared by all the replications.
+
+    The dynamics follow `Simulator.step` phase by phase, including the order of processing buses within a step.
+    Each replication has its own `RandomStreams` for link travel times and boarding times, and the passenger
+    arrivals of all the replications are drawn from numpy's global random state in one call per step.
+    Boarding times are drawn when passengers start boarding rather than when they arrive,
+    which is the same sequence for stops served by a single route. Hence a single replication reproduces
+    `Simulator` with the same seeds. Trajectories are not recorded.
+
+    Holding actions are given by `Agent.calculate_batch_hold_time`. The pax queues are counts of the exclusive
+    pax groups of each route, so networks with common-line OD pairs (see `find_common_routes`) are not supported,
+    check a blueprint by `supports` before falling back to `Simulator`.
+
+    Attributes:
+        replication_num: the number of replications
+
+    Methods:
+        supports(blueprint: Blueprint) -> bool
+        step(self, t: int, hold_times: np.ndarray) -> BatchHolderSnapshot
+        get_metrics(self) -> List[Tuple[Dict[str, float], Dict[str, Dict[int, int]]]]
+        get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]
+
+    '''
+    _blueprint: Blueprint
+    _virtual_bus: VirtualBus
+    _random_streams: List[RandomStreams]
+    _link_samplers: List[List[Optional[BlockSampler]]]
+    _stop_board_samplers: List[List[Optional[BlockSampler]]]
+    _latest_snapshot: Optional[BatchHolderSnapshot]
+
+    def __init__(self, blueprint: Blueprint, agent: Agent, replication_num: int,
+                 seeds: Optional[List[int]] = None, bus_capacity: int = 64) -> None:
+        assert replication_num >= 1
+        assert seeds is None or len(seeds) == replication_num
+        self._blueprint = blueprint
+        self.replication_num = replication_num
+        # one set of random streams per replication, drawn from numpy's global state if no seeds are given
+        self._random_streams = [RandomStreams(None if seeds is None else seeds[replication])
+                                for replication in range(replication_num)]
+        builder = Builder(blueprint, self._random_streams[0])
+        if hasattr(agent, 'virtual_bus'):
+            self._virtual_bus = agent.virtual_bus
+        else:
+            self._virtual_bus = builder.create_virtual_bus(agent)
+
+        self._compile_network(builder)
+        self._compile_od_pairs(builder)
+        self._create_samplers(builder)
+        self._create_state(bus_capacity)
+        self._latest_snapshot = None
+
+    @staticmethod
+    def supports(blueprint: Blueprint) -> bool:
+        ''' Whether the batch simulator can simulate the blueprint, i.e., no OD pair is served by common lines.
+
+        '''
+        return len(_find_common_line_pairs(blueprint)) == 0
+
+    def _compile_network(self, builder: Builder) -> None:
+        compiled = self._blueprint.compiled
+        route_infos = self._blueprint.route_info.route_infos
+
+        self._route_ids: List[str] = list(compiled.route_ids)
+        self._stop_ids: List[str] = list(compiled.stop_ids)
+        self._link_ids: List[str] = list(compiled.link_ids)
+        stop_index = {stop_id: idx for idx,
+                      stop_id in enumerate(self._stop_ids)}
+        self._link_lengths = compiled.link_length
+
+        # berths are right-aligned, so that the upstream padding berths of stops with fewer berths are never used
+        berth_nums = compiled.node_berth_num[compiled.stop_nodes].tolist()
+        self._berth_num = max(berth_nums)
+        self._berth_template = np.full(
+            (len(self._stop_ids), self._berth_num), -1, dtype=np.int64)
+        for idx, berth_num in enumerate(berth_nums):
+            self._berth_template[idx, :self._berth_num -
+                                 berth_num] = BLOCKED_BERTH
+        self._stop_truncates_at_arrival = np.array(
+            [builder.get_stop_node_operation(stop_id).board_truncation == 'arrival' for stop_id in self._stop_ids])
+
+        # route-stop indices, for the pax queues and the logs of each route at each stop
+        self._route_stop_ids: List[Tuple[str, str]] = []
+        # (route index, node index) -> link index, stop index and route-stop index, node 0 is the terminal
+        max_node_num = max(len(route.visit_seq_stops)
+                           for route in route_infos.values()) + 2
+        self._route_links = np.full(
+            (len(self._route_ids), max_node_num), -1, dtype=np.int64)
+        self._route_stops = np.full(
+            (len(self._route_ids), max_node_num), -1, dtype=np.int64)
+        self._route_route_stops = np.full(
+            (len(self._route_ids), max_node_num), -1, dtype=np.int64)
+        self._route_last_nodes = np.zeros(len(self._route_ids), dtype=np.int64)
+        self._route_headways: List[float] = []
+        rs_arrival_times, rs_rtd_times, rs_departure_times, rs_headways = [], [], [], []
+        for route_idx, (route_id, route) in enumerate(route_infos.items()):
+            node_seq = [route.terminal_id] + \
+                route.visit_seq_stops + [route.end_terminal_id]
+            node_indices = [compiled.node_index[node_id]
+                            for node_id in node_seq[:-1]]
+            self._route_links[route_idx, :len(node_indices)] = \
+                compiled.route_next_link[route_idx, node_indices]
+            for node_idx, stop_id in enumerate(route.visit_seq_stops, start=1):
+                self._route_stops[route_idx, node_idx] = stop_index[stop_id]
+                self._route_route_stops[route_idx,
+                                        node_idx] = len(self._route_stop_ids)
+                self._route_stop_ids.append((route_id, stop_id))
+                rs_arrival_times.append(
+                    self._virtual_bus.route_stop_arrival_time[route_id][stop_id])
+                rs_rtd_times.append(
+                    self._virtual_bus.route_stop_rtd_time[route_id][stop_id])
+                rs_departure_times.append(
+                    self._virtual_bus.route_stop_departure_time[route_id][stop_id])
+                rs_headways.append(route.schedule_headway)
+            # the node index of the ending terminal
+            self._route_last_nodes[route_idx] = len(node_seq) - 1
+            self._route_headways.append(route.schedule_headway)
+        self._route_stop_index = {route_stop: idx for idx,
+                                  route_stop in enumerate(self._route_stop_ids)}
+        self._rs_arrival_times = np.array(rs_arrival_times, dtype=np.float64)
+        self._rs_rtd_times = np.array(rs_rtd_times, dtype=np.float64)
+        self._rs_departure_times = np.array(
+            rs_departure_times, dtype=np.float64)
+        self._rs_headways = np.array(rs_headways, dtype=np.float64)
+
+    def _compile_od_pairs(self, builder: Builder) -> None:
+        ''' Compile the OD pairs with positive rates in the same order as `PaxGenerator`.
+
+        '''
+        pax_operation = builder.get_pax_operation()
+        assert pax_operation.pax_arrival_type in ('deterministic', 'poisson')
+        self._pax_arrival_type = pax_operation.pax_arrival_type
+        pax_arrival_start_time = self._virtual_bus.route_stop_pax_arrival_start_time
+        rates, start_times, route_stops, od_pairs = [], [], [], []
+        for route_id, od_table in self._blueprint.route_info.route_OD_rate_table.items():
+            for origin_stop_id, dest_stop_od in od_table.items():
+                for dest_stop_id, rate in dest_stop_od.items():
+                    if rate <= 0:
+                        continue
+                    od_pairs.append((origin_stop_id, dest_stop_id))
+                    rates.append(rate)
+                    start_times.append(
+                        pax_arrival_start_time[route_id][origin_stop_id])
+                    route_stops.append(
+                        self._route_stop_index[(route_id, origin_stop_id)])
+        # the pax queues are counts of exclusive groups, which pax of common-line OD pairs do not fit in
+        common_line_pairs = _find_common_line_pairs(self._blueprint)
+        assert len(common_line_pairs) == 0, \
+            f'the batch simulator does not support common-line pax, e.g., of OD pair {common_line_pairs[:1]}'
+        self._pair_rates = np.array(rates, dtype=np.float64)
+        self._pair_start_times = np.array(start_times, dtype=np.float64)
+        # pairs of the same route and origin stop are contiguous
+        self._pair_route_stops = np.array(route_stops, dtype=np.int64)
+        self._pair_markers = np.zeros(
+            (self.replication_num, len(rates)), dtype=np.float64)
+
+    def _create_samplers(self, builder: Builder) -> None:
+        ''' Spawn the samplers of each replication in the same order as the components of `Simulator`.
+
+        '''
+        pax_operation = builder.get_pax_operation()
+        self._pax_board_time_type = pax_operation.pax_board_time_type
+        self._pax_board_rate = 1 / pax_operation.pax_board_time_mean
+        origin_stops: List[int] = []
+        for od_table in self._blueprint.route_info.route_OD_rate_table.values():
+            for origin_stop_id in od_table:
+                stop_idx = self._stop_ids.index(origin_stop_id)
+                if stop_idx not in origin_stops:
+                    origin_stops.append(stop_idx)
+
+        compiled = self._blueprint.compiled
+        self._link_samplers = []
+        self._stop_board_samplers = []
+        for random_streams in self._random_streams:
+            stop_board_samplers: List[Optional[BlockSampler]] = [
+                None] * len(self._stop_ids)
+            if self._pax_board_time_type == 'normal':
+                for stop_idx in origin_stops:
+                    stop_board_samplers[stop_idx] = random_streams.create_normal_sampler(
+                        pax_operation.pax_board_time_mean, pax_operation.pax_board_time_std, lower=0.01, upper=10)
+            link_samplers: List[Optional[BlockSampler]] = []
+            for link_idx, tt_type in enumerate(compiled.link_tt_types):
+                assert tt_type == 'normal'
+                tt_mean = float(compiled.link_tt_mean[link_idx])
+                link_samplers.append(random_streams.create_normal_sampler(
+                    tt_mean, tt_mean * float(compiled.link_tt_cv[link_idx]), lower=10))
+            self._stop_board_samplers.append(stop_board_samplers)
+            self._link_samplers.append(link_samplers)
+
+    def _create_state(self, bus_capacity: int) -> None:
+        replication_num = self.replication_num
+        route_stop_shape = (replication_num, len(self._route_stop_ids))
+
+        # buses, the bus index is the order of dispatching
+        self._bus_num = 0
+        self._bus_routes = np.zeros(bus_capacity, dtype=np.int64)
+        self._bus_ids: List[str] = []
+        self._bus_dispatch_times: List[int] = []
+        self._route_round_count = [1] * len(self._route_ids)
+        self._bus_status = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int8)
+        # the index of the last visited node on the route, 0 for the terminal
+        self._bus_nodes = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        self._bus_positions = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        # buses not on links have zero speed and infinite link length, so they never move or exit
+        self._bus_speeds = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        self._bus_link_lengths = np.full(
+            (replication_num, bus_capacity), np.inf, dtype=np.float64)
+        self._bus_links = np.full(
+            (replication_num, bus_capacity), -1, dtype=np.int64)
+        # the order of entering links, entering the entry queue of stops, the leave queue of stops and the holder
+        self._bus_link_seqs = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        self._bus_queue_seqs = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        self._bus_leave_seqs = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        self._bus_hold_seqs = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        self._seq_count = 0
+        self._bus_boarding = np.zeros(
+            (replication_num, bus_capacity), dtype=bool)
+        self._bus_board_fractions = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        self._bus_board_rates = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        # the number of pax arrived at the queue before the bus arrived, for the 'arrival' board truncation
+        self._bus_arrival_marks = np.zeros(
+            (replication_num, bus_capacity), dtype=np.int64)
+        # the time to finish holding, -1 if the holding action is not given yet
+        self._bus_release_times = np.full(
+            (replication_num, bus_capacity), -1, dtype=np.int64)
+        self._bus_end_times = np.full(
+            (replication_num, bus_capacity), -1, dtype=np.int64)
+        # schedule deviations at the current stop, of the bus and of the bus right before it
+        self._bus_epsilon_arrival = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        self._bus_epsilon_rtd = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        self._bus_last_epsilon_arrival = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+        self._bus_last_epsilon_rtd = np.zeros(
+            (replication_num, bus_capacity), dtype=np.float64)
+
+        # stops
+        self._berths = np.repeat(
+            self._berth_template[None, :, :], replication_num, axis=0)
+
+        # pax queues of each route at each stop
+        self._queue_pax_nums = np.zeros(route_stop_shape, dtype=np.int64)
+        self._queue_arrival_counts = np.zeros(route_stop_shape, dtype=np.int64)
+        self._queue_board_counts = np.zeros(route_stop_shape, dtype=np.int64)
+        self._queue_step_arrivals = np.zeros(route_stop_shape, dtype=np.int64)
+
+        # logs, the first virtual bus is recorded at each stop with zero schedule deviations
+        self._arrival_counts = np.ones(route_stop_shape, dtype=np.int64)
+        self._rtd_counts = np.ones(route_stop_shape, dtype=np.int64)
+        self._departure_counts = np.ones(route_stop_shape, dtype=np.int64)
+        self._last_epsilon_arrival = np.zeros(
+            route_stop_shape, dtype=np.float64)
+        self._last_epsilon_rtd = np.zeros(route_stop_shape, dtype=np.float64)
+        self._arrival_headway = HeadwayStatArray(route_stop_shape)
+        self._rtd_headway = HeadwayStatArray(route_stop_shape)
+        self._departure_headway = HeadwayStatArray(route_stop_shape)
+        self._abs_epsilon_arrival = RunningStatArray(route_stop_shape)
+        self._abs_epsilon_rtd = RunningStatArray(route_stop_shape)
+        self._abs_epsilon_departure = RunningStatArray(route_stop_shape)
+        self._hold_time = RunningStatArray(route_stop_shape)
+        all_index = np.indices(route_stop_shape).reshape(2, -1)
+        index = (all_index[0], all_index[1])
+        zeros = np.zeros(all_index.shape[1], dtype=np.float64)
+        self._arrival_headway.add_time(
+            index, self._rs_arrival_times[index[1]])
+        self._rtd_headway.add_time(index, self._rs_rtd_times[index[1]])
+        self._departure_headway.add_time(
+            index, self._rs_departure_times[index[1]])
+        self._abs_epsilon_arrival.add(index, zeros)
+        self._abs_epsilon_rtd.add(index, zeros)
+        self._abs_epsilon_departure.add(index, zeros)
+
+    def step(self, t: int, hold_times: np.ndarray) -> BatchHolderSnapshot:
+        ''' Accept holding actions and move the buses of all the replications one step forward.
+
+        Args:
+            t: current time
+            hold_times: the holding times of the buses in the last returned snapshot, in the same order
+
+        Returns:
+            BatchHolderSnapshot: the buses waiting for holding actions at time t
+        '''
+        # 0. dispatch buses from terminals to their first links
+        self._dispatch(t)
+        # 1. passengers arrive at stops
+        self._generate_pax(t)
+        # 2. link operation
+        self._forward_links(t)
+        # 3. stop operation
+        self._enter_berths()
+        self._board()
+        self._check_leave()
+        self._leave(t)
+        # 4. holding operation
+        self._set_hold_action(hold_times)
+        self._release(t)
+
+        return self._take_snapshot(t)
+
+    def _dispatch(self, t: int) -> None:
+        if t <= 0:
+            return
+        for route_idx, schedule_headway in enumerate(self._route_headways):
+            if t % int(schedule_headway) != 0:
+                continue
+            if self._bus_num == len(self._bus_routes):
+                self._grow_buses()
+            bus = self._bus_num
+            self._bus_num += 1
+            self._bus_routes[bus] = route_idx
+            self._bus_ids.append(str(self._route_round_count[route_idx]))
+            self._route_round_count[route_idx] += 1
+            self._bus_dispatch_times.append(t)
+
+            replications = np.arange(self.replication_num)
+            buses = np.full(self.replication_num, bus, dtype=np.int64)
+            self._bus_nodes[:, bus] = 0
+            self._enter_links(replications, buses)
+
+    def _enter_links(self, replications: np.ndarray, buses: np.ndarray) -> None:
+        ''' Put buses at the head node of the next links of their routes, in the given order.
+
+        '''
+        links = self._route_links[self._bus_routes[buses],
+                                  self._bus_nodes[replications, buses]]
+        travel_times = np.array([self._link_samplers[replication][link].sample()
+                                 for replication, link in zip(replications.tolist(), links.tolist())])
+        link_lengths = self._link_lengths[links]
+        self._bus_status[replications, buses] = ON_LINK
+        self._bus_links[replications, buses] = links
+        self._bus_positions[replications, buses] = 0.0
+        self._bus_speeds[replications, buses] = link_lengths / travel_times
+        self._bus_link_lengths[replications, buses] = link_lengths
+        self._bus_link_seqs[replications, buses] = self._next_seqs(len(buses))
+
+    def _generate_pax(self, t: int) -> None:
+        self._queue_step_arrivals[:] = 0
+        active_pairs = np.flatnonzero(t > self._pair_start_times)
+        if len(active_pairs) == 0:
+            return
+        rates = self._pair_rates[active_pairs]
+        if self._pax_arrival_type == 'deterministic':
+            markers = self._pair_markers[:, active_pairs] + rates
+            pax_nums = (markers >= 1).astype(np.int64)
+            self._pair_markers[:, active_pairs] = markers - pax_nums
+        else:
+            # the first replication consumes the global random state in the same way as `PaxGenerator`
+            pax_nums = np.random.poisson(
+                rates, size=(self.replication_num, len(active_pairs)))
+
+        pair_route_stops = self._pair_route_stops[active_pairs]
+        group_starts = np.flatnonzero(
+            np.diff(pair_route_stops, prepend=-1) != 0)
+        route_stops = pair_route_stops[group_starts]
+        route_stop_arrivals = np.add.reduceat(pax_nums, group_starts, axis=1)
+        self._queue_step_arrivals[:, route_stops] = route_stop_arrivals
+        self._queue_pax_nums[:, route_stops] += route_stop_arrivals
+        self._queue_arrival_counts[:, route_stops] += route_stop_arrivals
+
+    def _forward_links(self, t: int) -> None:
+        self._bus_positions += self._bus_speeds * 1.0
+        replications, buses = np.nonzero(
+            self._bus_positions >= self._bus_link_lengths)
+        if len(buses) == 0:
+            return
+        # links are operated in order, and buses on a link leave in the order of entering it
+        order = np.lexsort((self._bus_link_seqs[replications, buses],
+                            self._bus_links[replications, buses], replications))
+        replications, buses = replications[order], buses[order]
+        self._bus_speeds[replications, buses] = 0.0
+        self._bus_link_lengths[replications, buses] = np.inf
+        self._bus_links[replications, buses] = -1
+
+        routes = self._bus_routes[buses]
+        nodes = self._bus_nodes[replications, buses] + 1
+        self._bus_nodes[replications, buses] = nodes
+        is_finished = nodes == self._route_last_nodes[routes]
+        self._bus_status[replications[is_finished],
+                         buses[is_finished]] = FINISHED
+        self._bus_end_times[replications[is_finished],
+                            buses[is_finished]] = t
+
+        replications, buses = replications[~is_finished], buses[~is_finished]
+        if len(buses) == 0:
+            return
+        route_stops = self._route_route_stops[self._bus_routes[buses],
+                                              self._bus_nodes[replications, buses]]
+        self._bus_status[replications, buses] = QUEUEING
+        self._bus_queue_seqs[replications, buses] = self._next_seqs(len(buses))
+        # the pax who arrived before this second
+        self._bus_arrival_marks[replications, buses] = self._queue_arrival_counts[replications, route_stops] - \
+            self._queue_step_arrivals[replications, route_stops]
+        self._record_arrival(replications, buses, route_stops, t)
+
+    def _record_arrival(self, replications: np.ndarray, buses: np.ndarray, route_stops: np.ndarray, t: int) -> None:
+        ranks = _rank_in_groups(replications, route_stops)
+        for rank in range(int(ranks.max()) + 1):
+            is_rank = ranks == rank
+            rep, bus, rs = replications[is_rank], buses[is_rank], route_stops[is_rank]
+            index = (rep, rs)
+            schedule_arrival = self._rs_arrival_times[rs] + \
+                self._rs_headways[rs] * self._arrival_counts[index]
+            epsilon_arrival = t - schedule_arrival
+            self._bus_epsilon_arrival[rep, bus] = epsilon_arrival
+            self._bus_last_epsilon_arrival[rep,
+                                           bus] = self._last_epsilon_arrival[index]
+            self._last_epsilon_arrival[index] = epsilon_arrival
+            self._arrival_counts[index] += 1
+            self._arrival_headway.add_time(
+                index, np.full(len(rs), t, dtype=np.float64))
+            self._abs_epsilon_arrival.add(index, np.abs(epsilon_arrival))
+
+    def _enter_berths(self) -> None:
+        ''' The head bus of the entry queue of each stop enters the most downstream berth of the empty ones at the end.
+
+        '''
+        replications, buses = np.nonzero(self._bus_status == QUEUEING)
+        if len(buses) == 0:
+            return
+        stops = self._route_stops[self._bus_routes[buses],
+                                  self._bus_nodes[replications, buses]]
+        order = np.lexsort(
+            (self._bus_queue_seqs[replications, buses], stops, replications))
+        replications, buses, stops = replications[order], buses[order], stops[order]
+        is_head = np.ones(len(buses), dtype=bool)
+        is_head[1:] = (replications[1:] != replications[:-1]) | (
+            stops[1:] != stops[:-1])
+        replications, buses, stops = replications[is_head], buses[is_head], stops[is_head]
+
+        is_empty = self._berths[replications, stops] == -1
+        trailing_empty = np.cumprod(is_empty[:, ::-1], axis=1)
+        target_berths = self._berth_num - trailing_empty.sum(axis=1)
+        has_berth = target_berths < self._berth_num
+        replications, buses, stops = replications[has_berth], buses[has_berth], stops[has_berth]
+        self._berths[replications, stops, target_berths[has_berth]] = buses
+        self._bus_status[replications, buses] = IN_BERTH
+
+    def _board(self) -> None:
+        # berths of a stop board in order, as they may serve the same pax queue
+        for berth in range(self._berth_num):
+            replications, stops = np.nonzero(self._berths[:, :, berth] >= 0)
+            if len(stops) == 0:
+                continue
+            buses = self._berths[replications, stops, berth]
+
+            # buses in the middle of boarding a pax
+            is_boarding = self._bus_boarding[replications, buses]
+            self._accumulate_board_fraction(
+                replications[is_boarding], buses[is_boarding])
+
+            # idle buses start boarding the head pax of the queue, if any
+            replications, buses, stops = replications[~is_boarding], buses[~is_boarding], stops[~is_boarding]
+            route_stops = self._route_route_stops[self._bus_routes[buses],
+                                                  self._bus_nodes[replications, buses]]
+            has_pax = self._count_board_paxs(
+                replications, buses, stops, route_stops) > 0
+            replications, buses, stops, route_stops = replications[has_pax], buses[
+                has_pax], stops[has_pax], route_stops[has_pax]
+            if len(buses) == 0:
+                continue
+            self._queue_pax_nums[replications, route_stops] -= 1
+            self._queue_board_counts[replications, route_stops] += 1
+            if self._pax_board_time_type == 'deterministic':
+                board_rates = np.full(len(buses), self._pax_board_rate)
+            else:
+                board_rates = 1 / np.array([self._stop_board_samplers[replication][stop].sample()
+                                            for replication, stop in zip(replications.tolist(), stops.tolist())])
+            self._bus_board_rates[replications, buses] = board_rates
+            self._bus_boarding[replications, buses] = True
+            self._accumulate_board_fraction(replications, buses)
+
+    def _accumulate_board_fraction(self, replications: np.ndarray, buses: np.ndarray) -> None:
+        board_fractions = self._bus_board_fractions[replications, buses] + \
+            self._bus_board_rates[replications, buses]
+        is_finished = board_fractions >= 1
+        board_fractions[is_finished] -= 1
+        self._bus_board_fractions[replications, buses] = board_fractions
+        self._bus_boarding[replications[is_finished],
+                           buses[is_finished]] = False
+
+    def _count_board_paxs(self, replications: np.ndarray, buses: np.ndarray,
+                          stops: np.ndarray, route_stops: np.ndarray) -> np.ndarray:
+        ''' Count the pax in the queue who can board each bus, depending on the board truncation of the stop.
+
+        '''
+        pax_nums = self._queue_pax_nums[replications, route_stops]
+        truncates_at_arrival = self._stop_truncates_at_arrival[stops]
+        if truncates_at_arrival.any():
+            # pax board in the order of arrival, so the ones arrived before the bus are the first ones not boarded
+            arrived_pax_nums = np.maximum(0, self._bus_arrival_marks[replications, buses] -
+                                          self._queue_board_counts[replications, route_stops])
+            pax_nums = np.where(truncates_at_arrival,
+                                arrived_pax_nums, pax_nums)
+        return pax_nums
+
+    def _check_leave(self) -> None:
+        for berth in range(self._berth_num):
+            replications, stops = np.nonzero(self._berths[:, :, berth] >= 0)
+            if len(stops) == 0:
+                continue
+            buses = self._berths[replications, stops, berth]
+            route_stops = self._route_route_stops[self._bus_routes[buses],
+                                                  self._bus_nodes[replications, buses]]
+            is_done = self._count_board_paxs(
+                replications, buses, stops, route_stops) == 0
+            replications, buses, stops = replications[is_done], buses[is_done], stops[is_done]
+            self._berths[replications, stops, berth] = -1
+            self._bus_status[replications, buses] = LEAVING
+            self._bus_leave_seqs[replications,
+                                 buses] = self._next_seqs(len(buses))
+
+    def _leave(self, t: int) -> None:
+        ''' Buses in the leave queue of each stop depart, except every second one, as `BoardingStop._leave` does.
+
+        '''
+        replications, buses = np.nonzero(self._bus_status == LEAVING)
+        if len(buses) == 0:
+            return
+        stops = self._route_stops[self._bus_routes[buses],
+                                  self._bus_nodes[replications, buses]]
+        order = np.lexsort(
+            (self._bus_leave_seqs[replications, buses], stops, replications))
+        replications, buses = replications[order], buses[order]
+        is_leaving = _rank_in_groups(replications, stops[order]) % 2 == 0
+        replications, buses = replications[is_leaving], buses[is_leaving]
+
+        route_stops = self._route_route_stops[self._bus_routes[buses],
+                                              self._bus_nodes[replications, buses]]
+        self._record_rtd(replications, buses, route_stops, t)
+        self._bus_status[replications, buses] = HOLDING
+        self._bus_release_times[replications, buses] = -1
+        self._bus_hold_seqs[replications, buses] = self._next_seqs(len(buses))
+
+    def _record_rtd(self, replications: np.ndarray, buses: np.ndarray, route_stops: np.ndarray, t: int) -> None:
+        ranks = _rank_in_groups(replications, route_stops)
+        for rank in range(int(ranks.max()) + 1):
+            is_rank = ranks == rank
+            rep, bus, rs = replications[is_rank], buses[is_rank], route_stops[is_rank]
+            index = (rep, rs)
+            schedule_rtd = self._rs_rtd_times[rs] + \
+                self._rs_headways[rs] * self._rtd_counts[index]
+            epsilon_rtd = t - schedule_rtd
+            self._bus_epsilon_rtd[rep, bus] = epsilon_rtd
+            self._bus_last_epsilon_rtd[rep, bus] = self._last_epsilon_rtd[index]
+            self._last_epsilon_rtd[index] = epsilon_rtd
+            self._rtd_counts[index] += 1
+            self._rtd_headway.add_time(
+                index, np.full(len(rs), t, dtype=np.float64))
+            self._abs_epsilon_rtd.add(index, np.abs(epsilon_rtd))
+
+    def _set_hold_action(self, hold_times: np.ndarray) -> None:
+        snapshot = self._latest_snapshot
+        if snapshot is None or snapshot.bus_num == 0:
+            return
+        assert len(hold_times) == snapshot.bus_num, \
+            'a holding time must be given for each bus in the last snapshot'
+        # the stepwise holder starts counting down from the next second,
+        # and releases the bus at the first second that the remaining hold time is not positive
+        hold_steps = np.maximum(1, np.ceil(
+            np.asarray(hold_times, dtype=np.float64))).astype(np.int64)
+        self._bus_release_times[snapshot.replications,
+                                snapshot.bus_indices] = snapshot.t + hold_steps
+
+    def _release(self, t: int) -> None:
+        replications, buses = np.nonzero(
+            (self._bus_status == HOLDING) & (self._bus_release_times == t))
+        if len(buses) == 0:
+            return
+        # buses are released in the order of entering the holder
+        order = np.lexsort(
+            (self._bus_hold_seqs[replications, buses], replications))
+        replications, buses = replications[order], buses[order]
+        route_stops = self._route_route_stops[self._bus_routes[buses],
+                                              self._bus_nodes[replications, buses]]
+
+        ranks = _rank_in_groups(replications, route_stops)
+        for rank in range(int(ranks.max()) + 1):
+            is_rank = ranks == rank
+            rep, rs = replications[is_rank], route_stops[is_rank]
+            index = (rep, rs)
+            schedule_departure = self._rs_departure_times[rs] + \
+                self._rs_headways[rs] * self._departure_counts[index]
+            epsilon_departure = t - schedule_departure
+            self._departure_counts[index] += 1
+            self._departure_headway.add_time(
+                index, np.full(len(rs), t, dtype=np.float64))
+            self._abs_epsilon_departure.add(index, np.abs(epsilon_departure))
+
+        self._bus_release_times[replications, buses] = -1
+        self._enter_links(replications, buses)
+
+    def _take_snapshot(self, t: int) -> BatchHolderSnapshot:
+        self._record_hold_times(self._latest_snapshot)
+        replications, buses = np.nonzero(
+            (self._bus_status == HOLDING) & (self._bus_release_times == -1))
+        order = np.lexsort(
+            (self._bus_hold_seqs[replications, buses], replications))
+        replications, buses = replications[order], buses[order]
+        route_stops = self._route_route_stops[self._bus_routes[buses],
+                                              self._bus_nodes[replications, buses]]
+        snapshot = BatchHolderSnapshot(t, replications, buses, route_stops, self._route_stop_ids,
+                                       self._bus_epsilon_arrival[replications, buses],
+                                       self._bus_epsilon_rtd[replications, buses],
+                                       self._bus_last_epsilon_arrival[replications, buses],
+                                       self._bus_last_epsilon_rtd[replications, buses])
+        self._latest_snapshot = snapshot
+        return snapshot
+
+    def _record_hold_times(self, snapshot: Optional[BatchHolderSnapshot]) -> None:
+        ''' Move the holding times recorded by the agent on a snapshot to the statistics, at most once.
+
+        '''
+        if snapshot is None or snapshot.hold_times is None:
+            return
+        hold_times = np.asarray(snapshot.hold_times, dtype=np.float64)
+        replications, route_stops = snapshot.replications, snapshot.route_stop_indices
+        ranks = _rank_in_groups(replications, route_stops)
+        for rank in range(int(ranks.max(initial=-1)) + 1):
+            is_rank = ranks == rank
+            self._hold_time.add(
+                (replications[is_rank], route_stops[is_rank]), hold_times[is_rank])
+        snapshot.hold_times = None
+
+    def get_metrics(self) -> List[Tuple[Dict[str, float], Dict[str, Dict[int, int]]]]:
+        ''' Get the metrics of each replication, in the same form as `Simulator.get_metrics`.
+
+        Returns:
+            replication_results: [(metrics, route_dispatch_time_trip_time)] of each replication
+
+        '''
+        self._record_hold_times(self._latest_snapshot)
+        arrival_stds = self._arrival_headway.std
+        rtd_stds = self._rtd_headway.std
+        departure_stds = self._departure_headway.std
+        epsilon_arrival_mean_abs = self._abs_epsilon_arrival.mean
+        epsilon_rtd_mean_abs = self._abs_epsilon_rtd.mean
+        epsilon_departure_mean_abs = self._abs_epsilon_departure.mean
+
+        # stats all the stops except the last stop
+        route_stats_route_stops: Dict[str, List[int]] = defaultdict(list)
+        for route_id, route in self._blueprint.route_info.route_infos.items():
+            for stop_id in route.visit_seq_stops[:-1]:
+                route_stats_route_stops[route_id].append(
+                    self._route_stop_index[(route_id, stop_id)])
+
+        replication_results = []
+        for replication in range(self.replication_num):
+            metrics = {}
+            for route_id, route_stops in route_stats_route_stops.items():
+                metrics[f'route-{route_id}\'s arrival headway std'] = np.mean(
+                    arrival_stds[replication, route_stops])
+                metrics[f'route-{route_id}\'s rtd headway std'] = np.mean(
+                    rtd_stds[replication, route_stops])
+                metrics[f'route-{route_id}\'s departure headway std'] = np.mean(
+                    departure_stds[replication, route_stops])
+                metrics[f'route-{route_id}\'s arrival epsilon'] = np.mean(
+                    epsilon_arrival_mean_abs[replication, route_stops])
+                metrics[f'route-{route_id}\'s rtd epsilon'] = np.mean(
+                    epsilon_rtd_mean_abs[replication, route_stops])
+                metrics[f'route-{route_id}\'s departure epsilon'] = np.mean(
+                    epsilon_departure_mean_abs[replication, route_stops])
+                hold_time_sum, hold_time_count = 0.0, 0
+                for route_stop in route_stops:
+                    hold_time_sum += float(
+                        self._hold_time.total[replication, route_stop])
+                    hold_time_count += int(
+                        self._hold_time.count[replication, route_stop])
+                if hold_time_count > 0:
+                    metrics[f'route-{route_id}\'s holding time'] = hold_time_sum / \
+                        hold_time_count
+
+            route_dispatch_time_trip_time: Dict[str, Dict[int, int]] = {
+                route_id: {} for route_id in self._route_ids}
+            for bus in range(self._bus_num):
+                end_time = int(self._bus_end_times[replication, bus])
+                if end_time >= 0:
+                    route_id = self._route_ids[self._bus_routes[bus]]
+                    dispatch_time = self._bus_dispatch_times[bus]
+                    route_dispatch_time_trip_time[route_id][dispatch_time] = end_time - dispatch_time
+            replication_results.append(
+                (metrics, route_dispatch_time_trip_time))
+        return replication_results
+
+    def get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]:
+        ''' Get the average holding time at each stop for each route, pooled over all the replications.
+
+        Returns:
+            route_stop_hold_time: {route_id -> {stop_id -> average_hold_time}}, stops without holding are left out
+
+        '''
+        self._record_hold_times(self._latest_snapshot)
+        hold_time_sums = self._hold_time.total.sum(axis=0)
+        hold_time_counts = self._hold_time.count.sum(axis=0)
+        route_stop_hold_time: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for route_stop in np.flatnonzero(hold_time_counts > 0).tolist():
+            route_id, stop_id = self._route_stop_ids[route_stop]
+            route_stop_hold_time[route_id][stop_id] = float(
+                hold_time_sums[route_stop] / hold_time_counts[route_stop])
+        return dict(route_stop_hold_time)
+
+    def _next_seqs(self, num: int) -> np.ndarray:
+        seqs = np.arange(self._seq_count, self._seq_count + num, dtype=np.int64)
+        self._seq_count += num
+        return seqs
+
+    def _grow_buses(self) -> None:
+        capacity = len(self._bus_routes)
+        self._bus_routes = np.concatenate(
+            [self._bus_routes, np.zeros(capacity, dtype=np.int64)])
+        fills = {'_bus_status': NOT_DISPATCHED, '_bus_link_lengths': np.inf, '_bus_links': -1,
+                 '_bus_release_times': -1, '_bus_end_times': -1}
+        for name in ['_bus_status', '_bus_nodes', '_bus_positions', '_bus_speeds', '_bus_link_lengths',
+                     '_bus_links', '_bus_link_seqs', '_bus_queue_seqs', '_bus_leave_seqs', '_bus_hold_seqs',
+                     '_bus_boarding', '_bus_board_fractions', '_bus_board_rates', '_bus_arrival_marks',
+                     '_bus_release_times', '_bus_end_times', '_bus_epsilon_arrival', '_bus_epsilon_rtd',
+                     '_bus_last_epsilon_arrival', '_bus_last_epsilon_rtd']:
+            array = getattr(self, name)
+            extension = np.full_like(array, fills.get(name, 0))
+            setattr(self, name, np.concatenate([array, extension], axis=1))
@@ -1,16 +1,17 @@
 from typing import Dict
 
 from agent.agent import Agent
-from setup.homo_one_route_factory import HomoOneRouteComponentsFactory
-from setup.chengdu_factory import CDRoute3ComponentsFactory
 from setup.factory import ComponentFactory
+from setup.registry import create_component_factory
 from setup.blueprint import Blueprint
+from setup.config_dataclass import StopNodeOperation, PaxOperation
 from simulator.virtual_bus import VirtualBus
 
 from .terminal import Terminal
 from .link import Link
 from .stop import Stop
 from .pax_generation import PaxGenerator
+from .sampler import RandomStreams
 
 
 class Builder:
@@ -21,19 +22,18 @@ class Builder:
         create_links(self) -> Dict[str, Link]:
         create_stops(self, agent: Agent) -> Dict[str, Stop]:
         create_pax_generator(self, agent: Agent) -> PaxGenerator:
+        get_stop_node_operation(self, stop_id: str) -> StopNodeOperation
+        get_pax_operation(self) -> PaxOperation
 
     '''
     _blueprint: Blueprint
     _component_factory: ComponentFactory
+    _random_streams: RandomStreams
 
-    def __init__(self, blueprint: Blueprint) -> None:
+    def __init__(self, blueprint: Blueprint, random_streams: RandomStreams) -> None:
         self._blueprint = blueprint
-        if blueprint.env_name == 'homogeneous_one_route':
-            self._component_factory = HomoOneRouteComponentsFactory(
-                blueprint)
-        elif blueprint.env_name == 'cd_route_3':
-            self._component_factory = CDRoute3ComponentsFactory(
-                blueprint)
+        self._random_streams = random_streams
+        self._component_factory = create_component_factory(blueprint)
 
     def create_virtual_bus(self, agent: Agent) -> VirtualBus:
         virtual_bus = self._component_factory.create_virtual_bus(
@@ -42,7 +42,7 @@ class Builder:
 
     def create_pax_generator(self, virtual_bus: VirtualBus) -> PaxGenerator:
         pax_generator = self._component_factory.create_pax_generator(
-            self._blueprint, virtual_bus)
+            self._blueprint, virtual_bus, self._random_streams)
         return pax_generator
 
     def create_terminals(self, virtual_bus: VirtualBus) -> Dict[str, Terminal]:
@@ -51,10 +51,17 @@ class Builder:
         return terminals
 
     def create_links(self) -> Dict[str, Link]:
-        links = self._component_factory.create_links(self._blueprint)
+        links = self._component_factory.create_links(
+            self._blueprint, self._random_streams)
         return links
 
     def create_stops(self, virtual_bus: VirtualBus) -> Dict[str, Stop]:
         stops = self._component_factory.create_stops(
             self._blueprint, virtual_bus)
         return stops
+
+    def get_stop_node_operation(self, stop_id: str) -> StopNodeOperation:
+        return self._component_factory.get_stop_node_operation(stop_id)
+
+    def get_pax_operation(self) -> PaxOperation:
+        return self._component_factory.get_pax_operation()
@@ -5,7 +5,7 @@ from simulator.virtual_bus import VirtualBus
 from setup.route import Route
 
 from .pax_generation import Pax
-from .trajectory import TrajectoryPoint
+from .trajectory import TrajectoryPoint, TrajectoryRecorder
 from .snapshot import BusSnapshot
 from .log import BusRunningLog
 
@@ -17,9 +17,11 @@ class Bus:
         log: BusRunningLog
         speed: traversing speed on link, in meters/sec
         loc_relative_to_terminal: location relative to the terminal, in meters
-        trajectory: time-point trajectory for plotting
+        trajectory: time-point trajectory for plotting, read from the attached trajectory recorder
         route_id: route id
         bus_id: bus id
+        index: dense integer id of the bus within a simulation, i.e., the order of dispatching,
+            used as the key of the engine's internal tables in place of (route_id, bus_id)
         board_status: boarding status, either 'boarding' or 'idle'
 
     Methods:
@@ -27,8 +29,12 @@ class Bus:
                                         'queueing_at_stop', 'dwelling_at_stop', 'accelerating', 
                                         'holding', 'finished'])
         accumate_board_fraction(self) -> None
+        count_board_steps(self) -> int
         board(self, pax: Pax) -> None
+        attach_trajectory_recorder(self, trajectory_recorder: TrajectoryRecorder, trajectory_index: int) -> None
         update_location(self, t: int, spot_type: str, spot_id: str, node_id: str, offset: float) -> None
+        record_stay(self, start_t: int, end_t: int, spot_type: str, spot_id: str, node_id: str, offset: float) -> None
+        locate(self, node_id: str, offset: float) -> None
         take_snapshot(self) -> BusSnapshot
 
     '''
@@ -46,10 +52,13 @@ class Bus:
     _board_fraction: float
     # the boarding rate determined by the boarding pax
     _pax_board_rate: Optional[float]
-    _trajectory: Dict[int, TrajectoryPoint]
+    # the recorder of the trajectory and the index of this bus in it, None if the trajectory is not recorded
+    _trajectory_recorder: Optional[TrajectoryRecorder]
+    _trajectory_index: int
     log: BusRunningLog
     speed: float
     loc_relative_to_terminal: float
+    index: int
 
     def __init__(self, bus_id: str,
                  route: Route,
@@ -68,7 +77,8 @@ class Bus:
         self._paxs = []
         self._board_fraction = 0.0
         self._pax_board_rate = None
-        self._trajectory = {}
+        self._trajectory_recorder = None
+        self._trajectory_index = -1
 
         virtual_bus_stop_arrival_time = virtual_bus.route_stop_arrival_time[self._route_id]
         virtual_bus_stop_rtd_time = virtual_bus.route_stop_rtd_time[self._route_id]
@@ -78,13 +88,21 @@ class Bus:
             route.schedule_headway, virtual_bus_stop_arrival_time, virtual_bus_stop_rtd_time, virtual_bus_stop_departure_time)
         self.speed = 0.0
         self.loc_relative_to_terminal = 0.0
+        # assigned by the simulator when the bus is dispatched
+        self.index = -1
 
     def __repr__(self) -> str:
         return f'Bus {self._bus_id} on route {self._route_id} with pax_num {len(self._paxs)}'
 
     @property
     def trajectory(self) -> Dict[int, TrajectoryPoint]:
-        return self._trajectory
+        if self._trajectory_recorder is None:
+            return {}
+        return self._trajectory_recorder.get_bus_points(self._trajectory_index)
+
+    def attach_trajectory_recorder(self, trajectory_recorder: TrajectoryRecorder, trajectory_index: int) -> None:
+        self._trajectory_recorder = trajectory_recorder
+        self._trajectory_index = trajectory_index
 
     @property
     def route_id(self) -> str:
@@ -119,6 +137,25 @@ class Bus:
             self._board_status = 'idle'
             self._pax_board_rate = None
 
+    def count_board_steps(self) -> int:
+        ''' Count how many more calls of `accumate_board_fraction` finish the current boarding pax.
+
+        The fraction is accumulated in the same way as `accumate_board_fraction` does,
+        so that an event-driven simulation predicts exactly the same boarding completion time.
+
+        Returns:
+            board_steps: the number of steps until the bus becomes 'idle' again
+        '''
+        assert self._board_status == 'boarding', 'bus is not boarding, cannot count board steps'
+        assert self._pax_board_rate is not None, 'pax board rate is None'
+        board_fraction = self._board_fraction
+        board_steps = 0
+        while True:
+            board_fraction += self._pax_board_rate
+            board_steps += 1
+            if board_fraction >= 1:
+                return board_steps
+
     def board(self, pax: Pax) -> None:
         ''' Board pax onto the bus.
 
@@ -146,9 +183,30 @@ class Bus:
             offset: for the spot_type of 'link', the offset from the head node
                     for the spot_type of 'stop', offset=0
         '''
+        self.locate(node_id, offset)
+        if self._trajectory_recorder is not None:
+            self._trajectory_recorder.record(
+                self._trajectory_index, t, spot_type, spot_id, self.loc_relative_to_terminal)
+
+    def record_stay(self, start_t: int, end_t: int, spot_type: str, spot_id: str, node_id: str, offset: float) -> None:
+        ''' Update bus's location as staying at the same location from start_t to end_t (both included).
+
+        Equivalent to calling `update_location` at every second of the interval, without the per-second calls.
+
+        '''
+        self.locate(node_id, offset)
+        if self._trajectory_recorder is not None:
+            self._trajectory_recorder.record_stay(
+                self._trajectory_index, start_t, end_t, spot_type, spot_id, self.loc_relative_to_terminal)
+
+    def locate(self, node_id: str, offset: float) -> None:
+        ''' Update bus's relative location to the terminal without recording the trajectory.
+
+        Args:
+            node_id: the node that the offset is relative to
+            offset: the offset from the node
+        '''
         self.loc_relative_to_terminal = self._node_distance[node_id] + offset
-        self._trajectory[t] = TrajectoryPoint(
-            spot_type, spot_id, self.loc_relative_to_terminal)
 
     def take_snapshot(self) -> BusSnapshot:
         '''Take a snapshot of the bus at the current time step.
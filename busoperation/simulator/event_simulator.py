@@ -0,0 +1,278 @@
+from typing import List, Dict, Tuple, Optional, Literal
+from dataclasses import dataclass, field
+import heapq
+
+from agent.agent import Agent
+from setup.blueprint import Blueprint
+from setup.config_dataclass import TracerConfig
+
+from .base_simulator import BaseSimulator
+from .bus import Bus
+from .snapshot import Snapshot
+from .profiler import PhaseProfiler
+
+
+# the order of processing events happening at the same second, following the phases of `Simulator.step`
+EVENT_PHASE = {'dispatch': 0, 'link_exit': 2, 'stop_operation': 3, 'hold_release': 4}
+# the profiler phase of each kind of event, named after the phases of `Simulator.step`
+EVENT_PROFILER_PHASE = {'dispatch': 'dispatch', 'link_exit': 'link_forward',
+                        'stop_operation': 'stop_operation', 'hold_release': 'holder_operation'}
+
+
+@dataclass(order=True)
+class Event:
+    ''' A timed event of the event-driven simulation.
+
+    Events are ordered by time, then by the phase of `Simulator.step` that they belong to,
+    then by a tie-breaking index (e.g., the order of stops), and finally by the scheduling order.
+
+    Attributes:
+        t: the time when the event happens
+        phase: the phase of `Simulator.step` that the event belongs to
+        index: tie-breaking index inside the phase
+        seq: scheduling order of the event
+        kind: 'dispatch', 'link_exit', 'stop_operation' or 'hold_release'
+        spot_id: the terminal id, link id, stop id or holder's stop id of the event
+        bus: the bus of the event, if any
+
+    '''
+    t: int
+    phase: int
+    index: int
+    seq: int
+    kind: Literal['dispatch', 'link_exit',
+                  'stop_operation', 'hold_release'] = field(compare=False)
+    spot_id: str = field(compare=False)
+    bus: Optional[Bus] = field(default=None, compare=False)
+
+
+class EventSimulator(BaseSimulator):
+    ''' The event-driven simulator that jumps between the times when bus events happen.
+
+    It shares the components and the tracer with the stepwise `Simulator`, but instead of walking every terminal,
+    link, stop and holder every second, it keeps a priority queue of timed bus events:
+        dispatch: a terminal dispatches buses
+        link_exit: a bus reaches the tail node of a link and arrives at the next stop (or ending terminal)
+        stop_operation: a stop needs to operate, i.e., a bus enters the berth, starts or finishes boarding a pax, or is ready to depart
+        hold_release: a bus finishes holding and enters the next link
+
+    Passengers are generated lazily for each stop when a bus operates there or the stop's snapshot is read.
+    The agent is only consulted at decision epochs, i.e., when some buses are waiting for holding actions.
+
+    Methods:
+        step_to_decision(self, episode_duration: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]
+
+    '''
+    # the heap of (t, phase, index, seq, event), i.e., the order of events as plain tuples, which compare faster
+    _events: List[Tuple[int, int, int, int, Event]]
+    _event_seq: int
+    _t: int
+    # the last time that each stop has operated
+    _stop_last_operation_time: Dict[str, int]
+    # the pending operation event of each stop, None if there is no bus at the stop
+    _stop_next_operation: Dict[str, Optional[Event]]
+    # the last time that passengers have been generated for each stop
+    _stop_last_pax_time: Dict[str, int]
+    # bus index -> (bus, link_id, the time of the first forward step on the link)
+    _bus_link_entry: Dict[int, Tuple[Bus, str, int]]
+    _stop_index: Dict[str, int]
+
+    def __init__(self, blueprint: Blueprint, agent: Agent, seed: Optional[int] = None,
+                 tracer_config: TracerConfig = TracerConfig(), profiler: Optional[PhaseProfiler] = None) -> None:
+        super().__init__(blueprint, agent, seed, tracer_config, profiler)
+        self._events = []
+        self._event_seq = 0
+        self._t = 0
+        self._stop_index = {stop_id: idx for idx,
+                            stop_id in enumerate(self._stops)}
+        self._stop_last_operation_time = {
+            stop_id: 0 for stop_id in self._stops}
+        self._stop_next_operation = {stop_id: None for stop_id in self._stops}
+        self._stop_last_pax_time = {stop_id: 0 for stop_id in self._stops}
+        self._bus_link_entry = {}
+
+        for terminal_id, terminal in self._terminals.items():
+            dispatch_time = terminal.next_dispatch_time(0)
+            if dispatch_time is not None:
+                self._schedule(dispatch_time, 'dispatch', terminal_id)
+
+    def step_to_decision(self, episode_duration: int,
+                         stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]:
+        ''' Accept holding actions and process events until the next decision epoch.
+
+        Args:
+            episode_duration: the number of seconds of the episode
+            stop_bus_hold_times: {(stop_id, route_id, bus_id): specified holding time},
+                the actions for the buses in the last returned snapshot
+
+        Returns:
+            Snapshot: a snapshot at the next time when some buses wait for holding actions,
+                or None if the episode is finished (a final snapshot is still taken for the metrics)
+
+        The events are timed by the phases of `Simulator.step` that they belong to, if the simulator has a profiler.
+        '''
+        profiler = self._profiler
+        self._set_hold_action(stop_bus_hold_times)
+
+        while len(self._events) > 0 and self._events[0][0] < episode_duration:
+            self._t = self._events[0][0]
+            while len(self._events) > 0 and self._events[0][0] == self._t:
+                event = heapq.heappop(self._events)[-1]
+                if profiler is not None:
+                    clock = profiler.start()
+                self._process(event)
+                if profiler is not None:
+                    profiler.lap(EVENT_PROFILER_PHASE[event.kind], clock)
+
+            if self._holder.has_unheld_buses:
+                if profiler is not None:
+                    clock = profiler.start()
+                snapshot = self.take_snapshot(self._t)
+                if profiler is not None:
+                    profiler.lap('snapshot', clock)
+                return snapshot
+
+        # the episode is finished, bring all the components to the last second
+        self._t = episode_duration - 1
+        for stop_id, stop in self._stops.items():
+            if self._stop_next_operation[stop_id] is not None:
+                skipped_steps = self._t - \
+                    self._stop_last_operation_time[stop_id]
+                stop.catch_up(skipped_steps)
+                self._stop_last_operation_time[stop_id] = self._t
+        for bus, _, _ in list(self._bus_link_entry.values()):
+            self._locate_running_bus(bus, self._t)
+        for stop_id in self._stops:
+            self._generate_pax(stop_id, self._t)
+        self._holder.fill_trajectories(self._t)
+        self.take_snapshot(self._t)
+        return None
+
+    def take_snapshot(self, t: int) -> Snapshot:
+        ''' Take a snapshot of the whole current state of the simulation.
+
+        A bus on a link is located, and the passengers of a stop are generated up to time t,
+        only when the snapshot of the bus or the stop is read.
+
+        '''
+        return self._tracer.take_snapshot(t, self._links, self._stops, self._holder,
+                                          prepare_bus=lambda bus: self._locate_running_bus(bus, t),
+                                          prepare_stop=lambda stop_id: self._generate_pax(stop_id, t))
+
+    def _schedule(self, t: int, kind: Literal['dispatch', 'link_exit', 'stop_operation', 'hold_release'],
+                  spot_id: str, bus: Optional[Bus] = None, index: int = 0) -> Event:
+        event = Event(t, EVENT_PHASE[kind], index,
+                      self._event_seq, kind, spot_id, bus)
+        self._event_seq += 1
+        heapq.heappush(self._events, (t, event.phase, index, event.seq, event))
+        return event
+
+    def _process(self, event: Event) -> None:
+        if event.kind == 'dispatch':
+            self._dispatch(event.spot_id, event.t)
+        elif event.kind == 'link_exit':
+            assert event.bus is not None
+            self._exit_link(event.spot_id, event.bus, event.t)
+        elif event.kind == 'stop_operation':
+            # skip stale events that have been replaced by an earlier operation
+            if self._stop_next_operation[event.spot_id] is event:
+                self._operate_stop(event.spot_id, event.t)
+        elif event.kind == 'hold_release':
+            assert event.bus is not None
+            self._release(event.spot_id, event.bus, event.t)
+
+    def _dispatch(self, terminal_id: str, t: int) -> None:
+        terminal = self._terminals[terminal_id]
+        dispatching_buses = terminal.dispatch(t)
+        for bus in dispatching_buses:
+            bus.index = len(self._total_buses)
+            self._total_buses.append(bus)
+            self._trajectory_recorder.register_bus(bus)
+        self._mediator.transfer(dispatching_buses, 'terminal', terminal_id, t)
+        for bus in dispatching_buses:
+            # buses entering links at dispatching are moved forward in the same second
+            next_link_id = self._blueprint.get_next_link_id(
+                bus.route_id, terminal_id)
+            self._schedule_link_exit(next_link_id, bus, t)
+
+        dispatch_time = terminal.next_dispatch_time(t)
+        if dispatch_time is not None:
+            self._schedule(dispatch_time, 'dispatch', terminal_id)
+
+    def _schedule_link_exit(self, link_id: str, bus: Bus, first_forward_time: int) -> None:
+        forward_steps = self._links[link_id].count_forward_steps(bus)
+        self._bus_link_entry[bus.index] = (
+            bus, link_id, first_forward_time)
+        self._schedule(first_forward_time + forward_steps - 1,
+                       'link_exit', link_id, bus)
+
+    def _exit_link(self, link_id: str, bus: Bus, t: int) -> None:
+        link = self._links[link_id]
+        _, _, first_forward_time = self._bus_link_entry.pop(bus.index)
+        link.locate_bus(bus, t, t - first_forward_time + 1)
+        link.remove_bus(bus)
+        self._mediator.transfer([bus], 'link', link_id, t)
+
+        next_node_id, is_ending_terminal = self._blueprint.get_next_node_id(
+            bus.route_id, link_id)
+        if not is_ending_terminal:
+            self._schedule_stop_operation(next_node_id, t)
+
+    def _schedule_stop_operation(self, stop_id: str, t: int) -> None:
+        next_operation = self._stop_next_operation[stop_id]
+        if next_operation is not None and next_operation.t <= t:
+            return
+        if next_operation is None:
+            # the stop was empty, so there is nothing to catch up before t
+            self._stop_last_operation_time[stop_id] = t - 1
+        self._stop_next_operation[stop_id] = self._schedule(
+            t, 'stop_operation', stop_id, index=self._stop_index[stop_id])
+
+    def _operate_stop(self, stop_id: str, t: int) -> None:
+        stop = self._stops[stop_id]
+        self._generate_pax(stop_id, t)
+        skipped_steps = t - self._stop_last_operation_time[stop_id] - 1
+        stop.catch_up(skipped_steps)
+
+        leaving_stop_buses = stop.operation(t)
+        self._mediator.transfer(leaving_stop_buses, 'stop', stop_id, t)
+        self._stop_last_operation_time[stop_id] = t
+
+        next_operation_time = stop.next_operation_time(t)
+        if next_operation_time is None:
+            self._stop_next_operation[stop_id] = None
+        else:
+            self._stop_next_operation[stop_id] = self._schedule(
+                next_operation_time, 'stop_operation', stop_id, index=self._stop_index[stop_id])
+
+    def _locate_running_bus(self, bus: Bus, t: int) -> None:
+        link_entry = self._bus_link_entry.get(bus.index)
+        if link_entry is not None:
+            _, link_id, first_forward_time = link_entry
+            self._links[link_id].locate_bus(
+                bus, t, max(0, t - first_forward_time + 1))
+
+    def _generate_pax(self, stop_id: str, t: int) -> None:
+        last_pax_time = self._stop_last_pax_time[stop_id]
+        if t <= last_pax_time:
+            return
+        paxs = self._pax_generator.generate_at_stop(
+            stop_id, last_pax_time + 1, t)
+        self._stops[stop_id].pax_arrive(paxs)
+        self._stop_last_pax_time[stop_id] = t
+
+    def _set_hold_action(self, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> None:
+        # as in the stepwise simulator, the holdings count down from the second after the snapshot
+        stop_bus_release_time = self._holder.set_hold_action(
+            stop_bus_hold_times, self._t + 1)
+        for (stop_id, route_id, bus_id), release_time in stop_bus_release_time.items():
+            bus = self._holder.get_bus((stop_id, route_id, bus_id))
+            self._schedule(release_time, 'hold_release', stop_id, bus)
+
+    def _release(self, stop_id: str, bus: Bus, t: int) -> None:
+        held_bus = self._holder.release(bus, t)
+        self._mediator.transfer([held_bus], 'holder', stop_id, t)
+        # buses entering links after holding are moved forward from the next second
+        next_link_id = self._blueprint.get_next_link_id(
+            held_bus.route_id, stop_id)
+        self._schedule_link_exit(next_link_id, held_bus, t + 1)
@@ -1,5 +1,7 @@
+import heapq
+import math
 from collections import defaultdict
-from typing import Dict, List, Tuple, Optional, DefaultDict
+from typing import Dict, List, Tuple, Optional
 
 from agent.agent import Agent
 from simulator.virtual_bus import VirtualBus
@@ -9,75 +11,175 @@ from .snapshot import HolderSnapshot
 from .log import HolderLog
 
 
+def get_release_time(hold_time: float, start_t: int) -> int:
+    ''' Get the second at which a bus holding from `start_t` is released.
+
+    The hold time counts down by one second at every second from `start_t`, and the bus is released at the first
+    second that the remaining hold time is not positive. So a fractional hold time is rounded up,
+    and a bus is held for at least one second.
+
+    Args:
+        hold_time: the hold time given by the agent, in seconds
+        start_t: the first second of the holding
+
+    Returns:
+        release_time: the second of releasing the bus
+    '''
+    return start_t + max(1, math.ceil(hold_time)) - 1
+
+
 class Holder:
     ''' A unified holder for managing holdings at all stops.
 
+    A bus is held at one stop at a time, so the holder's tables are keyed by the bus's dense index.
+    The public (stop_id, route_id, bus_id) identifiers are only used at the agent boundary,
+    i.e., in the holding actions and the snapshots.
+
+    The release time of a bus is fixed when its holding action is set, and the buses are kept in a min-heap
+    of release times, so that each step only pops the buses due. A held bus stays at the same location,
+    its trajectory points are recorded for the whole holding interval when it is released
+    (or when the trajectories are read, see `fill_trajectories`).
+
     Attributes:
-        _identifier_bus: a dictionary with key as (stop_id, route_id, bus_id) and value as Bus
-        _identifier_time: a dictionary with key as (stop_id, route_id, bus_id) and value as dynamic remaining hold time
+        _index_bus: a dictionary with key as bus index and value as Bus, in the order of entering the holder
+        _index_stop: a dictionary with key as bus index and value as the stop id where the bus is held
+        _index_release_time: a dictionary with key as bus index and value as the second of releasing the bus,
+            None if the holding action has not been set
+        _index_fill_time: a dictionary with key as bus index and value as the first second of the holding
+            whose trajectory point is not recorded yet, only for the buses whose holding actions are set
+        _index_entry: a dictionary with key as bus index and value as the order of entering the holder
+        _identifier_index: a dictionary with key as (stop_id, route_id, bus_id) and value as bus index
+        _release_heap: a min-heap of (release time, entry order, bus index),
+            entries of buses that are already released (e.g., by `release`) are skipped when popped
         log: a HolderLog object for logging
 
     '''
 
-    _identifier_bus: DefaultDict[Tuple[str, str, str], Bus]
-    _identifier_time: DefaultDict[Tuple[str, str, str], Optional[float]]
+    _index_bus: Dict[int, Bus]
+    _index_stop: Dict[int, str]
+    _index_release_time: Dict[int, Optional[int]]
+    _index_fill_time: Dict[int, int]
+    _index_entry: Dict[int, int]
+    _identifier_index: Dict[Tuple[str, str, str], int]
+    _release_heap: List[Tuple[int, int, int]]
+    _entry_count: int
+    # the last second of the holder's operation
+    _t: int
     log: HolderLog
 
     def __init__(self, agent: Agent, virtual_bus: VirtualBus) -> None:
-        # Dict[Tuple[released stop id, route id, bus id], Bus]
-        self._identifier_bus = defaultdict()
-        # Dict[Tuple[released stop id, route id, bus id], dynamic remaining hold time]
-        self._identifier_time = defaultdict()
+        self._index_bus = {}
+        self._index_stop = {}
+        self._index_release_time = {}
+        self._index_fill_time = {}
+        self._index_entry = {}
+        self._identifier_index = {}
+        self._release_heap = []
+        self._entry_count = 0
+        self._t = -1
         self.log = HolderLog(virtual_bus)
 
     def add_bus(self, stop_id: str, bus: Bus, t: int) -> None:
-        self._identifier_bus[(stop_id, bus.route_id, bus.bus_id)] = bus
-        self._identifier_time[(stop_id, bus.route_id, bus.bus_id)] = None
+        self._index_bus[bus.index] = bus
+        self._index_stop[bus.index] = stop_id
+        self._index_release_time[bus.index] = None
+        self._index_entry[bus.index] = self._entry_count
+        self._entry_count += 1
+        self._identifier_index[(stop_id, bus.route_id, bus.bus_id)] = bus.index
         bus.set_status('holding')
         bus.update_location(t, 'holder', stop_id, stop_id, 0)
 
-    def set_hold_action(self, stop_bus_hold_action: Dict[Tuple[str, str, str], float]):
-        for (stop_id, route_id, bus_id), hold_time in stop_bus_hold_action.items():
-            assert self._identifier_time[(
-                stop_id, route_id, bus_id)] is None, 'bus is already holding'
-            self._identifier_time[(stop_id, route_id, bus_id)] = hold_time
+    def set_hold_action(self, stop_bus_hold_action: Dict[Tuple[str, str, str], float],
+                        start_t: int) -> Dict[Tuple[str, str, str], int]:
+        ''' Set the holding actions of the buses waiting for them.
+
+        Args:
+            stop_bus_hold_action: {(stop_id, route_id, bus_id): hold time}
+            start_t: the first second of the holdings
+
+        Returns:
+            stop_bus_release_time: {(stop_id, route_id, bus_id): the second of releasing the bus}
+        '''
+        stop_bus_release_time = {}
+        for stop_bus_id, hold_time in stop_bus_hold_action.items():
+            bus_index = self._identifier_index[stop_bus_id]
+            assert self._index_release_time[bus_index] is None, 'bus is already holding'
+            release_time = get_release_time(hold_time, start_t)
+            self._index_release_time[bus_index] = release_time
+            self._index_fill_time[bus_index] = start_t
+            heapq.heappush(self._release_heap,
+                           (release_time, self._index_entry[bus_index], bus_index))
+            stop_bus_release_time[stop_bus_id] = release_time
+        return stop_bus_release_time
 
     def operation(self, t: int) -> Dict[str, List[Bus]]:
+        ''' Release the buses due at time t.
+
+        Returns:
+            stop_held_buses: {stop_id: [the released buses in the order of entering the holder]}
+        '''
+        self._t = t
         # store the buses that finished holding
         stop_held_buses = defaultdict(list)
-        # store the buses with stop_id, route_id, bus_id, and remove them after the loop
         remove_buses = []
-        for (stop_id, route_id, bus_id), hold_time in self._identifier_time.items():
-            if hold_time is not None:
-                # update holding time
-                hold_time -= 1.0
-                self._identifier_time[(stop_id, route_id, bus_id)] = hold_time
-                held_bus = self._identifier_bus[(stop_id, route_id, bus_id)]
-
-                # if holding is finished
-                if hold_time <= 0:
-                    # append the bus to the `stop_held_buses` and finally return to the `simulator`
-                    stop_held_buses[stop_id].append(held_bus)
-
-                    # departure_time_seq = self.log.route_stop_departure_time_seq[route_id][stop_id]
-                    # last_departure_time = departure_time_seq[-1]
-                    bus_id_seq = self.log.route_stop_departure_bus_id_seq[route_id][stop_id]
-                    departure_idx_count = len(bus_id_seq)
-                    epsilon_departure = held_bus.log.record_when_departure(
-                        stop_id, t, departure_idx_count)
-                    self.log.record_when_bus_departure(
-                        stop_id, route_id, bus_id, t, epsilon_departure)
-
-                    remove_buses.append((stop_id, route_id, bus_id))
-
-                held_bus.update_location(t, 'holder', stop_id, stop_id, 0)
-
-        for remove_bus in remove_buses:
-            self._identifier_bus.pop(remove_bus)
-            self._identifier_time.pop(remove_bus)
+        heap = self._release_heap
+        while len(heap) > 0 and heap[0][0] <= t:
+            _, entry, bus_index = heapq.heappop(heap)
+            if self._index_entry.get(bus_index) != entry:
+                continue
+            held_bus = self._index_bus[bus_index]
+            stop_held_buses[self._index_stop[bus_index]].append(held_bus)
+            remove_buses.append(held_bus)
+
+        for held_bus in remove_buses:
+            self.release(held_bus, t)
 
         return stop_held_buses
 
+    def release(self, bus: Bus, t: int) -> Bus:
+        ''' Release a bus that finishes holding and record its departure.
+
+        Args:
+            bus: the held bus
+            t: current time
+
+        Returns:
+            the released bus
+        '''
+        self._fill_trajectory(bus.index, t)
+        held_bus = self._index_bus.pop(bus.index)
+        stop_id = self._index_stop.pop(bus.index)
+        self._index_release_time.pop(bus.index)
+        self._index_fill_time.pop(bus.index, None)
+        self._index_entry.pop(bus.index)
+        self._identifier_index.pop((stop_id, held_bus.route_id, held_bus.bus_id))
+
+        # departure_time_seq = self.log.route_stop_departure_time_seq[route_id][stop_id]
+        # last_departure_time = departure_time_seq[-1]
+        bus_id_seq = self.log.route_stop_departure_bus_id_seq[held_bus.route_id][stop_id]
+        departure_idx_count = len(bus_id_seq)
+        epsilon_departure = held_bus.log.record_when_departure(
+            stop_id, t, departure_idx_count)
+        self.log.record_when_bus_departure(
+            stop_id, held_bus.route_id, held_bus.bus_id, t, epsilon_departure)
+        held_bus.update_location(t, 'holder', stop_id, stop_id, 0)
+        return held_bus
+
+    def fill_trajectories(self, t: Optional[int] = None) -> None:
+        ''' Record the trajectory points of the holding buses up to time t (the last operation time by default).
+
+        '''
+        end_t = self._t if t is None else t
+        for bus_index in self._index_fill_time:
+            self._fill_trajectory(bus_index, end_t)
+
+    @property
+    def has_unheld_buses(self) -> bool:
+        ''' Whether there are buses waiting for the holding action.
+
+        '''
+        return len(self._index_fill_time) < len(self._index_bus)
+
     def take_snapshot(self) -> HolderSnapshot:
         unheld_buses = self._find_unheld_buses()
         holder_snapshot = HolderSnapshot(unheld_buses, self.log.route_stop_departure_time_seq,
@@ -85,12 +187,32 @@ class Holder:
         return holder_snapshot
 
     @property
-    def stop_identifier_bus(self) -> Dict[Tuple[str, str, str], Bus]:
-        return self._identifier_bus
+    def buses(self) -> List[Bus]:
+        ''' The buses in the holder, in the order of entering the holder.
+
+        '''
+        return list(self._index_bus.values())
+
+    def get_bus(self, stop_bus_id: Tuple[str, str, str]) -> Bus:
+        ''' Get a held bus by its public identifier (stop_id, route_id, bus_id).
+
+        '''
+        return self._index_bus[self._identifier_index[stop_bus_id]]
+
+    def _fill_trajectory(self, bus_index: int, end_t: int) -> None:
+        fill_t = self._index_fill_time.get(bus_index)
+        if fill_t is None or fill_t > end_t:
+            return
+        stop_id = self._index_stop[bus_index]
+        self._index_bus[bus_index].record_stay(
+            fill_t, end_t, 'holder', stop_id, stop_id, 0)
+        self._index_fill_time[bus_index] = end_t + 1
 
     def _find_unheld_buses(self) -> List[Tuple[str, str, str]]:
         unheld_buses = []
-        for (stop_id, route_id, bus_id), bus in self._identifier_bus.items():
-            if self._identifier_time[(stop_id, route_id, bus_id)] is None:
-                unheld_buses.append((stop_id, route_id, bus_id))
+        for bus_index, release_time in self._index_release_time.items():
+            if release_time is None:
+                bus = self._index_bus[bus_index]
+                unheld_buses.append(
+                    (self._index_stop[bus_index], bus.route_id, bus.bus_id))
         return unheld_buses
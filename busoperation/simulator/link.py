@@ -1,11 +1,11 @@
 import numpy as np
-from scipy.stats import norm
-from typing import List, Dict, Tuple
+from typing import List, Dict
 from abc import ABC, abstractmethod
 
 from setup.config_dataclass import LinkGeometry, LinkDistribution
 
 from .bus import Bus
+from .sampler import RandomStreams
 
 
 class Link(ABC):
@@ -19,8 +19,8 @@ class Link(ABC):
         # buses running on this link
         self._buses: List[Bus] = []
 
-        # buses' relative locations (to the head_node) on this link
-        self._bus_link_loc: Dict[Tuple[str, str], float] = {}
+        # buses' relative locations (to the head_node) on this link, keyed by bus index
+        self._bus_link_loc: Dict[int, float] = {}
 
     def __repr__(self) -> str:
         return f"Link {self._link_id} from {self._head_node} to {self._tail_node}"
@@ -43,9 +43,50 @@ class Link(ABC):
     def forward(self, t: int) -> List[Bus]:
         ...
 
+    def count_forward_steps(self, bus: Bus) -> int:
+        ''' Count how many `forward` steps the bus needs to reach the tail node.
+
+        The offset is accumulated in the same way as `forward` does, so that an event-driven
+        simulation predicts exactly the same exit time as the stepwise one.
+
+        Args:
+            bus: a bus that has just entered this link
+
+        Returns:
+            forward_steps: the number of steps until the bus leaves this link
+        '''
+        offset = 0.0
+        forward_steps = 0
+        while offset < self._length:
+            offset += bus.speed * 1.0
+            forward_steps += 1
+        return forward_steps
+
+    def locate_bus(self, bus: Bus, t: int, forward_steps: int) -> None:
+        ''' Place a bus on this link as if it has been moved forward `forward_steps` times.
+
+        Used by the event-driven simulation, which does not call `forward` every second.
+
+        Args:
+            bus: a bus running on this link
+            t: current time
+            forward_steps: the number of steps the bus has been moved forward
+        '''
+        offset = min(bus.speed * forward_steps, self._length)
+        self._bus_link_loc[bus.index] = offset
+        bus.update_location(t, 'link', self._link_id, self._head_node, offset)
+
+    def remove_bus(self, bus: Bus) -> None:
+        ''' Remove a bus that has reached the tail node from this link.
+
+        '''
+        self._bus_link_loc.pop(bus.index)
+        self._buses.remove(bus)
+
 
 class DistributionLink(Link):
-    def __init__(self, link_id: str, link_geometry: LinkGeometry, link_distribution: LinkDistribution) -> None:
+    def __init__(self, link_id: str, link_geometry: LinkGeometry, link_distribution: LinkDistribution,
+                 random_streams: RandomStreams) -> None:
         super().__init__(link_id, link_geometry)
 
         self._tt_mean = link_distribution.tt_mean
@@ -53,12 +94,13 @@ class DistributionLink(Link):
         self._tt_type = link_distribution.tt_type
         if self._tt_type == "normal":
             mu, sigma = self._tt_mean, self._tt_mean * self._tt_cv
-            self._tt_distribution = norm(mu, sigma)
+            # travel times are sampled from this link's own stream, and are no shorter than 10 seconds
+            self._tt_sampler = random_streams.create_normal_sampler(
+                mu, sigma, lower=10)
 
     def enter_bus(self, bus: Bus, t: int) -> None:
         # generate link travel time
-        sampled_tt = self._tt_distribution.rvs(size=1).item()
-        sampled_tt = max(10, sampled_tt)
+        sampled_tt = self._sample_travel_time()
         bus.log.record_when_enter_link(self._link_id, sampled_tt-self._tt_mean)
 
         # self._bus_speed[(bus.route_id, bus.bus_id)] = self._length / sampled_tt
@@ -66,23 +108,28 @@ class DistributionLink(Link):
         self._buses.append(bus)
 
         # bus relative location (to the head node) on this link
-        self._bus_link_loc[(bus.route_id, bus.bus_id)] = 0.0
+        self._bus_link_loc[bus.index] = 0.0
 
         bus.update_location(t, 'link', self._link_id, self._head_node, 0)
         bus.set_status('running_on_link')
 
     def forward(self, t: int) -> List[Bus]:
         finished_buses = []
-        for bus in self._buses:
-            self._bus_link_loc[(bus.route_id, bus.bus_id)] += bus.speed * 1.0
+        # iterate over a copy, as finished buses are removed from `self._buses` in the loop,
+        # otherwise the bus right behind a finished bus would not move in this step
+        for bus in list(self._buses):
+            self._bus_link_loc[bus.index] += bus.speed * 1.0
 
-            offset = self._bus_link_loc[(bus.route_id, bus.bus_id)]
+            offset = self._bus_link_loc[bus.index]
             bus.update_location(t, 'link', self._link_id,
                                 self._head_node, offset)
             bus.set_status('running_on_link')
 
-            if self._bus_link_loc[(bus.route_id, bus.bus_id)] >= self._length:
-                self._bus_link_loc.pop((bus.route_id, bus.bus_id))
+            if self._bus_link_loc[bus.index] >= self._length:
+                self._bus_link_loc.pop(bus.index)
                 finished_buses.append(bus)
                 self._buses.remove(bus)
         return finished_buses
+
+    def _sample_travel_time(self) -> float:
+        return self._tt_sampler.sample()
@@ -0,0 +1,213 @@
+from typing import List, Dict, Optional
+from collections import defaultdict
+
+import numpy as np
+
+from setup.config_dataclass import LinkGeometry, LinkDistribution
+
+from .bus import Bus
+from .link import DistributionLink
+from .sampler import RandomStreams
+
+
+class LinkKernel:
+    ''' Keep the position, speed and link index of every running bus of the whole network in NumPy arrays.
+
+    Each running bus occupies a slot of the arrays. Moving all the buses one step forward is a single
+    array operation, and a mask reports the buses that reach the tail node of their links.
+
+    Attributes:
+        _positions: offset of each slot's bus from the head node of its link
+        _speeds: traversing speed of each slot's bus, 0 for free slots
+        _link_indices: link index of each slot's bus, -1 for free slots
+        _link_lengths: length of each link, indexed by link index
+        _entry_seqs: the order that buses enter links, used for keeping the exit order of buses on the same link
+        _slot_buses: the bus of each slot, None for free slots
+        _bus_slot: {bus index -> slot}
+
+    Methods:
+        add_link(self, length: float) -> int
+        add_bus(self, bus: Bus, link_index: int) -> None
+        remove_bus(self, bus: Bus) -> None
+        get_position(self, bus: Bus) -> float
+        set_position(self, bus: Bus, position: float) -> None
+        advance(self, t: int) -> None
+        pop_exits(self, link_index: int) -> List[Bus]
+
+    '''
+    _positions: np.ndarray
+    _speeds: np.ndarray
+    _link_indices: np.ndarray
+    _link_lengths: List[float]
+    _entry_seqs: np.ndarray
+    _slot_buses: List[Optional[Bus]]
+    _free_slots: List[int]
+    _bus_slot: Dict[int, int]
+    _link_exits: Dict[int, List[Bus]]
+
+    def __init__(self, capacity: int = 64) -> None:
+        self._positions = np.zeros(capacity, dtype=np.float64)
+        self._speeds = np.zeros(capacity, dtype=np.float64)
+        self._link_indices = np.full(capacity, -1, dtype=np.int32)
+        self._entry_seqs = np.zeros(capacity, dtype=np.int64)
+        self._link_lengths = []
+        # the length of each slot's link, so that the exit check is a single comparison
+        self._slot_lengths = np.full(capacity, np.inf, dtype=np.float64)
+        self._slot_buses = [None] * capacity
+        # pop from the end, so that the smallest free slot is used first
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._bus_slot = {}
+        self._entry_count = 0
+        # the last time that buses are moved forward, to move them only once per step
+        self._advanced_time: Optional[int] = None
+        # link index -> buses that reach the tail node in the last step, in the order of entering the link
+        self._link_exits = defaultdict(list)
+
+    def add_link(self, length: float) -> int:
+        ''' Register a link and return its index.
+
+        '''
+        self._link_lengths.append(length)
+        return len(self._link_lengths) - 1
+
+    def add_bus(self, bus: Bus, link_index: int) -> None:
+        ''' Put a bus at the head node of a link, the bus's speed should have been set.
+
+        '''
+        if len(self._free_slots) == 0:
+            self._grow()
+        slot = self._free_slots.pop()
+        self._positions[slot] = 0.0
+        self._speeds[slot] = bus.speed
+        self._link_indices[slot] = link_index
+        self._slot_lengths[slot] = self._link_lengths[link_index]
+        self._entry_seqs[slot] = self._entry_count
+        self._entry_count += 1
+        self._slot_buses[slot] = bus
+        self._bus_slot[bus.index] = slot
+
+    def remove_bus(self, bus: Bus) -> None:
+        ''' Free the slot of a bus.
+
+        '''
+        slot = self._bus_slot.pop(bus.index)
+        self._free_slot(slot)
+
+    def get_position(self, bus: Bus) -> float:
+        return float(self._positions[self._bus_slot[bus.index]])
+
+    def set_position(self, bus: Bus, position: float) -> None:
+        self._positions[self._bus_slot[bus.index]] = position
+
+    def advance(self, t: int) -> None:
+        ''' Move all the running buses one step (delta t) forward, at most once for each time t.
+
+        The buses that reach the tail node of their links are removed from the kernel,
+        and can be collected by `pop_exits` for each link.
+
+        '''
+        if self._advanced_time == t:
+            return
+        self._advanced_time = t
+
+        # free slots have zero speed and infinite length, so they never move or exit
+        self._positions += self._speeds * 1.0
+        exit_mask = self._positions >= self._slot_lengths
+        if not exit_mask.any():
+            return
+
+        exit_slots = np.flatnonzero(exit_mask)
+        exit_slots = exit_slots[np.argsort(
+            self._entry_seqs[exit_slots], kind='stable')]
+        for slot in exit_slots.tolist():
+            bus = self._slot_buses[slot]
+            assert bus is not None
+            self._link_exits[int(self._link_indices[slot])].append(bus)
+            self._bus_slot.pop(bus.index)
+            self._free_slot(slot)
+
+    def pop_exits(self, link_index: int) -> List[Bus]:
+        ''' Get and clear the buses that reach the tail node of the link in the last step.
+
+        '''
+        return self._link_exits.pop(link_index, [])
+
+    def _free_slot(self, slot: int) -> None:
+        self._speeds[slot] = 0.0
+        self._positions[slot] = 0.0
+        self._link_indices[slot] = -1
+        self._slot_lengths[slot] = np.inf
+        self._slot_buses[slot] = None
+        self._free_slots.append(slot)
+
+    def _grow(self) -> None:
+        capacity = len(self._slot_buses)
+        self._positions = np.concatenate(
+            [self._positions, np.zeros(capacity, dtype=np.float64)])
+        self._speeds = np.concatenate(
+            [self._speeds, np.zeros(capacity, dtype=np.float64)])
+        self._link_indices = np.concatenate(
+            [self._link_indices, np.full(capacity, -1, dtype=np.int32)])
+        self._entry_seqs = np.concatenate(
+            [self._entry_seqs, np.zeros(capacity, dtype=np.int64)])
+        self._slot_lengths = np.concatenate(
+            [self._slot_lengths, np.full(capacity, np.inf, dtype=np.float64)])
+        self._slot_buses.extend([None] * capacity)
+        self._free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+
+class KernelLink(DistributionLink):
+    ''' A distribution link whose buses are moved by a `LinkKernel` shared by all the links of the network.
+
+    It keeps the `Link` interface for `Mediator`: `enter_bus` samples the travel time as `DistributionLink` does
+    and registers the bus to the kernel, and `forward` advances the kernel (once per step for the whole network)
+    and returns the buses of this link that reach the tail node.
+
+    Trajectory points are only recorded when buses enter and leave the link, as buses run at a constant speed in between.
+    The locations of running buses are refreshed from the kernel when they are queried by `buses`.
+
+    '''
+    _kernel: LinkKernel
+    _link_index: int
+
+    def __init__(self, link_id: str, link_geometry: LinkGeometry, link_distribution: LinkDistribution,
+                 random_streams: RandomStreams, kernel: LinkKernel) -> None:
+        super().__init__(link_id, link_geometry, link_distribution, random_streams)
+        self._kernel = kernel
+        self._link_index = kernel.add_link(self._length)
+
+    @property
+    def buses(self) -> List[Bus]:
+        for bus in self._buses:
+            bus.locate(self._head_node, self._kernel.get_position(bus))
+        return self._buses
+
+    def enter_bus(self, bus: Bus, t: int) -> None:
+        # generate link travel time
+        sampled_tt = self._sample_travel_time()
+        bus.log.record_when_enter_link(self._link_id, sampled_tt-self._tt_mean)
+
+        bus.speed = self._length / sampled_tt
+        self._buses.append(bus)
+        self._kernel.add_bus(bus, self._link_index)
+
+        bus.update_location(t, 'link', self._link_id, self._head_node, 0)
+        bus.set_status('running_on_link')
+
+    def forward(self, t: int) -> List[Bus]:
+        self._kernel.advance(t)
+        finished_buses = self._kernel.pop_exits(self._link_index)
+        for bus in finished_buses:
+            bus.update_location(t, 'link', self._link_id,
+                                self._head_node, self._length)
+            self._buses.remove(bus)
+        return finished_buses
+
+    def locate_bus(self, bus: Bus, t: int, forward_steps: int) -> None:
+        offset = min(bus.speed * forward_steps, self._length)
+        self._kernel.set_position(bus, offset)
+        bus.update_location(t, 'link', self._link_id, self._head_node, offset)
+
+    def remove_bus(self, bus: Bus) -> None:
+        self._kernel.remove_bus(bus)
+        self._buses.remove(bus)
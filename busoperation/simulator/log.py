@@ -4,6 +4,8 @@ from collections import defaultdict
 from simulator.virtual_bus import VirtualBus
 from setup.blueprint import Blueprint
 
+from .utils import RunningStat, HeadwayStat
+
 
 class StopLog:
     def __init__(self, stop_id: str, virtual_bus: VirtualBus) -> None:
@@ -22,31 +24,52 @@ class StopLog:
         self.route_bus_epsilon_rtd: Dict[str,
                                          Dict[str, float]] = defaultdict(dict)
 
-        # initialize the arrival time of the first virtual bus with `bus_id=0` on each route
+        # online statistics for metrics, updated with the records above
+        # route -> headway statistics of arrival (rtd) times
+        self.route_arrival_headway: Dict[str,
+                                         HeadwayStat] = defaultdict(HeadwayStat)
+        self.route_rtd_headway: Dict[str,
+                                     HeadwayStat] = defaultdict(HeadwayStat)
+        # route -> statistics of |epsilon| when arrival (rtd)
+        self.route_abs_epsilon_arrival: Dict[str,
+                                             RunningStat] = defaultdict(RunningStat)
+        self.route_abs_epsilon_rtd: Dict[str,
+                                         RunningStat] = defaultdict(RunningStat)
+
+        # initialize the arrival time of the first virtual bus with `bus_id=0` on each route visiting this stop
         for route_id, stop_arrival_time in virtual_bus.route_stop_arrival_time.items():
+            if stop_id not in stop_arrival_time:
+                continue
             arrival_time_this_stop = stop_arrival_time[stop_id]
-            self.route_arrival_time_seq[route_id] = [arrival_time_this_stop]
-            self.route_arrival_bus_id_seq[route_id] = ['0']
+            self.route_arrival_time_seq[route_id] = []
+            self.route_arrival_bus_id_seq[route_id] = []
             # the epsilon_arrival of the first virtual bus is 0
-            self.route_bus_epsilon_arrival[route_id]['0'] = 0
+            self.record_when_bus_arrival(
+                route_id, '0', arrival_time_this_stop, 0)
 
-        # initialize the rtd time of the first virtual bus with `bus_id=0` on each route
+        # initialize the rtd time of the first virtual bus with `bus_id=0` on each route visiting this stop
         for route_id, stop_rtd_time in virtual_bus.route_stop_rtd_time.items():
+            if stop_id not in stop_rtd_time:
+                continue
             rtd_time_this_stop = stop_rtd_time[stop_id]
-            self.route_rtd_time_seq[route_id] = [rtd_time_this_stop]
-            self.route_rtd_bus_id_seq[route_id] = ['0']
+            self.route_rtd_time_seq[route_id] = []
+            self.route_rtd_bus_id_seq[route_id] = []
             # the epsilon_rtd of the first virtual bus is 0
-            self.route_bus_epsilon_rtd[route_id]['0'] = 0
+            self.record_when_bus_rtd(route_id, '0', rtd_time_this_stop, 0)
 
-    def record_when_bus_arrival(self, route_id: str, bus_id: str, t: int, epsilon_arrival: float) -> None:
+    def record_when_bus_arrival(self, route_id: str, bus_id: str, t: float, epsilon_arrival: float) -> None:
         self.route_bus_epsilon_arrival[route_id][bus_id] = epsilon_arrival
         self.route_arrival_time_seq[route_id].append(t)
         self.route_arrival_bus_id_seq[route_id].append(bus_id)
+        self.route_arrival_headway[route_id].add_time(t)
+        self.route_abs_epsilon_arrival[route_id].add(abs(epsilon_arrival))
 
-    def record_when_bus_rtd(self, route_id: str, bus_id: str, t: int, epsilon_rtd: float) -> None:
+    def record_when_bus_rtd(self, route_id: str, bus_id: str, t: float, epsilon_rtd: float) -> None:
         self.route_bus_epsilon_rtd[route_id][bus_id] = epsilon_rtd
         self.route_rtd_time_seq[route_id].append(t)
         self.route_rtd_bus_id_seq[route_id].append(bus_id)
+        self.route_rtd_headway[route_id].add_time(t)
+        self.route_abs_epsilon_rtd[route_id].add(abs(epsilon_rtd))
 
 
 class HolderLog:
@@ -59,20 +82,61 @@ class HolderLog:
         self.route_stop_bus_epsilon_departure: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(
             lambda: defaultdict(dict))
 
+        # online statistics for metrics, updated with the records above
+        # route -> stop -> headway statistics of departure times
+        self.route_stop_departure_headway: Dict[str, Dict[str, HeadwayStat]] = defaultdict(
+            lambda: defaultdict(HeadwayStat))
+        # route -> stop -> statistics of |epsilon| when departure
+        self.route_stop_abs_epsilon_departure: Dict[str, Dict[str, RunningStat]] = defaultdict(
+            lambda: defaultdict(RunningStat))
+
         # initialize the departure time of the first virtual bus with `bus_id=0` on each route
         for route_id, stop_departure_time in virtual_bus.route_stop_departure_time.items():
             for stop_id, departure_time in stop_departure_time.items():
-                self.route_stop_departure_time_seq[route_id][stop_id] = [
-                    departure_time]
-                self.route_stop_departure_bus_id_seq[route_id][stop_id] = ['0']
                 # the epsilon_departure of the first virtual bus is 0
-                self.route_stop_bus_epsilon_departure[route_id][stop_id]['0'] = 0
+                self.record_when_bus_departure(
+                    stop_id, route_id, '0', departure_time, 0)
 
     def record_when_bus_departure(self, stop_id: str, route_id: str, bus_id: str,
-                                  t: int, epsilon_departure: float) -> None:
+                                  t: float, epsilon_departure: float) -> None:
         self.route_stop_departure_time_seq[route_id][stop_id].append(t)
         self.route_stop_departure_bus_id_seq[route_id][stop_id].append(bus_id)
         self.route_stop_bus_epsilon_departure[route_id][stop_id][bus_id] = epsilon_departure
+        self.route_stop_departure_headway[route_id][stop_id].add_time(t)
+        self.route_stop_abs_epsilon_departure[route_id][stop_id].add(
+            abs(epsilon_departure))
+
+
+class ActionLog:
+    ''' Compact record of all the holding actions, kept apart from the snapshots so that they can be dropped.
+
+    '''
+
+    def __init__(self, warm_up_time: int = 0) -> None:
+        self._warm_up_time = warm_up_time
+        # the time of each action
+        self.times: List[int] = []
+        # (stop_id, route_id, bus_id) of each action
+        self.stop_bus_ids: List[Tuple[str, str, str]] = []
+        # the holding time of each action
+        self.hold_times: List[float] = []
+
+        # online statistics of holding times, (route_id, stop_id) -> all actions (actions after the warm-up time)
+        self.route_stop_hold_time: Dict[Tuple[str, str],
+                                        RunningStat] = defaultdict(RunningStat)
+        self.route_stop_warm_hold_time: Dict[Tuple[str, str],
+                                             RunningStat] = defaultdict(RunningStat)
+
+    def record(self, t: int, stop_bus_hold_time: Dict[Tuple[str, str, str], float]) -> None:
+        for stop_bus_id, hold_time in stop_bus_hold_time.items():
+            self.times.append(t)
+            self.stop_bus_ids.append(stop_bus_id)
+            self.hold_times.append(hold_time)
+            stop_id, route_id, _ = stop_bus_id
+            self.route_stop_hold_time[(route_id, stop_id)].add(hold_time)
+            if t > self._warm_up_time:
+                self.route_stop_warm_hold_time[(route_id, stop_id)].add(
+                    hold_time)
 
 
 class BusRunningLog:
@@ -97,6 +161,8 @@ class BusRunningLog:
         # record visited stops
         self.visited_stops: List[str] = []
 
+        # record the arrival time at each stop
+        self.stop_arrival_time: Dict[str, int] = {}
         # record the schedule deviation when arrival at each stop
         self.stop_epsilon_arrival: Dict[str, float] = {}
         # record the schedule deviation when ready-to-departure at each stop
@@ -115,6 +181,7 @@ class BusRunningLog:
         shift = self.schedule_headway * last_arrival_idx_count
         schedule_arrival = self.virtual_bus_stop_arrival_time[stop_id] + shift
         epsilon_arrival = t - schedule_arrival
+        self.stop_arrival_time[stop_id] = t
         self.stop_epsilon_arrival[stop_id] = epsilon_arrival
         return epsilon_arrival
 
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from setup.blueprint import Blueprint
 
@@ -7,18 +7,25 @@ from .holder import Holder
 from .link import Link
 from .stop import Stop
 from .terminal import Terminal
+from .profiler import PhaseProfiler
 
 
 class Mediator:
     def __init__(self, blueprint: Blueprint, terminals: Dict[str, Terminal],
-                 links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder) -> None:
+                 links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder,
+                 profiler: Optional[PhaseProfiler] = None) -> None:
         self._blueprint = blueprint
+        # if given, the transfers of buses are timed as 'mediator_transfer'
+        self._profiler = profiler
         self._terminals = terminals
         self._links = links
         self._stops = stops
         self._holder = holder
 
     def transfer(self, buses: List[Bus], spot_type: str, spot_id: str, t: int):
+        profiler = self._profiler
+        if profiler is not None and len(buses) > 0:
+            clock = profiler.start()
         for bus in buses:
             if spot_type == 'terminal':
                 next_link_id = self._blueprint.get_next_link_id(
@@ -46,3 +53,5 @@ class Mediator:
                 next_link_id = self._blueprint.get_next_link_id(
                     bus.route_id, spot_id)
                 self._links[next_link_id].enter_bus(bus, t)
+        if profiler is not None and len(buses) > 0:
+            profiler.lap('mediator_transfer', clock)
@@ -1,20 +1,27 @@
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 import numpy as np
-from scipy.stats import norm
 from collections import defaultdict
 
-from setup.route import RouteInfo
+from setup.route import Route, RouteInfo
 from setup.config_dataclass import PaxOperation
 from simulator.virtual_bus import VirtualBus
 
+from .sampler import RandomStreams, BlockSampler
+
+
+# the key of the keyed random streams of Poisson arrivals at stops, followed by the index of the stop
+PAX_ARRIVAL_STREAM_KEY = 1
+# the length of the blocks of seconds whose Poisson arrivals at a stop are drawn at once by `generate_at_stop`
+PAX_ARRIVAL_BLOCK_SECONDS = 600
+
 
 @dataclass(frozen=True)
 class Pax:
     pax_id: str
     origin: str
     destination: str
-    routes: List[str]
+    routes: Tuple[str, ...]
     arrival_time: int
     board_rate: float
 
@@ -22,73 +29,238 @@ class Pax:
         return f'Pax {self.pax_id} from {self.origin} to {self.destination} on {self.routes}, arrived at {self.arrival_time}'
 
 
+def find_common_routes(route_infos: Dict[str, Route], od_pairs: List[Tuple[str, str]]) -> List[Tuple[str, ...]]:
+    ''' Find the routes that visit the destination after the origin for each OD pair, in the order of `route_infos`.
+
+    '''
+    # {stop id -> [(route id, the index of the stop in the route's visiting sequence)]}
+    stop_route_indices: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    route_stop_index: Dict[str, Dict[str, int]] = {}
+    for route_id, route in route_infos.items():
+        route_stop_index[route_id] = {stop_id: idx for idx, stop_id in enumerate(route.visit_seq_stops)}
+        for idx, stop_id in enumerate(route.visit_seq_stops):
+            stop_route_indices[stop_id].append((route_id, idx))
+
+    # the pairs of the same origin and destination share one tuple
+    od_routes: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+    for origin_stop_id, dest_stop_id in od_pairs:
+        if (origin_stop_id, dest_stop_id) not in od_routes:
+            od_routes[(origin_stop_id, dest_stop_id)] = tuple(
+                route_id for route_id, origin_idx in stop_route_indices[origin_stop_id]
+                if route_stop_index[route_id].get(dest_stop_id, -1) > origin_idx)
+    return [od_routes[od_pair] for od_pair in od_pairs]
+
+
 class PaxGenerator:
+    ''' Generate passengers at stops according to the route-specific OD rate tables.
+
+    The OD tables are compiled into flat arrays of the OD pairs with positive rates, in the order of
+    (route, origin stop, destination stop) of `route_OD_rate_table`, so that the passenger numbers of all
+    the pairs in a step are drawn in one NumPy call instead of one scalar call per pair.
+
+    A passenger can take any route that visits the destination after the origin (i.e., the common routes of the
+    OD pair), in the order of `route_infos`, whichever route's OD table generated the passenger.
+
+    `generate` draws the Poisson arrivals of all the stops from numpy's global random state second by second.
+    `generate_at_stop` draws those of each stop from the stop's own keyed stream (see `RandomStreams`)
+    in fixed blocks of seconds, so the arrivals do not depend on when, or in which order, the stops are asked for.
+
+    Attributes:
+        _pair_route_ids: route id of each OD pair
+        _pair_routes: the common routes of each OD pair
+        _pair_origins: origin stop id of each OD pair
+        _pair_dests: destination stop id of each OD pair
+        _pair_rates: arrival rate (pax/sec) of each OD pair
+        _pair_start_times: each OD pair is active (i.e., passengers arrive) after this time
+        _pair_first_times: the first second that each OD pair is active
+        _pair_markers: the accumulated arrival rate of each OD pair, for deterministic arrivals
+        _stop_pairs: {origin stop id -> indices of the OD pairs starting from it}
+        _stop_arrival_rng: {origin stop id -> the stream of the Poisson arrivals of `generate_at_stop`}
+        _stop_arrivals: {origin stop id -> (arrival times, pair offsets in `_stop_pairs`) of the drawn arrivals
+            that are not generated yet, sorted by arrival time and then by pair}
+        _stop_drawn_until: {origin stop id -> the last second whose arrivals are drawn}
+
+    Methods:
+        generate(self, t: int) -> Dict[str, List[Pax]]
+        generate_at_stop(self, stop_id: str, start_t: int, end_t: int) -> List[Pax]
+
+    '''
     pax_count = 0
 
-    def __init__(self, route_info: RouteInfo, pax_operation: PaxOperation, virtual_bus: VirtualBus) -> None:
+    def __init__(self, route_info: RouteInfo, pax_operation: PaxOperation, virtual_bus: VirtualBus,
+                 random_streams: RandomStreams) -> None:
         self._route_od_table = route_info.route_OD_rate_table
+        self._route_infos = route_info.route_infos
         self._route_stop_pax_arrival_start_time = virtual_bus.route_stop_pax_arrival_start_time
         self._pax_arrival_type = pax_operation.pax_arrival_type
         self._pax_board_time_mean = pax_operation.pax_board_time_mean
         self._pax_board_time_std = pax_operation.pax_board_time_std
         self._pax_board_time_type = pax_operation.pax_board_time_type
+        assert self._pax_arrival_type in ('deterministic', 'poisson')
 
-        if self._pax_arrival_type == 'deterministic':
-            self._route_od_arrival_marker: Dict[str, Dict[Tuple[str, str], float]] = defaultdict(
-                lambda: defaultdict(float))
+        self._compile_od_pairs()
+        self._random_streams = random_streams
+        self._stop_arrival_rng: Dict[str, np.random.Generator] = {}
+        self._stop_arrivals: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._stop_drawn_until: Dict[str, int] = {}
 
         if self._pax_board_time_type == "normal":
             mu, sigma = self._pax_board_time_mean, self._pax_board_time_std
-            self._board_time_distribution = norm(mu, sigma)
-
-    def _get_deterministic_pax_num(self, route_id: str, origin_stop_id: str, dest_stop_id: str, rate: float) -> int:
-        current_rate = self._route_od_arrival_marker[route_id][(
-            origin_stop_id, dest_stop_id)]
-        new_rate = current_rate + rate
-        if new_rate >= 1:
-            new_rate -= 1
-            self._route_od_arrival_marker[route_id][(
-                origin_stop_id, dest_stop_id)] = new_rate
-            return 1
-        else:
-            self._route_od_arrival_marker[route_id][(
-                origin_stop_id, dest_stop_id)] = new_rate
-            return 0
+            # each origin stop samples boarding times from its own stream, clipped to [0.01, 10] seconds
+            self._stop_board_time_sampler: Dict[str, BlockSampler] = {}
+            for od_table in self._route_od_table.values():
+                for origin_stop_id in od_table:
+                    if origin_stop_id not in self._stop_board_time_sampler:
+                        self._stop_board_time_sampler[origin_stop_id] = random_streams.create_normal_sampler(
+                            mu, sigma, lower=0.01, upper=10)
+
+    def _compile_od_pairs(self) -> None:
+        route_ids, origins, dests, rates, start_times = [], [], [], [], []
+        for route_id, od_table in self._route_od_table.items():
+            for origin_stop_id, dest_stop_od in od_table.items():
+                start_time = self._route_stop_pax_arrival_start_time[route_id][origin_stop_id]
+                for dest_stop_id, rate in dest_stop_od.items():
+                    # pairs with zero rate never generate passengers (nor consume random numbers)
+                    if rate <= 0:
+                        continue
+                    route_ids.append(route_id)
+                    origins.append(origin_stop_id)
+                    dests.append(dest_stop_id)
+                    rates.append(rate)
+                    start_times.append(start_time)
 
-    def _get_poission_pax_num(self, rate: float) -> int:
-        return np.random.poisson(rate)
+        self._pair_route_ids: List[str] = route_ids
+        self._pair_routes = find_common_routes(self._route_infos, list(zip(origins, dests)))
+        self._pair_origins: List[str] = origins
+        self._pair_dests: List[str] = dests
+        self._pair_rates = np.array(rates, dtype=np.float64)
+        self._pair_start_times = np.array(start_times, dtype=np.float64)
+        # the first (integer) second that each OD pair is active
+        self._pair_first_times = np.floor(self._pair_start_times).astype(np.int64) + 1
+        self._pair_markers = np.zeros(len(rates), dtype=np.float64)
+        stop_pairs: Dict[str, List[int]] = defaultdict(list)
+        for pair, origin_stop_id in enumerate(origins):
+            stop_pairs[origin_stop_id].append(pair)
+        self._stop_pairs: Dict[str, np.ndarray] = {
+            stop_id: np.array(pairs, dtype=np.int64) for stop_id, pairs in stop_pairs.items()}
 
-    def _get_board_rate(self):
+    def _get_board_rate(self, stop_id: str) -> float:
         if self._pax_board_time_type == 'deterministic':
             return 1 / self._pax_board_time_mean
         else:
-            sampled_time = self._board_time_distribution.rvs(size=1).item()
-            sampled_time = max(0.01, sampled_time)
-            sampled_time = min(10, sampled_time)
+            sampled_time = self._stop_board_time_sampler[stop_id].sample()
             return 1/sampled_time
 
+    def _draw_pax_nums(self, pairs: np.ndarray) -> np.ndarray:
+        ''' Draw the passenger numbers of the given OD pairs in one step.
+
+        '''
+        rates = self._pair_rates[pairs]
+        if self._pax_arrival_type == 'deterministic':
+            # a passenger arrives whenever the accumulated rate reaches 1
+            markers = self._pair_markers[pairs] + rates
+            pax_nums = (markers >= 1).astype(np.int64)
+            self._pair_markers[pairs] = markers - pax_nums
+            return pax_nums
+        else:
+            return np.random.poisson(rates)
+
+    def _create_pax(self, pair: int, t: int) -> Pax:
+        origin_stop_id = self._pair_origins[pair]
+        common_routes = self._pair_routes[pair]
+        board_rate = self._get_board_rate(origin_stop_id)
+        pax = Pax(str(PaxGenerator.pax_count), origin_stop_id,
+                  self._pair_dests[pair], common_routes, t, board_rate)
+        PaxGenerator.pax_count += 1
+        return pax
+
     def generate(self, t: int) -> Dict[str, List[Pax]]:
         stop_paxs = defaultdict(list)
-        for route_id, od_table in self._route_od_table.items():
-            for origin_stop_id, dest_stop_od in od_table.items():
-                if t <= self._route_stop_pax_arrival_start_time[route_id][origin_stop_id]:
-                    continue
-                for dest_stop_id, rate in dest_stop_od.items():
-                    # TODO search common routes between origin and destination
-                    common_routes = [route_id]
-                    # rate = rate*self._warm_discount_rate if t < self._warm_time else rate
-                    pax_num = 0
-                    if self._pax_arrival_type == 'deterministic':
-                        pax_num = self._get_deterministic_pax_num(
-                            route_id, origin_stop_id, dest_stop_id, rate)
-                    else:
-                        assert self._pax_arrival_type == 'poisson'
-                        pax_num = self._get_poission_pax_num(rate)
-
-                    for pax in range(pax_num):
-                        board_rate = self._get_board_rate()
-                        pax = Pax(str(PaxGenerator.pax_count), origin_stop_id,
-                                  dest_stop_id, common_routes, t, board_rate)
-                        stop_paxs[origin_stop_id].append(pax)
-                        PaxGenerator.pax_count += 1
+        active_pairs = np.flatnonzero(t > self._pair_start_times)
+        if len(active_pairs) == 0:
+            return {}
+        pax_nums = self._draw_pax_nums(active_pairs)
+        for offset in np.flatnonzero(pax_nums).tolist():
+            pair = int(active_pairs[offset])
+            for _ in range(int(pax_nums[offset])):
+                pax = self._create_pax(pair, t)
+                stop_paxs[pax.origin].append(pax)
         return dict(stop_paxs)
+
+    def generate_at_stop(self, stop_id: str, start_t: int, end_t: int) -> List[Pax]:
+        ''' Generate the passengers arriving at a stop during [start_t, end_t] at once.
+
+        Used by the event-driven simulation, which only needs the passengers of a stop when a bus is there.
+        The arrival process of each OD pair is the same as `generate`, but for Poisson arrivals the counts are
+        not drawn second by second: the count of each block of `PAX_ARRIVAL_BLOCK_SECONDS` is drawn at once
+        from the stop's own stream, and the arrival seconds are drawn uniformly over the block,
+        which is the same distribution. The intervals of successive calls for a stop should follow each other.
+
+        Args:
+            stop_id: the origin stop id
+            start_t: the first second to generate passengers
+            end_t: the last second to generate passengers
+
+        Returns:
+            paxs: the generated passengers, sorted by arrival time
+        '''
+        if stop_id not in self._stop_pairs or start_t > end_t:
+            return []
+        pairs = self._stop_pairs[stop_id]
+
+        if self._pax_arrival_type == 'deterministic':
+            # a pair is active in the seconds after its start time
+            first_active_times = np.maximum(start_t, self._pair_first_times[pairs])
+            if not (first_active_times <= end_t).any():
+                return []
+            times = np.arange(start_t, end_t + 1)
+            active = times[:, None] >= first_active_times[None, :]
+            pax_nums = np.zeros(active.shape, dtype=np.int64)
+            for time_idx in range(len(times)):
+                active_pairs = pairs[active[time_idx]]
+                if len(active_pairs) > 0:
+                    pax_nums[time_idx, active[time_idx]
+                             ] = self._draw_pax_nums(active_pairs)
+            time_indices, pair_indices = np.nonzero(pax_nums)
+            counts = pax_nums[time_indices, pair_indices]
+            arrival_times = np.repeat(times[time_indices], counts)
+            pair_indices = np.repeat(pair_indices, counts)
+        else:
+            while self._stop_drawn_until.get(stop_id, -1) < end_t:
+                self._draw_arrival_block(stop_id)
+            drawn_times, drawn_pair_indices = self._stop_arrivals[stop_id]
+            start_idx = np.searchsorted(drawn_times, start_t, side='left')
+            end_idx = np.searchsorted(drawn_times, end_t, side='right')
+            arrival_times = drawn_times[start_idx:end_idx]
+            pair_indices = drawn_pair_indices[start_idx:end_idx]
+            self._stop_arrivals[stop_id] = (drawn_times[end_idx:], drawn_pair_indices[end_idx:])
+
+        return [self._create_pax(int(pairs[pair_idx]), t)
+                for t, pair_idx in zip(arrival_times.tolist(), pair_indices.tolist())]
+
+    def _draw_arrival_block(self, stop_id: str) -> None:
+        ''' Draw the Poisson arrivals at a stop during the next block of seconds.
+
+        '''
+        rng = self._stop_arrival_rng.get(stop_id)
+        if rng is None:
+            stop_index = list(self._stop_pairs).index(stop_id)
+            rng = self._random_streams.create_keyed_generator(PAX_ARRIVAL_STREAM_KEY, stop_index)
+            self._stop_arrival_rng[stop_id] = rng
+        block_start = self._stop_drawn_until.get(stop_id, -1) + 1
+        block_end = block_start + PAX_ARRIVAL_BLOCK_SECONDS - 1
+        self._stop_drawn_until[stop_id] = block_end
+
+        pairs = self._stop_pairs[stop_id]
+        # a pair is active in the seconds after its start time
+        first_active_times = np.maximum(block_start, self._pair_first_times[pairs])
+        active_nums = np.maximum(0, block_end - first_active_times + 1)
+        totals = rng.poisson(self._pair_rates[pairs] * active_nums)
+        pair_indices = np.repeat(np.arange(len(pairs)), totals)
+        arrival_times = rng.integers(first_active_times[pair_indices], block_end + 1)
+        # by arrival time and then by the order of OD pairs, as `generate`
+        order = np.lexsort((pair_indices, arrival_times))
+        drawn_times, drawn_pair_indices = self._stop_arrivals.get(
+            stop_id, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)))
+        self._stop_arrivals[stop_id] = (np.concatenate([drawn_times, arrival_times[order]]),
+                                        np.concatenate([drawn_pair_indices, pair_indices[order]]))
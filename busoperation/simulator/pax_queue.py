@@ -1,19 +1,114 @@
-from typing import List, Dict, Tuple, Literal
+from typing import List, Dict, Tuple, Literal, Optional
 from collections import defaultdict
-from copy import deepcopy
+from bisect import bisect_left, bisect_right
+import heapq
 
 from .pax_generation import Pax
 from .bus import Bus
 
 
+class PaxGroup:
+    ''' Passengers of the same group (i.e., the same common routes) ordered by arrival time.
+
+    Boarded passengers are not removed from the list, instead a head index moves forward,
+    so popping the head is O(1). The consumed part is dropped once it takes up half of the list.
+    A parallel list of arrival times answers how many passengers arrived before a time with a bisect.
+
+    Methods:
+        append(self, pax: Pax) -> None
+        count(self) -> int
+        count_arrived_before(self, t: float) -> int
+        peek(self) -> Pax
+        pop(self) -> Pax
+
+    '''
+    _paxs: List[Pax]
+    _arrival_times: List[int]
+    _head: int
+
+    def __init__(self) -> None:
+        self._paxs = []
+        self._arrival_times = []
+        self._head = 0
+
+    def append(self, pax: Pax) -> None:
+        if len(self._arrival_times) == self._head or pax.arrival_time >= self._arrival_times[-1]:
+            self._paxs.append(pax)
+            self._arrival_times.append(pax.arrival_time)
+        else:
+            # keep the arrival order, passengers arriving at the same time stay first come first served
+            idx = bisect_right(self._arrival_times,
+                               pax.arrival_time, lo=self._head)
+            self._paxs.insert(idx, pax)
+            self._arrival_times.insert(idx, pax.arrival_time)
+
+    def count(self) -> int:
+        return len(self._paxs) - self._head
+
+    def count_arrived_before(self, t: float) -> int:
+        ''' Count the passengers who arrived strictly before time t.
+
+        '''
+        return bisect_left(self._arrival_times, t, lo=self._head) - self._head
+
+    def peek(self) -> Pax:
+        return self._paxs[self._head]
+
+    def pop(self) -> Pax:
+        pax = self._paxs[self._head]
+        self._head += 1
+        if self._head * 2 >= len(self._paxs):
+            del self._paxs[:self._head]
+            del self._arrival_times[:self._head]
+            self._head = 0
+        return pax
+
+
 class PaxQueue:
-    _route_group_paxs: Dict[Tuple[str, ...], List[Pax]]
+    ''' Passengers waiting at a stop, grouped by the routes that they can take.
+
+    A passenger of a common-line group (i.e., whose `routes` lists several routes) can board a bus of any of them.
+    The groups are indexed by route and the number of waiting passengers of each route is kept on arrival and
+    boarding, so a bus only looks at the groups of its own route, and counting the passengers that it can take
+    does not scan the queue. Across the groups of a route, passengers board in the order of arrival,
+    and passengers arriving at the same time board in the order of creation of their groups.
+
+    The head passengers of the groups of each route are kept in a min-heap of (arrival time, group order, routes).
+    An entry is pushed whenever the head of a group changes, and the entries whose group has since emptied or
+    changed its head are skipped when they reach the top, so finding the next group to board is O(log k)
+    for the k groups of a route.
+
+    Attributes:
+        _route_group_paxs: {routes -> the group of passengers who can take the routes}
+        _route_group_order: {routes -> the order of creation of the group}
+        _route_groups: {route id -> the groups whose routes include the route, in the order of creation}
+        _route_heads: {route id -> the min-heap of (arrival time of the head pax, group order, routes)
+            of the groups of the route}
+        _route_pax_count: {route id -> the number of waiting passengers who can take the route}
+        _pax_count: the number of waiting passengers
+
+    Methods:
+        add_pax(self, pax: Pax) -> None
+        board(self, bus: Bus, t: int) -> None
+        get_total_pax_num(self) -> int
+        check_remaining_pax_num(self, bus: Bus) -> int
+
+    '''
+    _route_group_paxs: Dict[Tuple[str, ...], PaxGroup]
+    _route_group_order: Dict[Tuple[str, ...], int]
+    _route_groups: Dict[str, List[Tuple[Tuple[str, ...], PaxGroup]]]
+    _route_heads: Dict[str, List[Tuple[int, int, Tuple[str, ...]]]]
+    _route_pax_count: Dict[str, int]
+    _pax_count: int
     _board_status: float
 
     def __init__(self, stop_id: str, board_truncation: Literal['arrival', 'rtd']):
-        # Key is a tuple of common routes, value is a list of paxs
-        # if the tuple contains only one route, then the paxs are exclusive
-        self._route_group_paxs = defaultdict(list)
+        self._route_group_paxs = {}
+        self._route_group_order = {}
+        self._route_groups = defaultdict(list)
+        self._route_heads = defaultdict(list)
+        self._route_pax_count = defaultdict(int)
+        self._pax_count = 0
         self._board_status = 0.0
         # the stop id that the queue belongs to
         self._stop_id = stop_id
@@ -27,7 +122,20 @@ class PaxQueue:
             pax: the pax to be added
         '''
         routes = tuple(pax.routes)
-        self._route_group_paxs[routes].append(pax)
+        paxs = self._route_group_paxs.get(routes)
+        if paxs is None:
+            paxs = PaxGroup()
+            self._route_group_order[routes] = len(self._route_group_paxs)
+            self._route_group_paxs[routes] = paxs
+            for route_id in routes:
+                self._route_groups[route_id].append((routes, paxs))
+        if paxs.count() == 0 or pax.arrival_time < paxs.peek().arrival_time:
+            # the pax becomes the head of the group
+            self._push_head(routes, pax.arrival_time)
+        paxs.append(pax)
+        for route_id in routes:
+            self._route_pax_count[route_id] += 1
+        self._pax_count += 1
 
     def board(self, bus: Bus, t: int):
         ''' Board paxs in this queue to a bus
@@ -43,49 +151,31 @@ class PaxQueue:
             return
         # if the bus is idle, then it is ready to board
         elif bus.board_status == 'idle':
-            # 0. find pax groups that the bus can serve
-            served_groups = self._get_served_groups(bus.route_id)
-            # no group can be served
-            if len(served_groups) == 0:
-                return
-
-            # 1. serve the exlusive groups first
-            exclusive_group = served_groups[0]
-            paxs = self._route_group_paxs[exclusive_group]
-            board_paxs = []
-            if self._board_truncation == 'arrival':
-                board_paxs = self.filter_pax_arrival_after_bus_arrival(
-                    bus, paxs)
-            else:
-                board_paxs = paxs
-
-            if len(board_paxs) == 0:
+            # the first arrived pax among the groups that the bus can serve
+            routes = self._get_next_group(bus)
+            if routes is None:
                 return
             # put the pax in the head of the queue on board, but the boarding process is not finished
-            head_pax = board_paxs[0]
+            paxs = self._route_group_paxs[routes]
+            head_pax = paxs.pop()
+            if paxs.count() > 0 and paxs.peek().arrival_time != head_pax.arrival_time:
+                self._push_head(routes, paxs.peek().arrival_time)
+            for route_id in routes:
+                self._route_pax_count[route_id] -= 1
+            self._pax_count -= 1
             # the bus's boarding status will be set to 'boarding' in the bus's board method
             bus.board(head_pax)
-            paxs.remove(head_pax)
             bus.accumate_board_fraction()
 
-        # TODO 2. serve common-line groups, for now, there is only one exclusive group
-
-    def filter_pax_arrival_after_bus_arrival(self, bus: Bus, paxs: List[Pax]) -> List[Pax]:
-        filtered_paxs = [pax for pax in paxs if pax.arrival_time <
-                         bus.log.stop_arrival_time[self._stop_id]]
-        return filtered_paxs
-
     def get_total_pax_num(self) -> int:
         ''' Get the total number of paxs for all the routes
 
         Returns:
             The total number of paxs for all the routes
         '''
-        total_pax_sum = sum([len(self._route_group_paxs[group])
-                             for group in self._route_group_paxs.keys()])
-        return total_pax_sum
+        return self._pax_count
 
-    def check_remaining_pax_num(self, bus: Bus):
+    def check_remaining_pax_num(self, bus: Bus) -> int:
         '''Check if there are remaining paxs that can be served by the bus
 
         Args:
@@ -94,30 +184,35 @@ class PaxQueue:
         Returns:
             The number of remaining paxs that can be served by the bus
         '''
-        served_groups = self._get_served_groups(bus.route_id)
-        remaining_pax_num = 0
-        for group in served_groups:
-            paxs = self._route_group_paxs[group]
-            board_paxs = []
-            if self._board_truncation == 'arrival':
-                board_paxs = self.filter_pax_arrival_after_bus_arrival(
-                    bus, paxs)
-            else:
-                board_paxs = paxs
-            remaining_pax_num += len(board_paxs)
-        return remaining_pax_num
-
-    def _get_served_groups(self, bus_route_id: str) -> List[Tuple[str, ...]]:
-        '''Get all the served groups of paxs for a bus given its route id
+        if self._board_truncation == 'arrival':
+            # only the paxs who arrived before the bus arrived at the stop can board
+            bus_arrival_time = bus.log.stop_arrival_time[self._stop_id]
+            return sum(paxs.count_arrived_before(bus_arrival_time)
+                       for _, paxs in self._route_groups.get(bus.route_id, ()))
+        return self._route_pax_count.get(bus.route_id, 0)
 
-        Args:
-            bus_route_id: the route id of the bus
+    def _get_next_group(self, bus: Bus) -> Optional[Tuple[str, ...]]:
+        ''' Get the group whose head pax is the first to board the bus, None if no pax can board it.
 
-        Returns:
-            A list of tuple, where each tuple is a group of routes that the bus can serve
+        With 'arrival' truncation, only the paxs who arrived before the bus arrived at the stop can board.
         '''
-        served_groups = []
-        for route_group in self._route_group_paxs.keys():
-            if bus_route_id in route_group:
-                served_groups.append(route_group)
-        return served_groups
+        if self._route_pax_count.get(bus.route_id, 0) == 0:
+            return None
+        heads = self._route_heads[bus.route_id]
+        # skip the entries of groups that have emptied or changed their heads since the entries were pushed
+        while True:
+            arrival_time, _, routes = heads[0]
+            paxs = self._route_group_paxs[routes]
+            if paxs.count() > 0 and paxs.peek().arrival_time == arrival_time:
+                break
+            heapq.heappop(heads)
+        if self._board_truncation == 'arrival' and \
+                arrival_time >= bus.log.stop_arrival_time[self._stop_id]:
+            return None
+        return routes
+
+    def _push_head(self, routes: Tuple[str, ...], arrival_time: int) -> None:
+        order = self._route_group_order[routes]
+        for route_id in routes:
+            heapq.heappush(self._route_heads[route_id],
+                           (arrival_time, order, routes))
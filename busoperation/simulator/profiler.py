@@ -0,0 +1,113 @@
+from typing import Dict, List, Tuple, Callable, Any
+from functools import wraps
+import json
+import os
+import time
+
+
+class PhaseProfiler:
+    ''' Accumulate the wall time and the number of calls of each phase of a simulation.
+
+    The instrumented code reads the clock with `start` and closes a phase with `lap`, which returns the clock
+    for the next phase. Components hold an optional profiler and skip both calls when it is None,
+    so a disabled profiler costs one comparison per phase.
+
+    Phases may nest (e.g., 'agent.learn' runs inside 'agent.calculate_hold_time'), the time of a phase is inclusive.
+
+    Args:
+        timeline: whether to keep every phase interval for `write_trace`, besides the totals
+        max_timeline_events: the number of intervals kept at most, later intervals are only added to the totals
+
+    Methods:
+        start(self) -> float
+        lap(self, phase: str, start: float) -> float
+        wrap(self, phase: str, func: Callable) -> Callable
+        get_summary(self) -> Dict[str, Dict[str, float]]
+        format_summary(self) -> str
+        write_trace(self, path: str) -> None
+
+    '''
+    _phase_time: Dict[str, float]
+    _phase_calls: Dict[str, int]
+    _timeline: bool
+    _max_timeline_events: int
+    # (phase, start, end) of each interval, in seconds of the clock
+    _events: List[Tuple[str, float, float]]
+
+    def __init__(self, timeline: bool = False, max_timeline_events: int = 1_000_000) -> None:
+        self._phase_time = {}
+        self._phase_calls = {}
+        self._timeline = timeline
+        self._max_timeline_events = max_timeline_events
+        self._events = []
+        self._origin = time.perf_counter()
+
+    def start(self) -> float:
+        return time.perf_counter()
+
+    def lap(self, phase: str, start: float) -> float:
+        ''' Close a phase that began at `start`, and return the current clock.
+
+        '''
+        end = time.perf_counter()
+        if phase in self._phase_time:
+            self._phase_time[phase] += end - start
+            self._phase_calls[phase] += 1
+        else:
+            self._phase_time[phase] = end - start
+            self._phase_calls[phase] = 1
+        if self._timeline and len(self._events) < self._max_timeline_events:
+            self._events.append((phase, start, end))
+        return end
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        ''' Get a function that calls `func` and records it as a phase.
+
+        '''
+        @wraps(func)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.lap(phase, start)
+        return timed
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        ''' Get the totals of each phase, in the order of their first calls.
+
+        Returns:
+            phase_summary: {phase -> {'calls', 'total_time' (sec), 'mean_time' (sec)}}
+
+        '''
+        return {phase: {'calls': self._phase_calls[phase], 'total_time': total_time,
+                        'mean_time': total_time / self._phase_calls[phase]}
+                for phase, total_time in self._phase_time.items()}
+
+    def format_summary(self) -> str:
+        ''' Format the totals as a table, sorted by the total time.
+
+        The share is relative to the sum over the phases, which counts nested phases twice.
+
+        '''
+        summary = self.get_summary()
+        time_sum = sum(phase_summary['total_time']
+                       for phase_summary in summary.values()) or 1.0
+        lines = [f'{"phase":<28}{"calls":>10}{"total (s)":>12}{"mean (us)":>12}{"share":>8}']
+        for phase, phase_summary in sorted(summary.items(), key=lambda item: -item[1]['total_time']):
+            lines.append(f'{phase:<28}{phase_summary["calls"]:>10}{phase_summary["total_time"]:>12.3f}'
+                         f'{phase_summary["mean_time"] * 1e6:>12.1f}{phase_summary["total_time"] / time_sum:>8.1%}')
+        return '\n'.join(lines)
+
+    def write_trace(self, path: str) -> None:
+        ''' Write the kept intervals as a Chrome trace event file, which can be opened by Perfetto or chrome://tracing.
+
+        '''
+        assert self._timeline, 'the timeline is not kept, create the profiler with timeline=True'
+        pid = os.getpid()
+        trace_events = [{'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': pid, 'tid': 0,
+                         'ts': (start - self._origin) * 1e6, 'dur': (end - start) * 1e6}
+                        for phase, start, end in self._events]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace_events,
+                      'displayTimeUnit': 'ms'}, file)
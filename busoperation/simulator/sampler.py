@@ -0,0 +1,93 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+class BlockSampler:
+    ''' Draw truncated normal samples one by one from pre-generated blocks.
+
+    Calling a frozen scipy distribution for every single sample costs tens of microseconds,
+    so a whole block is drawn from a `numpy.random.Generator` at once and refilled when it is used up.
+    Samples out of [lower, upper] are clipped to the bounds rather than redrawn.
+
+    Methods:
+        sample(self) -> float
+
+    '''
+    _rng: np.random.Generator
+    _mean: float
+    _std: float
+    _lower: float
+    _upper: float
+    _block_size: int
+    _block: List[float]
+    _cursor: int
+
+    def __init__(self, rng: np.random.Generator, mean: float, std: float,
+                 lower: float = -np.inf, upper: float = np.inf, block_size: int = 1024) -> None:
+        self._rng = rng
+        self._mean = mean
+        self._std = std
+        self._lower = lower
+        self._upper = upper
+        self._block_size = block_size
+        self._block = []
+        self._cursor = 0
+
+    def sample(self) -> float:
+        if self._cursor == len(self._block):
+            self._refill()
+        value = self._block[self._cursor]
+        self._cursor += 1
+        return value
+
+    def _refill(self) -> None:
+        block = self._rng.normal(self._mean, self._std, self._block_size)
+        # a list of python floats is faster to index one by one than a numpy array
+        self._block = np.clip(block, self._lower, self._upper).tolist()
+        self._cursor = 0
+
+
+class RandomStreams:
+    ''' Independent random number streams for the components of one simulation.
+
+    Each component (e.g., a link or the boarding at a stop) gets its own stream spawned from a single seed,
+    so the samples of a component do not depend on how events of other components interleave.
+
+    If no seed is given, it is drawn from numpy's global random state,
+    so that seeding `np.random` keeps a whole run reproducible while episodes still differ.
+
+    The streams of components that are only created on demand get keyed generators instead,
+    which do not depend on the order of creation and do not shift the spawned streams.
+
+    Methods:
+        spawn_generator(self) -> np.random.Generator
+        create_keyed_generator(self, *key: int) -> np.random.Generator
+        create_normal_sampler(self, mean: float, std: float, lower: float, upper: float) -> BlockSampler
+
+    '''
+    _seed: int
+    _seed_sequence: np.random.SeedSequence
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        if seed is None:
+            seed = int(np.random.randint(0, 2**31 - 1))
+        self._seed = seed
+        self._seed_sequence = np.random.SeedSequence(seed)
+
+    def spawn_generator(self) -> np.random.Generator:
+        ''' Spawn a new independent generator, streams are spawned in a deterministic order for a given seed.
+
+        '''
+        child_sequence = self._seed_sequence.spawn(1)[0]
+        return np.random.default_rng(child_sequence)
+
+    def create_keyed_generator(self, *key: int) -> np.random.Generator:
+        ''' Create the generator identified by the key, the same for a given seed and key whenever it is created.
+
+        '''
+        return np.random.default_rng(np.random.SeedSequence([self._seed, *key]))
+
+    def create_normal_sampler(self, mean: float, std: float,
+                              lower: float = -np.inf, upper: float = np.inf) -> BlockSampler:
+        return BlockSampler(self.spawn_generator(), mean, std, lower, upper)
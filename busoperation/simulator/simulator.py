@@ -1,94 +1,39 @@
-from typing import List, Dict, Tuple
-from collections import defaultdict
+from typing import Dict, Tuple, Optional
 
 from agent.agent import Agent
 from setup.blueprint import Blueprint
-from simulator.virtual_bus import VirtualBus
+from setup.config_dataclass import TracerConfig
 
-from .holder import Holder
-from .bus import Bus
-from .pax_generation import PaxGenerator
-from .terminal import Terminal
-from .tracer import Tracer
+from .base_simulator import BaseSimulator
 from .snapshot import Snapshot
-from .mediator import Mediator
-from .builder import Builder
-from .link import Link
-from .stop import Stop
+from .profiler import PhaseProfiler
 
 
-class Simulator:
-    ''' The simulator that simulates the operation of a bus system.
+class Simulator(BaseSimulator):
+    ''' The simulator that moves all the components of a bus system forward every second.
 
-    Attributes:
-        total_buses: all the buses that have been dispatched from terminals
+    The agent can be consulted at every second by `step`, or only at decision epochs by `step_to_decision`,
+    which moves forward without taking snapshots until some buses wait for holding actions.
 
     Methods:
         step(self, t: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Snapshot
-        take_snapshot(self, t: int) -> Snapshot
-        get_metrics(self) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]
-        get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]
+        step_to_decision(self, episode_duration: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]
 
     '''
-    _agent: Agent
-    _blueprint: Blueprint
-    _builder: Builder
-    _virtual_bus: VirtualBus
-    _pax_generator: PaxGenerator
-    _terminals: Dict[str, Terminal]
-    _links: Dict[str, Link]
-    _stops: Dict[str, Stop]
-    _holder: Holder
-    _mediator: Mediator
-    _tracer: Tracer
-    _total_buses: List[Bus]
-
-    def __init__(self, blueprint: Blueprint, agent: Agent) -> None:
-        self._agent = agent
-        self._blueprint = blueprint
-        # A builder is used to create all the components in the simulation with the help of a blueprint
-        self._builder = Builder(blueprint)
-
-        # A virtual bus is used to specify the `initial` condition of the dynamics
-        # if the agent has created a virtual bus (by repeatedly running the simulation and taking the convergent holding time), use it
-        # otherwise, create a virtual bus with perfect schedule (without repeated simulation)
-        if hasattr(agent, 'virtual_bus'):
-            self._virtual_bus = agent.virtual_bus
-        else:
-            self._virtual_bus = self._builder.create_virtual_bus(self._agent)
-        # # A pax generator is used to generate passengers at stops
-        self._pax_generator = self._builder.create_pax_generator(
-            self._virtual_bus)
-        # Terminals that dispatch and recycle buses
-        self._terminals = self._builder.create_terminals(self._virtual_bus)
-        # Links that buses run on
-        self._links = self._builder.create_links()
-        # Stops that buses stop at to pick up and drop off passengers
-        self._stops = self._builder.create_stops(self._virtual_bus)
-        # Holder that holds buses after they finish their operation at a stop
-        self._holder: Holder = Holder(self._agent, self._virtual_bus)
-        # A mediator is used to transfer buses between components
-        self._mediator: Mediator = Mediator(
-            blueprint, self._terminals, self._links, self._stops, self._holder)
-
-        # A tracer is used to record the status of the simulation
-        self._tracer: Tracer = Tracer()
-        # Maintain a list of all the buses that have been dispatched from terminals
-        # used for time-space diagram visualization in the end
-        self._total_buses: List[Bus] = []
-
-        # self._network.visualize()
-
-    @property
-    def total_buses(self) -> List[Bus]:
-        ''' Get all the buses that have been dispatched from terminals.
+    # the next second to move forward by `step_to_decision`
+    _next_t: int
 
-        '''
-        return self._total_buses
+    def __init__(self, blueprint: Blueprint, agent: Agent, seed: Optional[int] = None,
+                 tracer_config: TracerConfig = TracerConfig(), profiler: Optional[PhaseProfiler] = None) -> None:
+        super().__init__(blueprint, agent, seed, tracer_config, profiler)
+        self._next_t = 0
 
     def step(self, t: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Snapshot:
         '''Accept holding actions and move buses one step forward
 
+        The phases are timed if the simulator has a profiler: 'dispatch', 'pax_generation', 'link_forward',
+        'stop_operation', 'holder_operation' and 'snapshot', with 'mediator_transfer' nested in them.
+
         Args:
             t: current time
             stop_bus_hold_times: {(stop_id, route_id, bus_id): specified holding time}
@@ -96,86 +41,98 @@ class Simulator:
         Returns:
             Snapshot: a snapshot of current time t
         '''
+        self._advance(t, stop_bus_hold_times)
+        profiler = self._profiler
+        if profiler is not None:
+            clock = profiler.start()
+        snapshot = self.take_snapshot(t)
+        if profiler is not None:
+            profiler.lap('snapshot', clock)
+        return snapshot
+
+    def step_to_decision(self, episode_duration: int,
+                         stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> Optional[Snapshot]:
+        ''' Accept holding actions and move forward second by second until the next decision epoch.
+
+        The seconds without buses waiting for holding actions take no snapshots, and are the same as
+        `step` with an agent that returns no actions for them.
+
+        Args:
+            episode_duration: the number of seconds of the episode
+            stop_bus_hold_times: {(stop_id, route_id, bus_id): specified holding time},
+                the actions for the buses in the last returned snapshot
+
+        Returns:
+            Snapshot: a snapshot at the next second when some buses wait for holding actions,
+                or None if the episode is finished (a final snapshot is still taken for the metrics)
+        '''
+        profiler = self._profiler
+        while self._next_t < episode_duration:
+            t = self._next_t
+            self._next_t += 1
+            self._advance(t, stop_bus_hold_times)
+            stop_bus_hold_times = {}
+            if self._holder.has_unheld_buses:
+                if profiler is not None:
+                    clock = profiler.start()
+                snapshot = self.take_snapshot(t)
+                if profiler is not None:
+                    profiler.lap('snapshot', clock)
+                return snapshot
+
+        self.take_snapshot(episode_duration - 1)
+        return None
+
+    def _advance(self, t: int, stop_bus_hold_times: Dict[Tuple[str, str, str], float]) -> None:
+        ''' Apply holding actions and move buses one step forward, without taking a snapshot.
+
+        '''
+        profiler = self._profiler
+        if profiler is not None:
+            clock = profiler.start()
 
         # 0. dispatch buses from terminal to their first links
         for terminal_id, terminal in self._terminals.items():
             dispatching_buses = terminal.dispatch(t)
-            self._mediator.transfer(
-                dispatching_buses, 'terminal', terminal_id, t)
             # record all the dispatched buses for future visualization
             for bus in dispatching_buses:
+                # the dense index of a bus is its order of dispatching
+                bus.index = len(self._total_buses)
                 self._total_buses.append(bus)
+                self._trajectory_recorder.register_bus(bus)
+            self._mediator.transfer(
+                dispatching_buses, 'terminal', terminal_id, t)
+        if profiler is not None:
+            clock = profiler.lap('dispatch', clock)
 
         # 1. passengers arrive at stops
         stop_paxs = self._pax_generator.generate(t)
         for stop_id, paxs in stop_paxs.items():
             self._stops[stop_id].pax_arrive(paxs)
+        if profiler is not None:
+            clock = profiler.lap('pax_generation', clock)
 
         # 2. link operation
         for link_id, link in self._links.items():
             leaving_link_buses = link.forward(t)
             self._mediator.transfer(leaving_link_buses, 'link', link_id, t)
+        if profiler is not None:
+            clock = profiler.lap('link_forward', clock)
 
         # 3. stop operation
         for stop_id, stop in self._stops.items():
             leaving_stop_buses = stop.operation(t)
             self._mediator.transfer(leaving_stop_buses, 'stop', stop_id, t)
+        if profiler is not None:
+            clock = profiler.lap('stop_operation', clock)
 
         # 4. holding operation
-        self._holder.set_hold_action(stop_bus_hold_times)
+        # the actions are for the buses in the last snapshot, and their holdings count down from t
+        self._holder.set_hold_action(stop_bus_hold_times, t)
         stop_held_buses = self._holder.operation(t)
 
         # transfer buses that finish holding to the next link
         for stop_id, held_buses in stop_held_buses.items():
             self._mediator.transfer(held_buses, 'holder', stop_id, t)
-
-        snapshot = self.take_snapshot(t)
-        return snapshot
-
-    def take_snapshot(self, t: int) -> Snapshot:
-        ''' Take a snapshot of the whole current state of the simulation.
-
-        '''
-        snapshot = self._tracer.take_snapshot(
-            t, self._links, self._stops, self._holder)
-        return snapshot
-
-    def get_metrics(self) -> Tuple[Dict[str, float], Dict[str, Dict[int, int]]]:
-        ''' Get the metrics of the simulation.
-
-        Generally called after one episode of simulation finished.
-
-        Returns:
-            metrics: a dictionary of metrics
-            route_dispatch_time_trip_time: a dictionary {route_id -> {dispatch_time -> trip_time}}
-                dispatch_time is the time when the bus is dispatched from the terminal
-                trip_time is the duration of the trip from the terminal to the ending terminal
-
-        '''
-        # stats all the stops except the last stop
-        route_stats_stop_ids: Dict[str, List[str]] = defaultdict(list)
-        for route_id, route in self._blueprint.route_info.route_infos.items():
-            route_stats_stop_ids[route_id].extend(route.visit_seq_stops[:-1])
-        metrics = self._tracer.get_metric(route_stats_stop_ids)
-
-        # stats the trip time
-        route_dispatch_time_trip_time: Dict[str, Dict[int, int]] = {}
-        for route_id, route in self._blueprint.route_info.route_infos.items():
-            dispatch_time_trip_time = {}
-            for bus in self._total_buses:
-                if bus.route_id == route_id:
-                    if bus.log.end_time is not None:
-                        assert bus.log.dispatch_time is not None
-                        trip_time = bus.log.end_time - bus.log.dispatch_time
-                        dispatch_time_trip_time[bus.log.dispatch_time] = trip_time
-            route_dispatch_time_trip_time[route_id] = dispatch_time_trip_time
-        return metrics, route_dispatch_time_trip_time
-
-    def get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]:
-        ''' Get the average holding time at each stop for each route.
-
-        Generally called after one episode of simulation finished.
-
-        '''
-        route_stop_average_hold_time = self._tracer.get_stop_average_hold_time()
-        return route_stop_average_hold_time
+        if profiler is not None:
+            profiler.lap('holder_operation', clock)
@@ -1,7 +1,12 @@
 from dataclasses import dataclass, field
-from typing import List, Literal, Dict, Tuple
+from typing import List, Literal, Dict, Tuple, Optional, Callable, Mapping, Iterator, TypeVar, Generic
 from collections import defaultdict
 
+import numpy as np
+
+
+K = TypeVar('K')
+V = TypeVar('V')
 
 @dataclass(frozen=True)
 class BusSnapshot:
@@ -100,10 +105,104 @@ class HolderSnapshot:
     route_stop_bus_epsilon_departure: Dict[str, Dict[str, Dict[str, float]]]
 
 
+@dataclass
+class BatchHolderSnapshot:
+    ''' The buses waiting for holding actions in all the replications of a `BatchSimulator` at a certain time.
+
+    Each waiting bus is an element of the arrays, ordered by replication and then by the order of entering the holder.
+    The schedule deviations are those at the stop where the bus is held, and the `last` ones are
+    of the bus that arrived (or became ready to depart) right before it at that stop.
+
+    Attributes:
+        t: the current time.
+        replications: the replication index of each bus.
+        bus_indices: the index of each bus in its replication, i.e., the order of dispatching.
+        route_stop_indices: the route-stop index of each bus, see `route_stop_ids`.
+        route_stop_ids: (route_id, stop_id) of each route-stop index.
+        epsilon_arrival: the schedule deviation when arrival of each bus.
+        epsilon_rtd: the schedule deviation when ready-to-departure of each bus.
+        last_epsilon_arrival: the schedule deviation when arrival of the last bus.
+        last_epsilon_rtd: the schedule deviation when ready-to-departure of the last bus.
+        hold_times: the holding times recorded by the agent, in the same order as the buses.
+
+    '''
+    t: int
+    replications: np.ndarray
+    bus_indices: np.ndarray
+    route_stop_indices: np.ndarray
+    route_stop_ids: List[Tuple[str, str]]
+    epsilon_arrival: np.ndarray
+    epsilon_rtd: np.ndarray
+    last_epsilon_arrival: np.ndarray
+    last_epsilon_rtd: np.ndarray
+    hold_times: Optional[np.ndarray] = None
+
+    @property
+    def bus_num(self) -> int:
+        return len(self.replications)
+
+    def record_holding_time(self, hold_times: np.ndarray) -> None:
+        self.hold_times = hold_times
+
+
+class SnapshotView(Mapping[K, V], Generic[K, V]):
+    ''' A read-only mapping whose values are built from the live components on the first access of each key.
+
+    The keys are only listed when the view is iterated. A view is only valid until the simulation moves on,
+    after `seal` the built values can still be read, but building a new value (or listing the keys) raises an error.
+
+    Args:
+        t: the time of the snapshot, for the error message
+        build: build the value of a key, None if the key does not exist
+        list_keys: list all the keys, in the order of iterating the view
+
+    '''
+
+    def __init__(self, t: int, build: Callable[[K], Optional[V]], list_keys: Callable[[], List[K]]) -> None:
+        self._t = t
+        self._build = build
+        self._list_keys = list_keys
+        self._values: Dict[K, V] = {}
+        self._keys: Optional[List[K]] = None
+        self._sealed = False
+
+    def __getitem__(self, key: K) -> V:
+        value = self._values.get(key)
+        if value is None:
+            self._check_sealed()
+            value = self._build(key)
+            if value is None:
+                raise KeyError(key)
+            self._values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator[K]:
+        if self._keys is None:
+            self._check_sealed()
+            self._keys = self._list_keys()
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def seal(self) -> None:
+        self._sealed = True
+
+    def _check_sealed(self) -> None:
+        if self._sealed:
+            raise RuntimeError(
+                f'the snapshot at t={self._t} was sealed before its bus and stop snapshots were accessed')
+
+
 @dataclass
 class Snapshot:
     ''' The snapshot of the whole system at a certain time.
 
+    The bus and stop snapshots are either given as dictionaries, or as `SnapshotView`s of the live components
+    that build the snapshot of a bus or a stop on its first access. A view is only valid until the simulation
+    moves on, so the tracer seals it when the next snapshot is taken, and accessing the bus or stop snapshots
+    of a sealed view that were never built raises an error.
+
     Attributes:
         t: the current time.
         bus_snapshots: the snapshot of all buses.
@@ -112,12 +211,28 @@ class Snapshot:
 
     '''
     t: int
-    bus_snapshots: Dict[Tuple[str, str], BusSnapshot]
-    stop_snapshots: Dict[str, StopSnapshot]
+    _bus_snapshots: Mapping[Tuple[str, str], BusSnapshot]
+    _stop_snapshots: Mapping[str, StopSnapshot]
     holder_snapshot: HolderSnapshot
     action_record: Dict[Tuple[str, str, str],
                         float] = field(default_factory=lambda: {})
 
+    @property
+    def bus_snapshots(self) -> Mapping[Tuple[str, str], BusSnapshot]:
+        return self._bus_snapshots
+
+    @property
+    def stop_snapshots(self) -> Mapping[str, StopSnapshot]:
+        return self._stop_snapshots
+
+    def seal(self) -> None:
+        ''' Stop viewing the live components, called when the simulation moves on.
+
+        '''
+        for snapshots in (self._bus_snapshots, self._stop_snapshots):
+            if isinstance(snapshots, SnapshotView):
+                snapshots.seal()
+
     def get_holder_epsilon(self, node_id: str, route_id: str, bus_id: str) -> float:
         ''' Get the schedule deviation when departure for the bus at the holder (of the `node_id`) on the `route_id`
 
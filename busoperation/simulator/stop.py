@@ -94,6 +94,16 @@ class Stop(ABC):
     def _leave(self, t: int) -> List[Bus]:
         ...
 
+    # the next time that the operation may change the stop's state, used by the event-driven simulation
+    @abstractmethod
+    def next_operation_time(self, t: int) -> Optional[int]:
+        ...
+
+    # replay the skipped steps in which the operation does not change the stop's state
+    @abstractmethod
+    def catch_up(self, skipped_steps: int) -> None:
+        ...
+
     # move buses one step (delta t) forward
     def operation(self, t: int):
         for bus in self.get_total_buses():
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict
 from abc import ABC, abstractmethod
 
 from agent.agent import Agent
@@ -40,9 +40,9 @@ class Stop(ABC):
         self._leave_queue = []
 
         # track the remaining time of bus deceleration when entering the berth
-        self._bus_deceleration_remain_time: Dict[Tuple[str, str], float] = {}
+        self._bus_deceleration_remain_time: Dict[int, float] = {}
         # track the remaining time of acceleration time leaving the stop
-        self._bus_acceleration_remain_time: Dict[Tuple[str, str], float] = {}
+        self._bus_acceleration_remain_time: Dict[int, float] = {}
 
         self.log = StopLog(self._stop_id, agent.virtual_bus)
 
@@ -73,7 +73,7 @@ class Stop(ABC):
         bus.update_location(t, 'stop', self._stop_id, self._stop_id, 0)
 
         # initialize the remaining time of bus deceleration and door opening time when entering the berth
-        self._bus_deceleration_remain_time[(bus.route_id, bus.bus_id)] = 0
+        self._bus_deceleration_remain_time[bus.index] = 0
         bus.set_status('decelerating')
 
     @abstractmethod
@@ -144,8 +144,7 @@ class BoardingStop(Stop):
     def _arriving(self, t: int) -> None:
         entering_buses: List[Bus] = []
         for bus in self._arrive_queue:
-            remain_time = self._bus_deceleration_remain_time[(
-                bus.route_id, bus.bus_id)]
+            remain_time = self._bus_deceleration_remain_time[bus.index]
             if remain_time == 0:
                 entering_buses.append(bus)
                 self._arrive_queue.remove(bus)
@@ -160,8 +159,7 @@ class BoardingStop(Stop):
                 self.log.record_when_bus_arrival(
                     bus.route_id, bus.bus_id, t, epsilon_arrival)
             else:
-                self._bus_deceleration_remain_time[(
-                    bus.route_id, bus.bus_id)] -= 1
+                self._bus_deceleration_remain_time[bus.index] -= 1
                 bus.set_status('decelerating')
 
         for enter_bus in entering_buses:
@@ -195,16 +193,14 @@ class BoardingStop(Stop):
                 bus_in_berth)
             if remaining_pax_num == 0:
                 # initialize the remaining time of door closing time and bus acceleration time leaving the stop
-                self._bus_acceleration_remain_time[(
-                    bus_in_berth.route_id, bus_in_berth.bus_id)] = 0
+                self._bus_acceleration_remain_time[bus_in_berth.index] = 0
                 self._buses_in_berth[berth_idx] = None
                 self._leave_queue.append(bus_in_berth)
 
     def _leave(self, t: int) -> List[Bus]:
         leaving_buses: List[Bus] = []
         for bus in self._leave_queue:
-            remain_time = self._bus_acceleration_remain_time[(
-                bus.route_id, bus.bus_id)]
+            remain_time = self._bus_acceleration_remain_time[bus.index]
             # the bus left the stop after acceleration
             if remain_time == 0:
                 rtd_idx_count = len(
@@ -218,8 +214,7 @@ class BoardingStop(Stop):
                 self._leave_queue.remove(bus)
             else:
                 bus.set_status('accelerating')
-                self._bus_acceleration_remain_time[(
-                    bus.route_id, bus.bus_id)] -= 1
+                self._bus_acceleration_remain_time[bus.index] -= 1
         return leaving_buses
 
     def _get_target_berth(self) -> int:
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from agent.agent import Agent
 from setup.config_dataclass import StopNodeGeometry, StopNodeOperation
@@ -74,9 +74,49 @@ class BoardingStop(Stop):
             self.log.record_when_bus_rtd(
                 bus.route_id, bus.bus_id, t, epsilon_rtd)
             leaving_buses.append(bus)
+            # removing while iterating skips the bus right behind, which departs in the next step;
+            # agents rely on consecutive buses of a stop not being ready to depart at the same time
             self._leave_queue.remove(bus)
         return leaving_buses
 
+    def next_operation_time(self, t: int) -> Optional[int]:
+        ''' Get the next time that the operation may change the stop's state, given that it operated at time t.
+
+        The state only changes when a bus enters the berth, an idle bus starts boarding (or leaves),
+        a boarding bus finishes its current pax, or a bus is still in the leave queue.
+        In between, buses in berth only accumulate board fractions.
+
+        Returns:
+            the next operation time, or None if there is no bus in the berths
+        '''
+        if len(self._leave_queue) > 0:
+            return t + 1
+        if len(self._entry_queue) > 0 and self._get_target_berth() >= 0:
+            return t + 1
+        board_steps = []
+        for bus_in_berth in self._buses_in_berth:
+            if bus_in_berth is None:
+                continue
+            if bus_in_berth.board_status == 'idle':
+                return t + 1
+            board_steps.append(bus_in_berth.count_board_steps())
+        if len(board_steps) == 0:
+            return None
+        return t + min(board_steps)
+
+    def catch_up(self, skipped_steps: int) -> None:
+        ''' Replay the skipped steps, in which every bus in berth is in the middle of boarding a pax.
+
+        Args:
+            skipped_steps: the number of steps skipped since the last operation
+        '''
+        for _ in range(skipped_steps):
+            for bus_in_berth in self._buses_in_berth:
+                if bus_in_berth is None:
+                    continue
+                bus_in_berth.accumate_board_fraction()
+                bus_in_berth.log.record_when_dwell(self._stop_id)
+
     def _get_target_berth(self) -> int:
         target_berth = -1  # negative means no berth is available
         for b in range(len(self._buses_in_berth) - 1, -1, -1):
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from agent.agent import Agent
 from setup.route import Route
@@ -70,5 +70,22 @@ class Terminal:
 
         return dispatching_buses
 
+    def next_dispatch_time(self, t: int) -> Optional[int]:
+        """Get the next time after t that this terminal dispatches buses.
+
+        Args:
+            t: current time
+
+        Returns:
+            Optional[int]: the next dispatching time, or None if no route starts from this terminal
+        """
+        dispatch_times = []
+        for route in self._routes:
+            schedule_headway = int(route.schedule_headway)
+            dispatch_times.append((t // schedule_headway + 1) * schedule_headway)
+        if len(dispatch_times) == 0:
+            return None
+        return min(dispatch_times)
+
     def recycle(self, bus: Bus) -> None:
         bus.set_status('finished')
@@ -1,53 +1,175 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Optional, Deque, Union, Callable
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+
+from setup.config_dataclass import TracerConfig
 
 from .stop import Stop
 from .link import Link
 from .holder import Holder
-from .snapshot import Snapshot, StopSnapshot, BusSnapshot
-from .utils import calculate_headway_std, calculate_mean_abs_epsilon
+from .bus import Bus
+from .snapshot import Snapshot, SnapshotView, StopSnapshot, BusSnapshot
+from .log import ActionLog
 
 
 class Tracer:
-    def __init__(self) -> None:
-        self._snapshots: List[Snapshot] = []
+    ''' Take and keep the snapshots of the simulation, and compute metrics from them.
+
+    Metrics are read from the online statistics of the logs, and the actions recorded on each snapshot
+    are moved to a compact `ActionLog` when the next snapshot is taken, so older snapshots are only kept
+    for inspection, according to the retention policy of the config:
+        latest: keep only the latest snapshot
+        ring: keep the last `retention_size` snapshots
+        sample: keep one snapshot every `retention_size` steps (and the latest one)
+        full: keep all the snapshots
+
+    In the 'copy' snapshot mode, the snapshots of all buses and stops are collected at every step.
+    In the 'view' snapshot mode, only the holder snapshot is taken at once, and the snapshot of each bus and stop
+    is built when it is first accessed before the next step (e.g., by agents at decision epochs),
+    so older snapshots kept in this mode only have the bus and stop snapshots that were accessed in time.
+    An engine that does not keep every component up to date (i.e., the event-driven engine) passes
+    `prepare_bus` and `prepare_stop`, which bring a bus or a stop up to the time of the snapshot before it is read.
+
+    Methods:
+        take_snapshot(self, t: int, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder,
+                      prepare_bus: Optional[Callable[[Bus], None]] = None,
+                      prepare_stop: Optional[Callable[[str], None]] = None) -> Snapshot
+        get_snapshots(self) -> List[Snapshot]
+        get_metric(self, route_stop_ids: Dict[str, List[str]], stops: Dict[str, Stop], holder: Holder) -> Dict[str, float]
+        get_stop_average_hold_time(self) -> Dict[str, Dict[str, float]]
+
+    '''
+    _config: TracerConfig
+    _snapshots: Union[List[Snapshot], Deque[Snapshot]]
+    _latest_snapshot: Optional[Snapshot]
+    _snapshot_count: int
+    _action_log: ActionLog
+
+    def __init__(self, config: TracerConfig = TracerConfig()) -> None:
+        assert config.retention_size >= 1
+        self._config = config
+        if config.snapshot_retention == 'latest':
+            self._snapshots = deque(maxlen=1)
+        elif config.snapshot_retention == 'ring':
+            self._snapshots = deque(maxlen=config.retention_size)
+        else:
+            assert config.snapshot_retention in ('sample', 'full')
+            self._snapshots = []
+        self._latest_snapshot = None
+        self._snapshot_count = 0
+        # actions (and events for online statistics) before the warm-up time are not counted in metrics
+        self._warm_up_time = 0
+        self._action_log = ActionLog(self._warm_up_time)
+
+    def take_snapshot(self, t: int, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder,
+                      prepare_bus: Optional[Callable[[Bus], None]] = None,
+                      prepare_stop: Optional[Callable[[str], None]] = None) -> Snapshot:
+        if self._latest_snapshot is not None:
+            # the agent has acted on the latest snapshot by now
+            self._latest_snapshot.seal()
+            self._action_log.record(
+                self._latest_snapshot.t, self._latest_snapshot.action_record)
 
-    def take_snapshot(self, t: int, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder) -> Snapshot:
-        bus_snapshots: Dict[Tuple[str, str], BusSnapshot] = {}
-        stop_snapshots: Dict[str, StopSnapshot] = {}
+        holder_snapshot = holder.take_snapshot()
+        if self._config.snapshot_mode == 'copy':
+            bus_snapshots, stop_snapshots = self._collect(
+                links, stops, holder, prepare_bus, prepare_stop)
+            snapshot = Snapshot(t, bus_snapshots,
+                                stop_snapshots, holder_snapshot)
+        else:
+            assert self._config.snapshot_mode == 'view'
+            snapshot = Snapshot(t, self._view_buses(t, links, stops, holder, prepare_bus),
+                                self._view_stops(t, stops, prepare_stop), holder_snapshot)
+
+        if self._config.snapshot_retention != 'sample' or self._snapshot_count % self._config.retention_size == 0:
+            self._snapshots.append(snapshot)
+        self._latest_snapshot = snapshot
+        self._snapshot_count += 1
+        return snapshot
 
-        # links
-        for link in links.values():
-            for bus in link.buses:
-                bus_snapshot = bus.take_snapshot()
-                bus_snapshots[(bus.route_id, bus.bus_id)] = bus_snapshot
+    def get_snapshots(self) -> List[Snapshot]:
+        ''' Get the retained snapshots in time order, always ending with the latest one.
 
-        # stops
+        '''
+        snapshots = list(self._snapshots)
+        if self._latest_snapshot is not None and (len(snapshots) == 0 or snapshots[-1] is not self._latest_snapshot):
+            snapshots.append(self._latest_snapshot)
+        return snapshots
+
+    def _collect(self, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder,
+                 prepare_bus: Optional[Callable[[Bus], None]],
+                 prepare_stop: Optional[Callable[[str], None]]) -> Tuple[Dict[Tuple[str, str], BusSnapshot], Dict[str, StopSnapshot]]:
+        stop_snapshots: Dict[str, StopSnapshot] = {}
         for stop_id, stop in stops.items():
+            if prepare_stop is not None:
+                prepare_stop(stop_id)
             stop_snapshots[stop_id] = stop.take_snapshot()
 
-            for bus in stop.get_total_buses():
-                bus_snapshot = bus.take_snapshot()
-                bus_snapshots[(bus.route_id, bus.bus_id)] = bus_snapshot
+        bus_snapshots: Dict[Tuple[str, str], BusSnapshot] = {}
+        for identifier, bus in self._list_buses(links, stops, holder).items():
+            if prepare_bus is not None:
+                prepare_bus(bus)
+            bus_snapshots[identifier] = bus.take_snapshot()
+        return bus_snapshots, stop_snapshots
+
+    def _view_buses(self, t: int, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder,
+                    prepare_bus: Optional[Callable[[Bus], None]]) -> SnapshotView[Tuple[str, str], BusSnapshot]:
+        # the running buses are listed once, on the first access
+        identifier_bus: Dict[Tuple[str, str], Bus] = {}
+
+        def list_keys() -> List[Tuple[str, str]]:
+            if len(identifier_bus) == 0:
+                identifier_bus.update(self._list_buses(links, stops, holder))
+            return list(identifier_bus)
+
+        def build(identifier: Tuple[str, str]) -> Optional[BusSnapshot]:
+            list_keys()
+            bus = identifier_bus.get(identifier)
+            if bus is None:
+                return None
+            if prepare_bus is not None:
+                prepare_bus(bus)
+            return bus.take_snapshot()
+
+        return SnapshotView(t, build, list_keys)
+
+    def _view_stops(self, t: int, stops: Dict[str, Stop],
+                    prepare_stop: Optional[Callable[[str], None]]) -> SnapshotView[str, StopSnapshot]:
+        def build(stop_id: str) -> Optional[StopSnapshot]:
+            stop = stops.get(stop_id)
+            if stop is None:
+                return None
+            if prepare_stop is not None:
+                prepare_stop(stop_id)
+            return stop.take_snapshot()
+
+        return SnapshotView(t, build, lambda: list(stops))
+
+    def _list_buses(self, links: Dict[str, Link], stops: Dict[str, Stop], holder: Holder) -> Dict[Tuple[str, str], Bus]:
+        ''' List the running buses on the links, at the stops and in the holder, in this order.
 
-        # holder
-        for (stop_id, route_id, bus_id), bus in holder.stop_identifier_bus.items():
-            bus_snapshot = bus.take_snapshot()
-            bus_snapshots[(bus.route_id, bus.bus_id)] = bus_snapshot
+        '''
+        identifier_bus: Dict[Tuple[str, str], Bus] = {}
+        for link in links.values():
+            for bus in link.buses:
+                identifier_bus[(bus.route_id, bus.bus_id)] = bus
+        for stop in stops.values():
+            for bus in stop.get_total_buses():
+                identifier_bus[(bus.route_id, bus.bus_id)] = bus
+        for bus in holder.buses:
+            identifier_bus[(bus.route_id, bus.bus_id)] = bus
+        return identifier_bus
 
-        holder_snapshot = holder.take_snapshot()
-        snapshot = Snapshot(t, bus_snapshots, stop_snapshots, holder_snapshot)
+    def get_metric(self, route_stop_ids: Dict[str, List[str]], stops: Dict[str, Stop], holder: Holder) -> Dict[str, float]:
+        ''' Get the metrics of given stops for each route
 
-        self._snapshots.append(snapshot)
-        return snapshot
+        The metrics are read from the online statistics of the stop logs, the holder log and the action log,
+        so they can be read at any time of the episode.
 
-    def get_metric(self, route_stop_ids: Dict[str, List[str]]):
-        ''' Get the metrics of given stops for each route
         '''
-        warm_up_time = 0
-        last_snapshot = self._snapshots[-1]
         metrics = {}
+        route_stop_hold_time_sum_count = self._get_hold_time_sum_count(
+            after_warm_up=True)
 
         for route_id, stop_ids in route_stop_ids.items():
             arrival_stds = []
@@ -56,40 +178,27 @@ class Tracer:
             epsilon_arrival_mean_abs = []
             epsilon_rtd_mean_abs = []
             epsilon_departure_mean_abs = []
+            hold_time_sum, hold_time_count = 0.0, 0
 
             for stop_id in stop_ids:
-                arrival_time_seq = last_snapshot.stop_snapshots[stop_id].route_arrival_time_seq[route_id]
-                arrival_std = calculate_headway_std(
-                    arrival_time_seq, warm_up_time)
-                arrival_stds.append(arrival_std)
-
-                rtd_time_seq = last_snapshot.stop_snapshots[stop_id].route_rtd_time_seq[route_id]
-                rtd_std = calculate_headway_std(rtd_time_seq, warm_up_time)
-                rtd_stds.append(rtd_std)
-
-                departure_time_seq = last_snapshot.holder_snapshot.route_stop_departure_time_seq[
-                    route_id][stop_id]
-                departure_std = calculate_headway_std(
-                    departure_time_seq, warm_up_time)
-                departure_stds.append(departure_std)
-
-                bus_epsilon_arrival = last_snapshot.stop_snapshots[
-                    stop_id].route_bus_epsilon_arrival[route_id]
-                mean_abs_epsilon_arrival = calculate_mean_abs_epsilon(
-                    list(bus_epsilon_arrival.values()))
-                epsilon_arrival_mean_abs.append(mean_abs_epsilon_arrival)
-
-                bus_epsilon_rtd = last_snapshot.stop_snapshots[
-                    stop_id].route_bus_epsilon_rtd[route_id]
-                mean_abs_epsilon_rtd = calculate_mean_abs_epsilon(
-                    list(bus_epsilon_rtd.values()))
-                epsilon_rtd_mean_abs.append(mean_abs_epsilon_rtd)
-
-                bus_epsilon_departure = last_snapshot.holder_snapshot.route_stop_bus_epsilon_departure[
-                    route_id][stop_id]
-                mean_abs_epsilon_departure = calculate_mean_abs_epsilon(list(
-                    bus_epsilon_departure.values()))
-                epsilon_departure_mean_abs.append(mean_abs_epsilon_departure)
+                stop_log = stops[stop_id].log
+                arrival_stds.append(
+                    stop_log.route_arrival_headway[route_id].std)
+                rtd_stds.append(stop_log.route_rtd_headway[route_id].std)
+                departure_stds.append(
+                    holder.log.route_stop_departure_headway[route_id][stop_id].std)
+
+                epsilon_arrival_mean_abs.append(
+                    stop_log.route_abs_epsilon_arrival[route_id].mean)
+                epsilon_rtd_mean_abs.append(
+                    stop_log.route_abs_epsilon_rtd[route_id].mean)
+                epsilon_departure_mean_abs.append(
+                    holder.log.route_stop_abs_epsilon_departure[route_id][stop_id].mean)
+
+                stop_hold_time_sum, stop_hold_time_count = route_stop_hold_time_sum_count.get(
+                    (route_id, stop_id), (0.0, 0))
+                hold_time_sum += stop_hold_time_sum
+                hold_time_count += stop_hold_time_count
 
             metrics[f'route-{route_id}\'s arrival headway std'] = np.mean(
                 arrival_stds)
@@ -102,19 +211,10 @@ class Tracer:
                 epsilon_rtd_mean_abs)
             metrics[f'route-{route_id}\'s departure epsilon'] = np.mean(
                 epsilon_departure_mean_abs)
-
-        # get route holding times
-        route_all_stop_hold_times: Dict[str, List[float]] = defaultdict(list)
-        counted_snapshots = [
-            snapshot for snapshot in self._snapshots if snapshot.t > warm_up_time]
-        for snapshot in counted_snapshots:
-            for (stop_id, route_id, bus_id), holding_time in snapshot.action_record.items():
-                if stop_id in route_stop_ids[route_id]:
-                    route_all_stop_hold_times[route_id].append(holding_time)
-
-        for route_id, hold_times in route_all_stop_hold_times.items():
-            hold_times = np.array(hold_times)
-            metrics[f'route-{route_id}\'s holding time'] = np.mean(hold_times)
+            # get route holding times
+            if hold_time_count > 0:
+                metrics[f'route-{route_id}\'s holding time'] = hold_time_sum / \
+                    hold_time_count
 
         return metrics
 
@@ -125,16 +225,35 @@ class Tracer:
             route_stop_hold_time: a dictionary {route_id -> {stop_id -> average_hold_time}}
 
         '''
-        route_stop_hold_times: Dict[Tuple[str, str], List] = defaultdict(list)
-        for snapshot in self._snapshots:
-            for (stop_id, route_id, bus_id), holding_time in snapshot.action_record.items():
-                route_stop_hold_times[(route_id, stop_id)].append(holding_time)
-
         route_stop_hold_time = defaultdict(dict)
-        for (route_id, stop_id), holding_times in route_stop_hold_times.items():
-            route_stop_hold_time[route_id][stop_id] = np.mean(holding_times)
+        for (route_id, stop_id), (hold_time_sum, hold_time_count) in self._get_hold_time_sum_count(
+                after_warm_up=False).items():
+            route_stop_hold_time[route_id][stop_id] = hold_time_sum / \
+                hold_time_count
         return dict(route_stop_hold_time)
 
+    def _get_hold_time_sum_count(self, after_warm_up: bool) -> Dict[Tuple[str, str], Tuple[float, int]]:
+        ''' Get the sum and count of holding times for each (route_id, stop_id), including the actions on the latest snapshot.
+
+        '''
+        if after_warm_up:
+            route_stop_stat = self._action_log.route_stop_warm_hold_time
+        else:
+            route_stop_stat = self._action_log.route_stop_hold_time
+        sum_count = {route_stop: (stat.total, stat.count)
+                     for route_stop, stat in route_stop_stat.items()}
+
+        # the actions on the latest snapshot are moved to the action log when the next snapshot is taken
+        latest_snapshot = self._latest_snapshot
+        if latest_snapshot is None or (after_warm_up and latest_snapshot.t <= self._warm_up_time):
+            return sum_count
+        for (stop_id, route_id, _), hold_time in latest_snapshot.action_record.items():
+            hold_time_sum, hold_time_count = sum_count.get(
+                (route_id, stop_id), (0.0, 0))
+            sum_count[(route_id, stop_id)] = (
+                hold_time_sum + hold_time, hold_time_count + 1)
+        return sum_count
+
     # def get_metrics(self, route_last_stop: Dict[str, str]) -> Dict[str, float]:
     #     warm_up_time = 0
     #     metrics = {}
@@ -1,11 +1,13 @@
-from typing import List
+from typing import List, Dict, Tuple, TYPE_CHECKING
 from collections import defaultdict
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    from .bus import Bus
+
 
 @dataclass
 class TrajectoryPoint:
@@ -14,31 +16,260 @@ class TrajectoryPoint:
     distance_from_terminal: float
 
 
-def plot_time_space_diagram(buses):
+class TrajectoryRecorder:
+    ''' Record the trajectories of all the buses of a simulation in shared columnar arrays.
+
+    Each row is a trajectory point: the bus index, time (int32), distance from the terminal (float32),
+    spot type code (uint8) and spot index (int16). Spot types and spot ids are interned to the codes and indices.
+    The arrays are preallocated and doubled when they are full.
+
+    Args:
+        sample_interval: record the points of a bus every `sample_interval` seconds,
+            points where the bus moves to another spot are always recorded
+        change_only: if True, a bus staying at the same distance of the same spot only keeps the first
+            and the last points of the stay, which are enough for plotting
+
+    Methods:
+        register_bus(self, bus: Bus) -> int
+        record(self, bus_index: int, t: int, spot_type: str, spot_id: str, distance: float) -> None
+        record_stay(self, bus_index: int, start_t: int, end_t: int, spot_type: str, spot_id: str, distance: float) -> None
+        get_bus_points(self, bus_index: int) -> Dict[int, TrajectoryPoint]
+        get_columns(self) -> Dict[str, np.ndarray]
+
+    '''
+    _times: np.ndarray
+    _distances: np.ndarray
+    _spot_type_codes: np.ndarray
+    _spot_indices: np.ndarray
+    _bus_indices: np.ndarray
+    _size: int
+    # (route_id, bus_id) of each bus index
+    _bus_identifiers: List[Tuple[str, str]]
+    # the last row of each bus, -1 if the bus has no point yet
+    _bus_last_row: List[int]
+    # (time, spot type code, spot index, distance) of the last row of each bus, to avoid reading the arrays
+    _bus_last_point: List[Tuple[int, int, int, float]]
+    # the last two times that the points of each bus are skipped for staying at the location of its last row, -1 if none
+    _bus_skipped_times: List[Tuple[int, int]]
+
+    def __init__(self, sample_interval: int = 1, change_only: bool = False, capacity: int = 4096) -> None:
+        assert sample_interval >= 1
+        self._sample_interval = sample_interval
+        self._change_only = change_only
+        self._times = np.zeros(capacity, dtype=np.int32)
+        self._distances = np.zeros(capacity, dtype=np.float32)
+        self._spot_type_codes = np.zeros(capacity, dtype=np.uint8)
+        self._spot_indices = np.zeros(capacity, dtype=np.int16)
+        self._bus_indices = np.zeros(capacity, dtype=np.int32)
+        self._size = 0
+        self._spot_types: List[str] = []
+        self._spot_type_code: Dict[str, int] = {}
+        self._spot_ids: List[str] = []
+        self._spot_index: Dict[str, int] = {}
+        self._bus_identifiers = []
+        self._bus_last_row = []
+        self._bus_last_point = []
+        self._bus_skipped_times = []
+
+    @property
+    def bus_identifiers(self) -> List[Tuple[str, str]]:
+        return self._bus_identifiers
+
+    def register_bus(self, bus: 'Bus') -> int:
+        ''' Register a bus to record its trajectory, and return its index in the recorder.
+
+        '''
+        bus_index = len(self._bus_identifiers)
+        self._bus_identifiers.append((bus.route_id, bus.bus_id))
+        self._bus_last_row.append(-1)
+        self._bus_last_point.append((-1, -1, -1, 0.0))
+        self._bus_skipped_times.append((-1, -1))
+        bus.attach_trajectory_recorder(self, bus_index)
+        return bus_index
+
+    def record(self, bus_index: int, t: int, spot_type: str, spot_id: str, distance: float) -> None:
+        spot_type_code = self._intern_spot_type(spot_type)
+        spot_index = self._intern_spot_id(spot_id)
+        last_row = self._bus_last_row[bus_index]
+
+        if last_row >= 0:
+            last_t, last_spot_type_code, last_spot_index, last_distance = self._bus_last_point[bus_index]
+            # a later location at the same second replaces the earlier one
+            if last_t == t:
+                self._write(last_row, bus_index, t, spot_type_code,
+                            spot_index, distance)
+                return
+            same_spot = last_spot_type_code == spot_type_code and last_spot_index == spot_index
+            if same_spot:
+                if self._change_only and last_distance == distance:
+                    last_skipped_time, _ = self._bus_skipped_times[bus_index]
+                    if last_skipped_time != t:
+                        self._bus_skipped_times[bus_index] = (
+                            t, last_skipped_time)
+                    return
+                if t % self._sample_interval != 0:
+                    return
+            elif self._change_only:
+                # the bus stayed at the location of the last row until the last skipped point before t
+                last_skipped_time, second_last_skipped_time = self._bus_skipped_times[bus_index]
+                stay_end_time = last_skipped_time if last_skipped_time < t else second_last_skipped_time
+                if stay_end_time > last_t:
+                    self._append(bus_index, stay_end_time, last_spot_type_code,
+                                 last_spot_index, last_distance)
+
+        self._append(bus_index, t, spot_type_code, spot_index, distance)
+
+    def record_stay(self, bus_index: int, start_t: int, end_t: int, spot_type: str, spot_id: str, distance: float) -> None:
+        ''' Record a bus staying at the same location at every second from start_t to end_t (both included).
+
+        The result is the same as calling `record` at every second, but only the seconds that can be kept are recorded.
+
+        '''
+        if end_t < start_t:
+            return
+        self.record(bus_index, start_t, spot_type, spot_id, distance)
+        _, last_spot_type_code, last_spot_index, last_distance = self._bus_last_point[bus_index]
+        if not self._change_only:
+            # only the sampled seconds are kept
+            first_t = start_t - start_t % self._sample_interval + self._sample_interval
+            times = range(first_t, end_t + 1, self._sample_interval)
+        elif (last_spot_type_code, last_spot_index, last_distance) == \
+                (self._spot_type_code[spot_type], self._spot_index[spot_id], distance):
+            # the later seconds are skipped as the same location, only the last two skipped seconds are kept
+            times = range(max(start_t + 1, end_t - 1), end_t + 1)
+        else:
+            times = range(start_t + 1, end_t + 1)
+        for t in times:
+            self.record(bus_index, t, spot_type, spot_id, distance)
+
+    def get_bus_points(self, bus_index: int) -> Dict[int, TrajectoryPoint]:
+        ''' Get the recorded points of a bus as {t -> TrajectoryPoint}.
+
+        '''
+        bus_indices, times, distances, spot_type_codes, spot_indices = self._get_rows()
+        bus_points = {}
+        for row in np.flatnonzero(bus_indices == bus_index).tolist():
+            bus_points[int(times[row])] = TrajectoryPoint(self._spot_types[spot_type_codes[row]],
+                                                          self._spot_ids[spot_indices[row]],
+                                                          float(distances[row]))
+        return bus_points
+
+    def get_columns(self) -> Dict[str, np.ndarray]:
+        ''' Get the recorded points as columns sorted by bus index and time, e.g., for exporting.
+
+        Returns:
+            columns: {'bus_index', 'route_id', 'bus_id', 'time', 'distance', 'spot_type', 'spot_id' -> array}
+        '''
+        bus_indices, times, distances, spot_type_codes, spot_indices = self._get_rows()
+        order = np.lexsort((times, bus_indices))
+        bus_indices = bus_indices[order]
+        bus_identifiers = np.array(
+            self._bus_identifiers, dtype=object).reshape(-1, 2)
+        return {
+            'bus_index': bus_indices,
+            'route_id': bus_identifiers[bus_indices, 0],
+            'bus_id': bus_identifiers[bus_indices, 1],
+            'time': times[order],
+            'distance': distances[order],
+            'spot_type': np.array(self._spot_types, dtype=object)[spot_type_codes[order]],
+            'spot_id': np.array(self._spot_ids, dtype=object)[spot_indices[order]],
+        }
+
+    def _get_rows(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        ''' Get the recorded rows, plus the ends of the stays that are not finished yet (for change-only recording).
+
+        '''
+        rows = np.arange(self._size)
+        stay_end_rows, stay_end_times = [], []
+        for bus_index, (last_skipped_time, _) in enumerate(self._bus_skipped_times):
+            last_row = self._bus_last_row[bus_index]
+            if last_row >= 0 and last_skipped_time > self._times[last_row]:
+                stay_end_rows.append(last_row)
+                stay_end_times.append(last_skipped_time)
+        rows = np.concatenate([rows, np.array(stay_end_rows, dtype=np.int64)])
+        times = np.concatenate(
+            [self._times[:self._size], np.array(stay_end_times, dtype=np.int32)])
+        return self._bus_indices[rows], times, self._distances[rows], \
+            self._spot_type_codes[rows], self._spot_indices[rows]
+
+    def _append(self, bus_index: int, t: int, spot_type_code: int, spot_index: int, distance: float) -> None:
+        if self._size == len(self._times):
+            self._grow()
+        row = self._size
+        self._size += 1
+        self._write(row, bus_index, t, spot_type_code, spot_index, distance)
+        self._bus_last_row[bus_index] = row
+        self._bus_skipped_times[bus_index] = (-1, -1)
+
+    def _write(self, row: int, bus_index: int, t: int, spot_type_code: int, spot_index: int, distance: float) -> None:
+        self._bus_indices[row] = bus_index
+        self._times[row] = t
+        self._distances[row] = distance
+        self._spot_type_codes[row] = spot_type_code
+        self._spot_indices[row] = spot_index
+        self._bus_last_point[bus_index] = (
+            t, spot_type_code, spot_index, distance)
+
+    def _intern_spot_type(self, spot_type: str) -> int:
+        code = self._spot_type_code.get(spot_type)
+        if code is None:
+            code = len(self._spot_types)
+            assert code <= np.iinfo(np.uint8).max
+            self._spot_types.append(spot_type)
+            self._spot_type_code[spot_type] = code
+        return code
+
+    def _intern_spot_id(self, spot_id: str) -> int:
+        index = self._spot_index.get(spot_id)
+        if index is None:
+            index = len(self._spot_ids)
+            assert index <= np.iinfo(np.int16).max
+            self._spot_ids.append(spot_id)
+            self._spot_index[spot_id] = index
+        return index
+
+    def _grow(self) -> None:
+        capacity = len(self._times)
+        self._times = np.concatenate([self._times, np.zeros(capacity, dtype=np.int32)])
+        self._distances = np.concatenate(
+            [self._distances, np.zeros(capacity, dtype=np.float32)])
+        self._spot_type_codes = np.concatenate(
+            [self._spot_type_codes, np.zeros(capacity, dtype=np.uint8)])
+        self._spot_indices = np.concatenate(
+            [self._spot_indices, np.zeros(capacity, dtype=np.int16)])
+        self._bus_indices = np.concatenate(
+            [self._bus_indices, np.zeros(capacity, dtype=np.int32)])
+
+
+def plot_time_space_diagram(trajectory_recorder: TrajectoryRecorder):
+    # matplotlib is only imported for plotting
+    import matplotlib.pyplot as plt
+
     _, ax = plt.subplots()
     ax.set_xlabel('Time (sec)', fontsize=12)
     ax.set_ylabel('Offset (km)', fontsize=12)
 
-    for bus in buses:
+    columns = trajectory_recorder.get_columns()
+    bus_indices = columns['bus_index']
+    # rows are sorted by bus index, so each bus is a contiguous block
+    bus_starts = np.flatnonzero(np.diff(bus_indices, prepend=-1) != 0)
+    bus_ends = np.append(bus_starts[1:], len(bus_indices))
+    for start, end in zip(bus_starts.tolist(), bus_ends.tolist()):
         # plot trajectory
-        x = []
-        y = []
-        for t, point in bus.trajectory.items():
-            x.append(t)
-            y.append(point.distance_from_terminal)
+        x = columns['time'][start:end]
+        y = columns['distance'][start:end]
         ax.plot(x, y, 'k')
 
         # plot holding durations
         hold_xs = defaultdict(list)
         hold_ys = {}
-        for t, point in bus.trajectory.items():
-            if point.spot_type == 'holder':
-                hold_xs[point.spot_id].append(t)
-                hold_ys[point.spot_id] = point.distance_from_terminal
+        for row in np.flatnonzero(columns['spot_type'][start:end] == 'holder').tolist():
+            spot_id = columns['spot_id'][start + row]
+            hold_xs[spot_id].append(x[row])
+            hold_ys[spot_id] = y[row]
         for spot_id, xs in hold_xs.items():
-            start, end = min(xs), max(xs)
-            y = hold_ys[spot_id]
-            ax.hlines(y=y, xmin=start, xmax=end,
+            start_t, end_t = min(xs), max(xs)
+            ax.hlines(y=hold_ys[spot_id], xmin=start_t, xmax=end_t,
                       color='red', linewidth=1.5)
 
     plt.show()
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 
 
@@ -12,3 +12,129 @@ def calculate_headway_std(times: List[float], warm_up_time: int) -> float:
 
 def calculate_mean_abs_epsilon(epsilons: List[float]) -> float:
     return float(np.mean(np.abs(np.array(epsilons))))
+
+
+class RunningStat:
+    ''' Online mean and (population) standard deviation of a stream of values by Welford's algorithm.
+
+    Attributes:
+        count: the number of values
+        mean: the mean of values, nan if there is no value
+        std: the population standard deviation of values, nan if there is no value
+        total: the sum of values
+
+    '''
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count > 0 else float('nan')
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / self.count)) if self.count > 0 else float('nan')
+
+
+class HeadwayStat:
+    ''' Online headway statistics of a sequence of (non-decreasing) event times, the streaming version of `calculate_headway_std`.
+
+    Times before the warm-up time are ignored, and times are truncated to integers as in `calculate_headway_std`.
+
+    '''
+
+    def __init__(self, warm_up_time: int = 0) -> None:
+        self._warm_up_time = warm_up_time
+        self._last_time: Optional[int] = None
+        self.headway = RunningStat()
+
+    def add_time(self, t: float) -> None:
+        if t < self._warm_up_time:
+            return
+        t = int(t)
+        if self._last_time is not None:
+            self.headway.add(t - self._last_time)
+        self._last_time = t
+
+    @property
+    def std(self) -> float:
+        return self.headway.std
+
+
+class RunningStatArray:
+    ''' `RunningStat` of an array of independent streams, e.g., one stream per (replication, route-stop).
+
+    Values are added to the streams selected by an index, which must not select a stream twice;
+    the updates are the same floating-point operations as `RunningStat`, element-wise.
+
+    Attributes:
+        count: the number of values of each stream
+        mean: the mean of each stream, nan if there is no value
+        std: the population standard deviation of each stream, nan if there is no value
+        total: the sum of each stream
+
+    '''
+
+    def __init__(self, shape: Tuple[int, ...]) -> None:
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.total = np.zeros(shape, dtype=np.float64)
+        self._mean = np.zeros(shape, dtype=np.float64)
+        self._m2 = np.zeros(shape, dtype=np.float64)
+
+    def add(self, index: Tuple[np.ndarray, ...], values: np.ndarray) -> None:
+        count = self.count[index] + 1
+        self.count[index] = count
+        self.total[index] += values
+        delta = values - self._mean[index]
+        mean = self._mean[index] + delta / count
+        self._mean[index] = mean
+        self._m2[index] += delta * (values - mean)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, np.sqrt(self._m2 / self.count), np.nan)
+
+
+class HeadwayStatArray:
+    ''' `HeadwayStat` of an array of independent sequences of event times.
+
+    '''
+
+    def __init__(self, shape: Tuple[int, ...], warm_up_time: int = 0) -> None:
+        self._warm_up_time = warm_up_time
+        self._last_time = np.zeros(shape, dtype=np.int64)
+        self._has_last_time = np.zeros(shape, dtype=bool)
+        self.headway = RunningStatArray(shape)
+
+    def add_time(self, index: Tuple[np.ndarray, ...], times: np.ndarray) -> None:
+        after_warm_up = times >= self._warm_up_time
+        if not after_warm_up.all():
+            index = tuple(idx[after_warm_up] for idx in index)
+            times = times[after_warm_up]
+        times = np.trunc(times).astype(np.int64)
+        has_last_time = self._has_last_time[index]
+        headway_index = tuple(idx[has_last_time] for idx in index)
+        self.headway.add(headway_index,
+                         times[has_last_time] - self._last_time[headway_index])
+        self._last_time[index] = times
+        self._has_last_time[index] = True
+
+    @property
+    def std(self) -> np.ndarray:
+        return self.headway.std
@@ -37,6 +37,27 @@ class VirtualBus:
         self._route_stop_rtd_time = deepcopy(route_stop_rtd_time)
         self._route_stop_departure_time = deepcopy(route_stop_rtd_time)
 
+    def get_tables(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        ''' Get the arrival, rtd and departure time tables, e.g., for caching the converged schedule.
+
+        Returns:
+            tables: {'arrival', 'rtd', 'departure' -> {route_id -> {node_id -> time}}}
+
+        '''
+        return {'arrival': deepcopy(dict(self._route_stop_arrival_time)),
+                'rtd': deepcopy(dict(self._route_stop_rtd_time)),
+                'departure': deepcopy(dict(self._route_stop_departure_time))}
+
+    def load_tables(self, tables: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+        ''' Load the tables returned by `get_tables`.
+
+        '''
+        self._route_stop_arrival_time = defaultdict(
+            dict, deepcopy(tables['arrival']))
+        self._route_stop_rtd_time = defaultdict(dict, deepcopy(tables['rtd']))
+        self._route_stop_departure_time = defaultdict(
+            dict, deepcopy(tables['departure']))
+
     @property
     def route_stop_arrival_time(self) -> Dict[str, Dict[str, float]]:
         return dict(self._route_stop_arrival_time)
@@ -66,10 +87,11 @@ class VirtualBus:
         Assume that the virtual bus adhere the perfect schedule
 
         '''
+        compiled = self._blueprint.compiled
         for route_id, route in self._blueprint.route_info.route_infos.items():
             visit_seq_nodes = [route.terminal_id] + route.visit_seq_stops
             H = route.schedule_headway
-            stop_boarding_rate = route.boarding_rate
+            route_idx = compiled.route_index[route_id]
             t = 0
             # set the departure time of the virtual bus at the terminal to be 0
             self._route_stop_arrival_time[route_id][route.terminal_id] = t
@@ -84,14 +106,14 @@ class VirtualBus:
                 # (3) be held in the holder
 
                 # (1) link travel time from node s to node s+1
-                link_id = self._blueprint.get_next_link_id(route_id, head_node)
-                link_time = self._blueprint.network.link_distribution[link_id].tt_mean
+                link_idx = compiled.route_next_link[route_idx, compiled.node_index[head_node]]
+                link_time = float(compiled.link_tt_mean[link_idx])
                 t += link_time
                 self._route_stop_arrival_time[route_id][tail_node] = t
 
                 # (2) boarding time at node s+1
                 arrival_rate = self._route_stop_arrival_rate[route_id][tail_node]
-                board_rate = stop_boarding_rate[tail_node]
+                board_rate = float(compiled.route_boarding_rate[route_idx, compiled.node_index[tail_node]])
                 boarding_time = arrival_rate / board_rate * H
                 t += boarding_time
                 self._route_stop_rtd_time[route_id][tail_node] = t
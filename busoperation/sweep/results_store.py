@@ -0,0 +1,164 @@
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+from collections import defaultdict
+import sqlite3
+import json
+import os
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    ''' A finished run in the results store.
+
+    Attributes:
+        run_id: the id of the run in the store
+        project: the project that the run belongs to, e.g., 'bunching'
+        config: the flat config of the run, e.g., {'env', 'agent', 'slack', 'f0', 'base_type', 'seed', ...}
+        summary: {metric name -> mean value over the episodes of the run}
+        route_trip_times: {route_id -> trip times of the buses dispatched in the first hour}
+
+    '''
+    run_id: int
+    project: str
+    config: Dict[str, Any]
+    summary: Dict[str, float]
+    route_trip_times: Dict[str, List[float]]
+
+
+class ResultsStore:
+    ''' A local store of run results, backed by an SQLite file and indexed by config values.
+
+    It replaces the remote wandb runs that the plot scripts used to query: runs are filtered by
+    config values with the same 'config.<key>' filters as `wandb.Api().runs`.
+    Config values are stored natively, so integer and float values compare equal (e.g., -1 and -1.0).
+
+    Args:
+        path: the path of the SQLite file, created if it does not exist
+
+    Methods:
+        add_run(self, project: str, config: Dict[str, Any], summary: Dict[str, float], route_trip_times: Dict[str, List[float]]) -> int
+        runs(self, project: str, filters: Optional[Dict[str, Any]] = None) -> List[RunRecord]
+        get_summary(self, project: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, float]
+        has_run(self, project: str, config: Dict[str, Any]) -> bool
+        close(self) -> None
+
+    '''
+    _connection: sqlite3.Connection
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                project TEXT NOT NULL,
+                config_json TEXT NOT NULL,
+                summary_json TEXT NOT NULL,
+                trip_times_json TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS run_config (
+                run_id INTEGER NOT NULL REFERENCES runs(id),
+                key TEXT NOT NULL,
+                value
+            );
+            CREATE INDEX IF NOT EXISTS run_config_key_value ON run_config (key, value, run_id);
+            CREATE INDEX IF NOT EXISTS runs_project ON runs (project);
+        ''')
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add_run(self, project: str, config: Dict[str, Any], summary: Dict[str, float],
+                route_trip_times: Dict[str, List[float]]) -> int:
+        ''' Add a finished run and return its id.
+
+        Nested config dicts are indexed by their dotted keys, e.g., {'fs': {'f0': -1}} by 'fs.f0'.
+
+        '''
+        summary = {name: float(value) for name, value in summary.items()}
+        route_trip_times = {route_id: [float(trip_time) for trip_time in trip_times]
+                            for route_id, trip_times in route_trip_times.items()}
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO runs (project, config_json, summary_json, trip_times_json) VALUES (?, ?, ?, ?)',
+                (project, json.dumps(config), json.dumps(summary), json.dumps(route_trip_times)))
+            run_id = cursor.lastrowid
+            assert run_id is not None
+            self._connection.executemany(
+                'INSERT INTO run_config (run_id, key, value) VALUES (?, ?, ?)',
+                [(run_id, key, value) for key, value in _flatten(config).items()])
+        return run_id
+
+    def runs(self, project: str, filters: Optional[Dict[str, Any]] = None) -> List[RunRecord]:
+        ''' Get the runs of a project whose config matches all the filters, in the order of adding.
+
+        Args:
+            filters: {'config.<key>' or '<key>' -> value}, e.g., {'config.agent': 'Xuan_Nonlinear', 'config.slack': 30}
+
+        '''
+        query = 'SELECT id, config_json, summary_json, trip_times_json FROM runs WHERE project = ?'
+        params: List[Any] = [project]
+        for key, value in _flatten(_strip_config_prefix(filters or {})).items():
+            query += ' AND EXISTS (SELECT 1 FROM run_config WHERE run_id = runs.id AND key = ? AND value IS ?)'
+            params.extend([key, value])
+        query += ' ORDER BY id'
+
+        records = []
+        for run_id, config_json, summary_json, trip_times_json in self._connection.execute(query, params):
+            records.append(RunRecord(run_id, project, json.loads(config_json),
+                                     json.loads(summary_json), json.loads(trip_times_json)))
+        return records
+
+    def get_summary(self, project: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+        ''' Get the mean of each metric over the runs (e.g., the seeds of a sweep point) that match the filters.
+
+        '''
+        records = self.runs(project, filters)
+        assert len(records) > 0, f'no run of project {project} matches {filters}'
+        name_values: Dict[str, List[float]] = defaultdict(list)
+        for record in records:
+            for name, value in record.summary.items():
+                name_values[name].append(value)
+        return {name: float(np.mean(values)) for name, values in name_values.items()}
+
+    def has_run(self, project: str, config: Dict[str, Any]) -> bool:
+        ''' Check whether a run with exactly the same config exists.
+
+        '''
+        flat_config = _flatten(config)
+        for record in self.runs(project, flat_config):
+            if len(_flatten(record.config)) == len(flat_config):
+                return True
+        return False
+
+
+def _strip_config_prefix(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {key[len('config.'):] if key.startswith('config.') else key: value
+            for key, value in filters.items()}
+
+
+def _flatten(config: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    ''' Flatten nested dicts to dotted keys, values that SQLite cannot store natively are stored as JSON.
+
+    '''
+    flat_config = {}
+    for key, value in config.items():
+        if isinstance(value, dict):
+            flat_config.update(_flatten(value, f'{prefix}{key}.'))
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            flat_config[f'{prefix}{key}'] = value
+        elif isinstance(value, np.generic):
+            flat_config[f'{prefix}{key}'] = value.item()
+        else:
+            flat_config[f'{prefix}{key}'] = json.dumps(value)
+    return flat_config
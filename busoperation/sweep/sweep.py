@@ -0,0 +1,145 @@
+from typing import Dict, List, Tuple, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import random
+import copy
+
+import numpy as np
+
+import runner
+from setup.blueprint import Blueprint
+from setup.config_dataclass import SweepConfig
+from setup.registry import get_agent_class
+from agent.agent import Agent
+
+from .results_store import ResultsStore
+
+
+# the agents that can be swept, resolved by the registry so that only the swept agents' modules are imported
+SWEEP_AGENT_NAMES = ('Simple_Control', 'Xuan_Nonlinear', 'Do_Nothing')
+
+# the fields of `fs` that can be swept as if they were fields of the agent config
+FS_FIELDS = ('f0', 'f1')
+
+# the blueprints built by a worker process, one for each env
+_worker_blueprints: Dict[str, Blueprint] = {}
+
+
+def expand_points(sweep_config: SweepConfig) -> List[Dict[str, Any]]:
+    ''' Get the sweep points, i.e., the explicit points if given, otherwise all the combinations of the grid.
+
+    '''
+    if sweep_config.points is not None:
+        return [dict(point) for point in sweep_config.points]
+    names = list(sweep_config.grid.keys())
+    return [dict(zip(names, values))
+            for values in itertools.product(*(sweep_config.grid[name] for name in names))]
+
+
+def make_agent_config(base_agent_config: Dict[str, Any], env_name: str, point: Dict[str, Any]) -> Dict[str, Any]:
+    ''' Override the fields of the base agent config by a sweep point.
+
+    'f0' and 'f1' of a point go into `fs`, and the fields of `fs` are also copied to the top level
+    for agents that read 'f0' directly (e.g., `XuanNonlinear`).
+
+    '''
+    agent_config = copy.deepcopy(base_agent_config)
+    agent_config['env'] = env_name
+    fs = dict(agent_config.get('fs', {}))
+    for name, value in point.items():
+        if name in FS_FIELDS:
+            fs[name] = value
+        else:
+            agent_config[name] = value
+    agent_config['fs'] = fs
+    agent_config.update(fs)
+    return agent_config
+
+
+def make_run_config(agent_config: Dict[str, Any], seed: int, sweep_config: SweepConfig) -> Dict[str, Any]:
+    ''' Get the flat config that a run is stored and filtered by, with the keys that the plot scripts filter on.
+
+    '''
+    run_config = {'env': agent_config['env'], 'agent': agent_config['agent_name']}
+    for name, value in agent_config.items():
+        if name not in ('env', 'agent_name', 'fs'):
+            run_config[name] = value
+    run_config.update({'seed': seed, 'episode_num': sweep_config.episode_num,
+                       'step_num': sweep_config.step_num, 'engine': sweep_config.engine})
+    return run_config
+
+
+def create_agent(agent_config: Dict[str, Any], blueprint: Blueprint) -> Agent:
+    agent_name = agent_config['agent_name']
+    assert agent_name in SWEEP_AGENT_NAMES, f'agent {agent_name} cannot be swept'
+    return get_agent_class(agent_name)(agent_config, blueprint)
+
+
+def run_point(agent_config: Dict[str, Any], seed: int, episode_num: int, step_num: int,
+              engine: str) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+    ''' Run the episodes of one sweep point with one seed, and return the mean metrics and the trip times.
+
+    The blueprint of each env is built once per process.
+
+    '''
+    env_name = agent_config['env']
+    if env_name not in _worker_blueprints:
+        _worker_blueprints[env_name] = Blueprint(env_name)
+    blueprint = _worker_blueprints[env_name]
+
+    np.random.seed(seed)
+    random.seed(seed)
+    agent = create_agent(agent_config, blueprint)
+    return runner.run(blueprint, episode_num, step_num, agent, engine,  # type: ignore
+                      master_seed=seed, plot_trajectory=False)
+
+
+def run_sweep(sweep_config: SweepConfig, base_agent_config: Dict[str, Any]) -> List[int]:
+    ''' Run every env x point x seed of a sweep on a process pool and write the results to the results store.
+
+    Points that are already in the store are skipped, so an interrupted sweep can be resumed.
+    Results are written by the main process as soon as each run finishes.
+
+    Args:
+        sweep_config: SweepConfig
+        base_agent_config: the `model_based_agent_config` whose fields are overridden by the points
+
+    Returns:
+        run_ids: the ids of the runs added to the store
+
+    '''
+    tasks: List[Tuple[Dict[str, Any], Dict[str, Any], int]] = []
+    with ResultsStore(sweep_config.store_path) as store:
+        for env_name in sweep_config.env_names:
+            for point in expand_points(sweep_config):
+                agent_config = make_agent_config(
+                    base_agent_config, env_name, point)
+                for seed in sweep_config.seeds:
+                    run_config = make_run_config(
+                        agent_config, seed, sweep_config)
+                    if store.has_run(sweep_config.project, run_config):
+                        continue
+                    tasks.append((run_config, agent_config, seed))
+        print(f'{len(tasks)} runs to go')
+
+        run_ids = []
+        if sweep_config.num_workers <= 1:
+            for run_config, agent_config, seed in tasks:
+                summary, route_trip_times = run_point(agent_config, seed, sweep_config.episode_num,
+                                                      sweep_config.step_num, sweep_config.engine)
+                run_ids.append(store.add_run(sweep_config.project,
+                               run_config, summary, route_trip_times))
+                print(f'run {run_config} finished')
+            return run_ids
+
+        with ProcessPoolExecutor(max_workers=sweep_config.num_workers) as executor:
+            future_run_config = {executor.submit(run_point, agent_config, seed, sweep_config.episode_num,
+                                                 sweep_config.step_num, sweep_config.engine): run_config
+                                 for run_config, agent_config, seed in tasks}
+            for future in as_completed(future_run_config):
+                run_config = future_run_config[future]
+                summary, route_trip_times = future.result()
+                run_ids.append(store.add_run(sweep_config.project,
+                               run_config, summary, route_trip_times))
+                print(f'run {run_config} finished')
+        return run_ids
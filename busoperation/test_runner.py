@@ -19,6 +19,8 @@ def run(blueprint: Blueprint, episode_num: int, episode_duration: int, agent: Ag
         simulator = Simulator(blueprint, agent)
         stop_bus_hold_action: Dict[Tuple[str, str, str], float] = {}
 
+        # the running metrics are averaged over every second after the first hour, and they also change
+        # between decision epochs (e.g., when buses arrive at stops), so the simulator steps every second
         for t in range(episode_duration):
             snapshot = simulator.step(t, stop_bus_hold_action)
             stop_bus_hold_action = agent.evaluate(snapshot)
@@ -39,7 +41,7 @@ def run(blueprint: Blueprint, episode_num: int, episode_duration: int, agent: Ag
         print(f'metrics is {metrics}')
         agent.reset(episode)
         if episode % 10 == 0 or episode == episode_num - 1:
-            plot_time_space_diagram(simulator.total_buses)
+            plot_time_space_diagram(simulator.trajectory_recorder)
 
     name_value = {}
     for name, episode_metrics in name_episode_metrics.items():
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the modules of the simulation are imported from the `busoperation` directory, as the scripts there do
+BUSOPERATION_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), 'busoperation')
+if BUSOPERATION_DIR not in sys.path:
+    sys.path.insert(0, BUSOPERATION_DIR)
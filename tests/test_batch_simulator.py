@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+from runner import run_episode, run_replications
+from setup.blueprint import Blueprint
+from setup.registry import create_agent
+from simulator.batch_simulator import BatchSimulator
+from simulator.simulator import Simulator
+
+from conftest import BUSOPERATION_DIR
+
+STEP_NUM = 7200
+SEED = 3
+
+
+def create_env_agent(env_name: str, agent_name: str):
+    with open(os.path.join(BUSOPERATION_DIR, 'config.yaml'), 'r') as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    agent_config = dict(config['model_based_agent_config']) if agent_name == 'Simple_Control' else {}
+    agent_config.update({'agent_name': agent_name, 'env': env_name})
+    blueprint = Blueprint(env_name)
+    return blueprint, create_agent(agent_config, blueprint)
+
+
+@pytest.mark.parametrize('env_name', ['homogeneous_one_route', 'cd_route_3'])
+@pytest.mark.parametrize('agent_name', ['Do_Nothing', 'Simple_Control'])
+def test_single_replication_reproduces_simulator(env_name, agent_name):
+    np.random.seed(0)
+    blueprint, agent = create_env_agent(env_name, agent_name)
+
+    # the pax arrivals are drawn from numpy's global random state in both simulators
+    np.random.seed(100 + SEED)
+    simulator = Simulator(blueprint, agent, seed=SEED)
+    stop_bus_hold_time = {}
+    for t in range(STEP_NUM):
+        snapshot = simulator.step(t, stop_bus_hold_time)
+        stop_bus_hold_time = agent.calculate_hold_time(snapshot)
+
+    np.random.seed(100 + SEED)
+    batch_simulator = BatchSimulator(blueprint, agent, 1, [SEED])
+    hold_times = np.zeros(0)
+    for t in range(STEP_NUM):
+        batch_snapshot = batch_simulator.step(t, hold_times)
+        hold_times = agent.calculate_batch_hold_time(batch_snapshot)
+
+    metrics, trip_count = simulator.get_metrics()
+    [(batch_metrics, batch_trip_count)] = batch_simulator.get_metrics()
+    assert len(trip_count) > 0
+    assert batch_trip_count == trip_count
+    assert batch_metrics == metrics
+
+
+@pytest.mark.parametrize('env_name, supported', [('homogeneous_one_route', True), ('cd_route_3', True),
+                                                 ('synthetic_corridor', False), ('synthetic_grid', False)])
+def test_supports_only_networks_without_common_lines(env_name, supported):
+    assert BatchSimulator.supports(Blueprint(env_name)) == supported
+
+
+def test_replications_fall_back_to_simulator_with_common_lines():
+    blueprint, agent = create_env_agent('synthetic_corridor', 'Do_Nothing')
+    np.random.seed(100 + SEED)
+    replication_results = run_replications(blueprint, 2, 1800, agent, [SEED, SEED + 1])
+
+    expected_results = []
+    np.random.seed(100 + SEED)
+    for seed in [SEED, SEED + 1]:
+        expected_results.append(run_episode(blueprint, 1800, agent, 'step', seed).get_metrics())
+    # compared by repr, as the metrics of stops without enough buses in a short episode are nan
+    assert repr(replication_results) == repr(expected_results)
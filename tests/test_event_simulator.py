@@ -0,0 +1,105 @@
+import os
+from typing import Dict, List, Tuple, Any
+
+import numpy as np
+import pytest
+import yaml
+
+from agent.agent import Agent
+from setup.blueprint import Blueprint
+from setup.chengdu_factory import CDRoute3ComponentsFactory
+from setup.config_dataclass import PaxOperation, TracerConfig
+from setup.homo_one_route_factory import HomoOneRouteComponentsFactory
+from setup.registry import create_agent
+from simulator.event_simulator import EventSimulator
+from simulator.simulator import Simulator
+
+from conftest import BUSOPERATION_DIR
+
+STEP_NUM = 7200
+SEED = 11
+ENV_FACTORIES = {'homogeneous_one_route': HomoOneRouteComponentsFactory,
+                 'cd_route_3': CDRoute3ComponentsFactory}
+
+
+class RecordingAgent(Agent):
+    ''' Pass the snapshots to an agent and record the calls that have buses to act on.
+
+    '''
+
+    def __init__(self, agent: Agent) -> None:
+        super().__init__({'agent_name': agent.agent_name})
+        self._agent = agent
+        self.calls: List[Tuple[int, List[Tuple[str, str, str]], Dict[Tuple[str, str, str], float]]] = []
+
+    def reset(self, episode: int) -> None:
+        self._agent.reset(episode)
+
+    def calculate_hold_time(self, snapshot) -> Dict[Tuple[str, str, str], float]:
+        stop_bus_hold_time = self._agent.calculate_hold_time(snapshot)
+        if len(snapshot.holder_snapshot.action_buses) > 0:
+            self.calls.append((snapshot.t, list(snapshot.holder_snapshot.action_buses), dict(stop_bus_hold_time)))
+        return stop_bus_hold_time
+
+
+def create_env_agent(env_name: str, agent_name: str) -> Tuple[Blueprint, Agent]:
+    with open(os.path.join(BUSOPERATION_DIR, 'config.yaml'), 'r') as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    agent_config: Dict[str, Any] = dict(config['model_based_agent_config']) if agent_name == 'Simple_Control' else {}
+    agent_config.update({'agent_name': agent_name, 'env': env_name})
+    np.random.seed(0)
+    blueprint = Blueprint(env_name)
+    return blueprint, create_agent(agent_config, blueprint)
+
+
+def run_step(blueprint: Blueprint, agent: Agent, tracer_config: TracerConfig = TracerConfig()) -> Simulator:
+    np.random.seed(SEED)
+    simulator = Simulator(blueprint, agent, SEED, tracer_config)
+    stop_bus_hold_time: Dict[Tuple[str, str, str], float] = {}
+    for t in range(STEP_NUM):
+        stop_bus_hold_time = agent.calculate_hold_time(simulator.step(t, stop_bus_hold_time))
+    return simulator
+
+
+def run_event(blueprint: Blueprint, agent: Agent, tracer_config: TracerConfig = TracerConfig()) -> EventSimulator:
+    np.random.seed(SEED)
+    simulator = EventSimulator(blueprint, agent, SEED, tracer_config)
+    snapshot = simulator.step_to_decision(STEP_NUM, {})
+    while snapshot is not None:
+        snapshot = simulator.step_to_decision(STEP_NUM, agent.calculate_hold_time(snapshot))
+    return simulator
+
+
+@pytest.mark.parametrize('env_name', list(ENV_FACTORIES))
+@pytest.mark.parametrize('agent_name', ['Do_Nothing', 'Simple_Control'])
+def test_event_engine_reproduces_step_engine(env_name, agent_name, monkeypatch):
+    # with deterministic arrivals and boarding times, the engines only share the seeded link travel times
+    factory_class = ENV_FACTORIES[env_name]
+    factory_init = factory_class.__init__
+
+    def init_with_deterministic_pax(self, blueprint: Blueprint) -> None:
+        factory_init(self, blueprint)
+        self._pax_operation = PaxOperation(2.0, 0.5, 'deterministic', 'deterministic')
+
+    monkeypatch.setattr(factory_class, '__init__', init_with_deterministic_pax)
+    blueprint, agent = create_env_agent(env_name, agent_name)
+
+    step_agent, event_agent = RecordingAgent(agent), RecordingAgent(agent)
+    step_simulator = run_step(blueprint, step_agent)
+    event_simulator = run_event(blueprint, event_agent)
+
+    assert len(step_agent.calls) > 0
+    assert event_agent.calls == step_agent.calls
+    assert event_simulator.get_metrics() == step_simulator.get_metrics()
+    assert event_simulator.get_stop_average_hold_time() == step_simulator.get_stop_average_hold_time()
+
+
+@pytest.mark.parametrize('env_name', list(ENV_FACTORIES))
+@pytest.mark.parametrize('agent_name', ['Do_Nothing', 'Simple_Control'])
+@pytest.mark.parametrize('run', [run_step, run_event])
+def test_results_do_not_depend_on_snapshot_mode(env_name, agent_name, run):
+    # the event engine only generates the pax of a stop when it is needed, e.g., when the stop's snapshot is read
+    blueprint, agent = create_env_agent(env_name, agent_name)
+    view_simulator = run(blueprint, agent, TracerConfig(snapshot_mode='view'))
+    copy_simulator = run(blueprint, agent, TracerConfig(snapshot_mode='copy'))
+    assert copy_simulator.get_metrics() == view_simulator.get_metrics()
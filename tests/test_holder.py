@@ -0,0 +1,65 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pytest
+
+from agent.agent import Agent
+from setup.blueprint import Blueprint
+from simulator.holder import get_release_time
+from simulator.simulator import Simulator
+
+
+class CyclingHoldAgent(Agent):
+    ''' Hold the buses for the hold times in turn.
+
+    '''
+
+    def __init__(self, hold_times: Tuple[float, ...]) -> None:
+        super().__init__({'agent_name': 'Cycling_Hold'})
+        self._hold_times = hold_times
+        self._action_count = 0
+
+    def reset(self, episode: int) -> None:
+        pass
+
+    def calculate_hold_time(self, snapshot) -> Dict[Tuple[str, str, str], float]:
+        stop_bus_hold_time = {}
+        for stop_bus_id in snapshot.holder_snapshot.action_buses:
+            stop_bus_hold_time[stop_bus_id] = self._hold_times[self._action_count % len(self._hold_times)]
+            self._action_count += 1
+        snapshot.record_holding_time(stop_bus_hold_time)
+        return stop_bus_hold_time
+
+
+@pytest.mark.parametrize('hold_time, release_time', [
+    (0, 100), (0.0, 100), (-3.0, 100), (0.2, 100), (1, 100), (1.0001, 101), (2.5, 102), (3, 102), (59.9, 159)])
+def test_release_time(hold_time, release_time):
+    assert get_release_time(hold_time, 100) == release_time
+
+
+def test_held_buses_depart_at_release_time():
+    np.random.seed(0)
+    hold_times = (0, 0.5, 1, 1.5, 2, 7.3)
+    agent = CyclingHoldAgent(hold_times)
+    simulator = Simulator(Blueprint('homogeneous_one_route'), agent, seed=0)
+    # {(stop_id, route_id, bus_id): the expected departure time}
+    expected_departure_time = {}
+    stop_bus_hold_time: Dict[Tuple[str, str, str], float] = {}
+    for t in range(3600):
+        # the actions for the snapshot at t-1 count down from t
+        for stop_bus_id, hold_time in stop_bus_hold_time.items():
+            expected_departure_time[stop_bus_id] = get_release_time(hold_time, t)
+        snapshot = simulator.step(t, stop_bus_hold_time)
+        stop_bus_hold_time = agent.calculate_hold_time(snapshot)
+
+    departure_time = {}
+    holder_log = simulator._holder.log
+    for route_id, stop_bus_id_seq in holder_log.route_stop_departure_bus_id_seq.items():
+        for stop_id, bus_id_seq in stop_bus_id_seq.items():
+            time_seq = holder_log.route_stop_departure_time_seq[route_id][stop_id]
+            # the first departure is the virtual bus's
+            for bus_id, t in zip(bus_id_seq[1:], time_seq[1:]):
+                departure_time[(stop_id, route_id, bus_id)] = t
+    released = {stop_bus_id: t for stop_bus_id, t in expected_departure_time.items() if t < 3600}
+    assert len(released) > 2 * len(hold_times)
+    assert {stop_bus_id: departure_time.get(stop_bus_id) for stop_bus_id in released} == released
@@ -0,0 +1,93 @@
+from typing import List, Dict, Tuple
+import random
+
+from simulator.pax_generation import Pax
+from simulator.pax_queue import PaxQueue
+
+
+class FakeBus:
+    ''' The part of `Bus` that a pax queue uses, which boards one pax at each call of `PaxQueue.board`.
+
+    '''
+
+    def __init__(self, route_id: str, stop_arrival_time: Dict[str, int]) -> None:
+        self.route_id = route_id
+        self.board_status = 'idle'
+        self.paxs: List[Pax] = []
+        self.log = type('Log', (), {'stop_arrival_time': stop_arrival_time})()
+
+    def board(self, pax: Pax) -> None:
+        self.paxs.append(pax)
+
+    def accumate_board_fraction(self) -> None:
+        pass
+
+
+def create_queue(pax_routes_times: List[Tuple[Tuple[str, ...], int]], board_truncation: str = 'rtd') -> PaxQueue:
+    queue = PaxQueue('s1', board_truncation)
+    for idx, (routes, arrival_time) in enumerate(pax_routes_times):
+        queue.add_pax(Pax(str(idx), 's1', 's2', routes, arrival_time, 0.5))
+    return queue
+
+
+def board_all(queue: PaxQueue, bus: FakeBus, t: int = 100) -> List[str]:
+    for _ in range(queue.get_total_pax_num() + 1):
+        queue.board(bus, t)
+    return [pax.pax_id for pax in bus.paxs]
+
+
+def test_common_line_pax_board_in_arrival_order():
+    queue = create_queue([(('A',), 3), (('A', 'B'), 1), (('B',), 0),
+                          (('A', 'B'), 4), (('A',), 2), (('B',), 5)])
+    bus_a = FakeBus('A', {'s1': 10})
+    assert queue.check_remaining_pax_num(bus_a) == 4
+    assert board_all(queue, bus_a) == ['1', '4', '0', '3']
+
+    # the common-line pax boarded by route A are no longer waiting for route B
+    bus_b = FakeBus('B', {'s1': 10})
+    assert queue.get_total_pax_num() == 2
+    assert queue.check_remaining_pax_num(bus_b) == 2
+    assert board_all(queue, bus_b) == ['2', '5']
+    assert queue.get_total_pax_num() == 0
+
+
+def test_pax_arriving_together_board_by_group_creation():
+    # at the same arrival time, the group that a route saw first boards first, then first come first served
+    queue = create_queue([(('A', 'B'), 5), (('A',), 5), (('A', 'B'), 5), (('A',), 2)])
+    assert board_all(queue, FakeBus('A', {'s1': 10})) == ['3', '0', '2', '1']
+
+
+def test_arrival_truncation_keeps_pax_arriving_after_the_bus():
+    queue = create_queue([(('A',), 3), (('A', 'B'), 7), (('A',), 8), (('A', 'B'), 12)], 'arrival')
+    bus = FakeBus('A', {'s1': 8})
+    assert queue.check_remaining_pax_num(bus) == 2
+    assert board_all(queue, bus) == ['0', '1']
+    assert queue.get_total_pax_num() == 2
+
+
+def test_boarding_order_matches_sorting_the_waiting_pax():
+    # pax arrive out of order and buses of all the routes board in between, the next pax of a route is the waiting pax
+    # of the earliest arrival, then of the earliest group, then the earliest added
+    rng = random.Random(0)
+    route_groups = [('A',), ('A', 'B'), ('B',), ('B', 'C'), ('A', 'B', 'C'), ('C',)]
+    queue = PaxQueue('s1', 'rtd')
+    group_order: Dict[Tuple[str, ...], int] = {}
+    waiting: List[Tuple[int, int, int, Pax]] = []
+    for idx in range(3000):
+        if rng.random() < 0.55:
+            routes = rng.choice(route_groups)
+            group_order.setdefault(routes, len(group_order))
+            pax = Pax(str(idx), 's1', 's2', routes, idx // 10 + rng.randint(-20, 5), 0.5)
+            queue.add_pax(pax)
+            waiting.append((pax.arrival_time, group_order[routes], idx, pax))
+            continue
+        bus = FakeBus(rng.choice('ABC'), {'s1': idx})
+        queue.board(bus, idx)
+        servable = [item for item in waiting if bus.route_id in item[3].routes]
+        if len(servable) == 0:
+            assert bus.paxs == []
+            continue
+        expected = min(servable)
+        waiting.remove(expected)
+        assert bus.paxs == [expected[3]]
+        assert queue.get_total_pax_num() == len(waiting)